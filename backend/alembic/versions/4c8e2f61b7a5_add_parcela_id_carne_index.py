@@ -0,0 +1,36 @@
+"""Add idx_parcela_id_carne
+
+Revision ID: 4c8e2f61b7a5
+Revises: d3a97c51e08b
+Create Date: 2026-10-17 22:14:37.662019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8e2f61b7a5'
+down_revision: Union[str, None] = 'd3a97c51e08b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Os bancos antigos já têm este índice, criado fora das migrações (ver 7c69526b016a); os criados só
+    # pelas migrações não. IF NOT EXISTS cobre os dois casos, e CONCURRENTLY não bloqueia as escritas
+    # em parcela (não roda dentro de transação).
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_parcela_id_carne', 'parcela', ['id_carne'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Não remove o índice: nos bancos antigos ele é anterior a esta migração
+    pass
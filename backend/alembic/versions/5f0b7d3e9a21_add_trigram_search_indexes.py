@@ -0,0 +1,49 @@
+"""Add trigram search indexes
+
+Revision ID: 5f0b7d3e9a21
+Revises: 9d27c5e1a4b6
+Create Date: 2026-10-17 14:26:51.332870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0b7d3e9a21'
+down_revision: Union[str, None] = '9d27c5e1a4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (índice, tabela, coluna) das colunas usadas nas buscas ILIKE '%termo%' / similaridade.
+# Ficam só na migração (não em models.py) porque dependem da extensão pg_trgm.
+TRIGRAM_INDEXES = [
+    ('ix_cliente_nome_trgm', 'cliente', 'nome'),
+    ('ix_cliente_cpf_cnpj_trgm', 'cliente', 'cpf_cnpj'),
+    ('ix_carne_descricao_trgm', 'carne', 'descricao'),
+    ('ix_produto_nome_trgm', 'produto', 'nome'),
+    ('ix_produto_categoria_trgm', 'produto', 'categoria'),
+    ('ix_produto_marca_trgm', 'produto', 'marca'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Índices criados sem bloquear escritas nas tabelas (CONCURRENTLY não roda dentro de transação)
+    with op.get_context().autocommit_block():
+        for index_name, table_name, column_name in TRIGRAM_INDEXES:
+            op.create_index(
+                index_name, table_name, [column_name], unique=False,
+                postgresql_using='gin', postgresql_ops={column_name: 'gin_trgm_ops'},
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in reversed(TRIGRAM_INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
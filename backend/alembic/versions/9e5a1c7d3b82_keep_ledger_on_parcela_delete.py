@@ -0,0 +1,46 @@
+"""Keep lancamento_parcela rows when parcela or carne is deleted
+
+Revision ID: 9e5a1c7d3b82
+Revises: 4c8e2f61b7a5
+Create Date: 2026-10-17 23:41:09.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5a1c7d3b82'
+down_revision: Union[str, None] = '4c8e2f61b7a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _recreate_fks(ondelete: str) -> None:
+    # NOT VALID + VALIDATE: a conferência das linhas existentes não bloqueia as escritas no razão
+    for coluna, tabela in (('id_parcela', 'parcela'), ('id_carne', 'carne')):
+        nome = f'lancamento_parcela_{coluna}_fkey'
+        op.drop_constraint(nome, 'lancamento_parcela', type_='foreignkey')
+        op.execute(
+            f'ALTER TABLE lancamento_parcela ADD CONSTRAINT {nome} FOREIGN KEY ({coluna}) '
+            f'REFERENCES {tabela} ({coluna}) ON DELETE {ondelete} NOT VALID'
+        )
+        op.execute(f'ALTER TABLE lancamento_parcela VALIDATE CONSTRAINT {nome}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('lancamento_parcela', 'id_parcela', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('lancamento_parcela', 'id_carne', existing_type=sa.Integer(), nullable=True)
+    _recreate_fks('SET NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Com CASCADE, os lançamentos de parcelas já removidas teriam sido apagados junto com elas
+    op.execute('DELETE FROM lancamento_parcela WHERE id_parcela IS NULL OR id_carne IS NULL')
+    _recreate_fks('CASCADE')
+    op.alter_column('lancamento_parcela', 'id_carne', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('lancamento_parcela', 'id_parcela', existing_type=sa.Integer(), nullable=False)
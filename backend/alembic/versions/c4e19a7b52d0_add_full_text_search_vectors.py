@@ -0,0 +1,94 @@
+"""Add full text search vectors
+
+Revision ID: c4e19a7b52d0
+Revises: 5f0b7d3e9a21
+Create Date: 2026-10-17 15:02:17.418926
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e19a7b52d0'
+down_revision: Union[str, None] = '5f0b7d3e9a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Configuração de busca em português que ignora acentos ("joao" encontra "João").
+SEARCH_CONFIG = 'portuguese_unaccent'
+
+# Documento de busca de cada tabela, mantido pelo próprio PostgreSQL (coluna gerada STORED):
+# qualquer INSERT/UPDATE, pela API ou direto no banco, atualiza o vetor e o índice GIN.
+# Precisa ficar igual a crud._search_document (usado quando a migração não foi aplicada).
+# Documentos (CPF/CNPJ, SKU, IMEI) usam a configuração 'simple', sem stemming, com a pontuação trocada
+# por espaços; o CPF/CNPJ também entra só com os dígitos, para casar com buscas digitadas sem pontuação.
+SEARCH_VECTORS = [
+    ('cliente', f"""
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('simple', regexp_replace(coalesce(cpf_cnpj, ''), '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('simple', regexp_replace(coalesce(cpf_cnpj, ''), '\\D', '', 'g')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(email, '')), 'C')
+    """),
+    ('carne', f"""
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(descricao, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(observacoes, '')), 'C')
+    """),
+    ('produto', f"""
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(nome, '')), 'A') ||
+        setweight(to_tsvector('simple', regexp_replace(coalesce(codigo_sku, ''), '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('simple', regexp_replace(coalesce(imei, ''), '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(marca, '') || ' ' || coalesce(categoria, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(descricao, '')), 'C')
+    """),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # CREATE TEXT SEARCH CONFIGURATION não tem IF NOT EXISTS; o downgrade a remove com IF EXISTS
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_ts_config
+                WHERE cfgname = '{SEARCH_CONFIG}' AND cfgnamespace = current_schema()::regnamespace
+            ) THEN
+                CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = portuguese);
+            END IF;
+        END
+        $$
+    """)
+    op.execute(
+        f"ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} "
+        "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem"
+    )
+    # A coluna gerada STORED reescreve cada tabela sob ACCESS EXCLUSIVE (o PostgreSQL não tem outra forma
+    # de preenchê-la): em bancos grandes, aplicar numa janela de manutenção.
+    for table_name, documento in SEARCH_VECTORS:
+        op.execute(
+            f"ALTER TABLE {table_name} ADD COLUMN busca_tsv tsvector "
+            f"GENERATED ALWAYS AS ({documento}) STORED"
+        )
+    # Já os índices GIN são criados sem bloquear escritas (CONCURRENTLY não roda dentro de transação)
+    with op.get_context().autocommit_block():
+        for table_name, _ in SEARCH_VECTORS:
+            op.create_index(
+                f'ix_{table_name}_busca_tsv', table_name, ['busca_tsv'], unique=False, postgresql_using='gin',
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table_name, _ in reversed(SEARCH_VECTORS):
+            op.drop_index(f'ix_{table_name}_busca_tsv', table_name=table_name, postgresql_concurrently=True, if_exists=True)
+    for table_name, _ in reversed(SEARCH_VECTORS):
+        op.drop_column(table_name, 'busca_tsv')
+    op.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {SEARCH_CONFIG}")
+    # Sem CASCADE: se outro objeto do banco passou a usar a extensão, o downgrade falha em vez de removê-lo
+    op.execute("DROP EXTENSION IF EXISTS unaccent")
@@ -0,0 +1,37 @@
+"""Add covering index on pagamento.data_pagamento
+
+Revision ID: d3a97c51e08b
+Revises: 2b6f8e0d4c19
+Create Date: 2026-10-17 19:41:06.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a97c51e08b'
+down_revision: Union[str, None] = '2b6f8e0d4c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bancos antigos podem ter o índice simples idx_pagamento_data_pagamento, criado fora das migrações
+    # (ver 7c69526b016a); o novo índice o substitui. Os dois sem bloquear escritas em pagamento
+    # (CONCURRENTLY não roda dentro de transação).
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_pagamento_data_pagamento")
+        op.create_index(
+            'ix_pagamento_data_pagamento', 'pagamento', ['data_pagamento'], unique=False,
+            postgresql_include=['valor_pago', 'forma_pagamento', 'id_usuario_registro'], postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_pagamento_data_pagamento', table_name='pagamento', postgresql_concurrently=True)
@@ -0,0 +1,115 @@
+# backend/app/cache.py
+# Cache de resultados com TTL. O backend é plugável: o padrão é um LRU em memória do processo,
+# mas qualquer store chave/valor com expiração (ex.: Redis) pode implementar CacheBackend.
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.config import DASHBOARD_CACHE_TTL_SECONDS, DASHBOARD_CACHE_MAX_ENTRIES
+
+class CacheBackend(ABC):
+    """
+    Interface mínima de um store de cache. Os valores guardados são sempre serializáveis em JSON
+    (dicts/listas/números/strings), para que um backend remoto possa armazená-los sem conhecer os schemas.
+    Um backend que não implemente todos os métodos falha já ao ser instanciado.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+class InMemoryLRUCache(CacheBackend):
+    """LRU em memória, com expiração por entrada. Seguro para uso entre threads do mesmo processo."""
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class ResultCache:
+    """
+    Fachada usada pelo código da aplicação: aplica o TTL, conta acertos/falhas e delega ao backend.
+    """
+    def __init__(self, backend: CacheBackend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.backend.get(key) if self.ttl_seconds > 0 else None
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is None:
+            value = compute()
+            if self.ttl_seconds > 0:
+                self.backend.set(key, value, self.ttl_seconds)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def set_backend(self, backend: CacheBackend) -> None:
+        """Troca o backend (ex.: por um store compartilhado entre workers)."""
+        self.backend = backend
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+# Cache do resumo do dashboard. TTL 0 desliga o cache.
+dashboard_cache = ResultCache(InMemoryLRUCache(max_entries=DASHBOARD_CACHE_MAX_ENTRIES), DASHBOARD_CACHE_TTL_SECONDS)
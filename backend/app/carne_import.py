@@ -0,0 +1,350 @@
+# backend/app/carne_import.py
+# Importação em lote de carnês legados (em papel) a partir de CSV.
+# O arquivo é lido linha a linha e gravado em lotes: cada lote resolve/cria os clientes e grava carnês,
+# parcelas e pagamentos com INSERTs de várias linhas, numa transação por lote. A memória usada depende
+# só do tamanho do lote, não do arquivo. Linhas inválidas não interrompem a importação: entram no
+# relatório de erros com o número da linha. Se o banco recusar um lote (um valor que passa na validação
+# mas não cabe na coluna, p.ex.), o lote é desfeito e regravado linha a linha, e só as linhas recusadas
+# ficam de fora.
+#
+# Colunas (cabeçalho obrigatório; as não listadas são ignoradas):
+#   cliente_nome, cliente_cpf_cnpj, cliente_telefone, cliente_endereco, cliente_email
+#   data_venda, descricao, valor_total_original, numero_parcelas, valor_parcela_sugerido,
+#   data_primeiro_vencimento, frequencia_pagamento, valor_entrada, forma_pagamento_entrada,
+#   parcela_fixa, status_carne, observacoes
+#   valor_ja_pago, data_ultimo_pagamento, forma_pagamento   (pagamentos já feitos no carnê em papel)
+# Datas em AAAA-MM-DD ou DD/MM/AAAA; valores com ponto ou vírgula decimal ("1.234,56").
+import csv
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app import crud, ledger, models, schemas, typeahead
+
+DEFAULT_BATCH_SIZE = 500
+# Erros guardados no relatório devolvido; os demais só são contados (e repassados a on_error)
+MAX_ERROS_RELATORIO = 1000
+FORMA_PAGAMENTO_PADRAO = "Não informado"
+OBSERVACAO_PAGAMENTO_IMPORTADO = "Pagamento importado do carnê em papel"
+
+# --- Conversão dos campos do CSV ---
+def _text(valor: Optional[str]) -> Optional[str]:
+    valor = (valor or "").strip()
+    return valor or None
+
+def _parse_decimal(valor: Optional[str]) -> Optional[Decimal]:
+    valor = _text(valor)
+    if valor is None:
+        return None
+    if "," in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(f"valor numérico inválido: '{valor}'")
+
+def _parse_date(valor: Optional[str]) -> Optional[date]:
+    valor = _text(valor)
+    if valor is None:
+        return None
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida: '{valor}'")
+
+def _parse_bool(valor: Optional[str]) -> Optional[bool]:
+    valor = _text(valor)
+    if valor is None:
+        return None
+    return valor.lower() in ("1", "s", "sim", "true", "verdadeiro", "x")
+
+def _format_validation_error(erro: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in erro.errors())
+
+def parse_row(linha: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Valida uma linha do CSV com ClientCreate, CarneCreate e as regras de crud._plan_carne.
+    Levanta ValueError com a mensagem do erro.
+    """
+    try:
+        cliente = schemas.ClientCreate(
+            nome=_text(linha.get("cliente_nome")),
+            cpf_cnpj=_text(linha.get("cliente_cpf_cnpj")),
+            telefone=_text(linha.get("cliente_telefone")),
+            endereco=_text(linha.get("cliente_endereco")),
+            email=_text(linha.get("cliente_email")),
+        )
+        dados_carne = {
+            "id_cliente": 0, # Resolvido na gravação do lote
+            "data_venda": _parse_date(linha.get("data_venda")),
+            "descricao": _text(linha.get("descricao")),
+            "valor_total_original": _parse_decimal(linha.get("valor_total_original")),
+            "numero_parcelas": _text(linha.get("numero_parcelas")),
+            "valor_parcela_sugerido": _parse_decimal(linha.get("valor_parcela_sugerido")),
+            "data_primeiro_vencimento": _parse_date(linha.get("data_primeiro_vencimento")),
+            "frequencia_pagamento": _text(linha.get("frequencia_pagamento")),
+            "valor_entrada": _parse_decimal(linha.get("valor_entrada")),
+            "forma_pagamento_entrada": _text(linha.get("forma_pagamento_entrada")),
+            "parcela_fixa": _parse_bool(linha.get("parcela_fixa")),
+            "status_carne": _text(linha.get("status_carne")),
+            "observacoes": _text(linha.get("observacoes")),
+        }
+        # Campos vazios ficam com o padrão do schema
+        carne = schemas.CarneCreate(**{k: v for k, v in dados_carne.items() if v is not None})
+    except ValidationError as e:
+        raise ValueError(_format_validation_error(e))
+
+    try:
+        plano = crud._plan_carne(carne)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+
+    valor_ja_pago = _parse_decimal(linha.get("valor_ja_pago")) or Decimal("0.00")
+    if valor_ja_pago < 0:
+        raise ValueError("valor_ja_pago não pode ser negativo.")
+    if valor_ja_pago > plano["valor_a_parcelar"]:
+        raise ValueError("valor_ja_pago maior que o valor a parcelar (total - entrada).")
+
+    return {
+        "cliente": cliente,
+        "carne": carne,
+        "plano": plano,
+        "valor_ja_pago": valor_ja_pago.quantize(Decimal("0.01")),
+        "data_ultimo_pagamento": _parse_date(linha.get("data_ultimo_pagamento")),
+        "forma_pagamento": _text(linha.get("forma_pagamento")) or FORMA_PAGAMENTO_PADRAO,
+    }
+
+def _allocate_payments(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Distribui valor_ja_pago pelas parcelas, da mais antiga para a mais nova. Sem o histórico real, cada
+    parcela é considerada paga no vencimento (ou em data_ultimo_pagamento, se anterior ao vencimento).
+    Retorna as linhas de parcela com valor_pago, saldo_devedor, status e a data do pagamento.
+    """
+    restante = item["valor_ja_pago"]
+    data_referencia = item["data_ultimo_pagamento"] or date.today()
+    parcelas = []
+    for parcela in item["plano"]["cronograma"]:
+        valor_pago = min(restante, parcela["valor_devido"])
+        restante -= valor_pago
+        saldo = parcela["valor_devido"] - valor_pago
+        data_pagamento = min(parcela["data_vencimento"], data_referencia) if valor_pago > 0 else None
+        if valor_pago > 0 and saldo <= 0:
+            status_parcela = "Paga"
+        elif valor_pago > 0:
+            status_parcela = "Parcialmente Paga"
+        else:
+            status_parcela = "Pendente"
+        parcelas.append({
+            **parcela,
+            "valor_pago": valor_pago,
+            "saldo_devedor": saldo,
+            "status_parcela": status_parcela,
+            "data_pagamento_completo": data_pagamento if status_parcela == "Paga" else None,
+            "juros_multa": Decimal("0.00"),
+            "juros_multa_anterior_aplicada": Decimal("0.00"),
+            "_data_pagamento": data_pagamento,
+        })
+    return parcelas
+
+def _resolve_clients(db: Session, itens: List[Dict[str, Any]]) -> Tuple[Dict[str, int], List]:
+    """
+    id_cliente por cpf_cnpj_digitos. Clientes já cadastrados (mesmos dígitos do documento) são
+    reaproveitados sem alteração; os novos são criados com um único INSERT de várias linhas.
+    Retorna o mapa e as linhas dos clientes criados.
+    """
+    por_digitos: Dict[str, schemas.ClientCreate] = {}
+    for item in itens:
+        por_digitos.setdefault(crud._normalize_cpf_cnpj(item["cliente"].cpf_cnpj), item["cliente"])
+
+    def buscar(digitos):
+        rows = db.execute(
+            select(models.Cliente.cpf_cnpj_digitos, models.Cliente.id_cliente)
+            .where(models.Cliente.cpf_cnpj_digitos.in_(digitos))
+            .order_by(models.Cliente.id_cliente.desc())
+        ).all()
+        return {d: id_ for d, id_ in rows} # o menor id vence em caso de documentos repetidos
+
+    ids = buscar(list(por_digitos))
+    novos = [
+        {**cliente.model_dump(), "cpf_cnpj_digitos": digitos}
+        for digitos, cliente in por_digitos.items() if digitos not in ids
+    ]
+    criados = []
+    if novos:
+        resultado = db.execute(
+            pg_insert(models.Cliente).values(novos).on_conflict_do_nothing(index_elements=["cpf_cnpj"])
+            .returning(models.Cliente.id_cliente, models.Cliente.nome, models.Cliente.cpf_cnpj, models.Cliente.cpf_cnpj_digitos)
+        ).all()
+        criados = list(resultado)
+        ids.update({row.cpf_cnpj_digitos: row.id_cliente for row in criados})
+        faltando = [c["cpf_cnpj_digitos"] for c in novos if c["cpf_cnpj_digitos"] not in ids]
+        if faltando: # Inseridos por outra transação no meio do caminho
+            ids.update(buscar(faltando))
+    return ids, criados
+
+def _write_batch(db: Session, itens: List[Dict[str, Any]], id_usuario: int, relatorio: Dict[str, Any]) -> List:
+    """Grava um lote já validado numa transação. Retorna os clientes criados (para o autocomplete)."""
+    ids_clientes, clientes_criados = _resolve_clients(db, itens)
+
+    carnes, parcelas_por_carne, aberturas = [], [], []
+    for item in itens:
+        carne, plano = item["carne"], item["plano"]
+        parcelas = _allocate_payments(item)
+        pagas = sum(1 for p in parcelas if p["status_parcela"] == "Paga")
+        parciais = sum(1 for p in parcelas if p["status_parcela"] == "Parcialmente Paga")
+        status_carne = carne.status_carne or "Ativo"
+        if status_carne != "Cancelado" and parcelas and pagas == len(parcelas):
+            status_carne = "Quitado"
+        carnes.append({
+            "id_cliente": ids_clientes[crud._normalize_cpf_cnpj(item["cliente"].cpf_cnpj)],
+            "data_venda": carne.data_venda,
+            "descricao": carne.descricao,
+            "valor_total_original": carne.valor_total_original,
+            "numero_parcelas": plano["numero_parcelas"],
+            "valor_parcela_original": plano["valor_parcela_original"],
+            "data_primeiro_vencimento": carne.data_primeiro_vencimento,
+            "frequencia_pagamento": plano["frequencia_pagamento"],
+            "status_carne": status_carne,
+            "observacoes": carne.observacoes,
+            "valor_entrada": carne.valor_entrada,
+            "forma_pagamento_entrada": carne.forma_pagamento_entrada,
+            "parcela_fixa": bool(carne.parcela_fixa),
+            "total_parcelas": len(parcelas),
+            "parcelas_pagas": pagas,
+            "parcelas_atrasadas": 0, # O job de juros (apply_interest_accrual.py) marca os atrasos
+            "parcelas_parcialmente_pagas": parciais,
+        })
+        parcelas_por_carne.append(parcelas)
+        aberturas.append(ledger.opening_date(carne.data_venda))
+
+    # INSERTs de várias linhas; sort_by_parameter_order garante que os ids voltam na ordem das linhas
+    ids_carnes = db.scalars(
+        insert(models.Carne).returning(models.Carne.id_carne, sort_by_parameter_order=True), carnes
+    ).all()
+
+    linhas_parcela, datas_pagamento, formas_pagamento, datas_abertura = [], [], [], []
+    for id_carne, parcelas, item, abertura in zip(ids_carnes, parcelas_por_carne, itens, aberturas):
+        for parcela in parcelas:
+            datas_pagamento.append(parcela.pop("_data_pagamento"))
+            formas_pagamento.append(item["forma_pagamento"])
+            datas_abertura.append(abertura)
+            linhas_parcela.append({**parcela, "id_carne": id_carne})
+    ids_parcelas = db.scalars(
+        insert(models.Parcela).returning(models.Parcela.id_parcela, sort_by_parameter_order=True), linhas_parcela
+    ).all() if linhas_parcela else []
+
+    pagamentos = [
+        {
+            "id_parcela": id_parcela,
+            "data_pagamento": datetime.combine(data_pagamento, datetime.min.time()),
+            "valor_pago": parcela["valor_pago"],
+            "forma_pagamento": forma_pagamento,
+            "observacoes": OBSERVACAO_PAGAMENTO_IMPORTADO,
+            "id_usuario_registro": id_usuario,
+        }
+        for id_parcela, parcela, data_pagamento, forma_pagamento in zip(ids_parcelas, linhas_parcela, datas_pagamento, formas_pagamento)
+        if parcela["valor_pago"] > 0
+    ]
+    ids_pagamentos = db.scalars(
+        insert(models.Pagamento).returning(models.Pagamento.id_pagamento, sort_by_parameter_order=True), pagamentos
+    ).all() if pagamentos else []
+
+    # Razão: abertura de cada parcela na data da venda e os pagamentos importados nas suas datas
+    lancamentos = [
+        ledger.entry(id_parcela, parcela["id_carne"], ledger.TIPO_ABERTURA, abertura, valor_devido=parcela["valor_devido"])
+        for id_parcela, parcela, abertura in zip(ids_parcelas, linhas_parcela, datas_abertura)
+    ]
+    id_carne_por_parcela = {id_parcela: parcela["id_carne"] for id_parcela, parcela in zip(ids_parcelas, linhas_parcela)}
+    lancamentos.extend(
+        ledger.entry(
+            pagamento["id_parcela"], id_carne_por_parcela[pagamento["id_parcela"]], ledger.TIPO_PAGAMENTO,
+            pagamento["data_pagamento"], valor_pago=pagamento["valor_pago"], id_pagamento=id_pagamento, id_usuario=id_usuario
+        )
+        for id_pagamento, pagamento in zip(ids_pagamentos, pagamentos)
+    )
+    ledger.insert_entries(db, lancamentos)
+
+    db.commit()
+    relatorio["carnes_importados"] += len(ids_carnes)
+    relatorio["clientes_criados"] += len(clientes_criados)
+    relatorio["pagamentos_importados"] += len(pagamentos)
+    return clientes_criados
+
+def import_carnes_csv(
+    db: Session,
+    arquivo: Iterable[str],
+    id_usuario: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    delimitador: str = ",",
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_error: Optional[Callable[[int, str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Importa carnês de um CSV (arquivo texto aberto ou qualquer iterável de linhas), em lotes de
+    `batch_size` linhas. Os pagamentos importados são registrados em nome de `id_usuario`.
+    on_progress recebe o relatório parcial a cada lote gravado; on_error recebe (linha, mensagem).
+    """
+    relatorio: Dict[str, Any] = {
+        "linhas_processadas": 0,
+        "carnes_importados": 0,
+        "clientes_criados": 0,
+        "pagamentos_importados": 0,
+        "total_erros": 0,
+        "erros": [],
+    }
+
+    def registrar_erro(numero_linha: int, mensagem: str):
+        relatorio["total_erros"] += 1
+        if len(relatorio["erros"]) < MAX_ERROS_RELATORIO:
+            relatorio["erros"].append({"linha": numero_linha, "erro": mensagem})
+        if on_error:
+            on_error(numero_linha, mensagem)
+
+    def gravar(lote: List[Dict[str, Any]]):
+        try:
+            clientes_criados = _write_batch(db, lote, id_usuario, relatorio)
+        except Exception as e:
+            db.rollback()
+            if len(lote) > 1:
+                # Não se sabe qual linha o banco recusou: uma transação por linha, só a recusada fica de fora
+                for item in lote:
+                    gravar([item])
+            else:
+                registrar_erro(lote[0]["linha"], f"Erro ao gravar a linha: {e.__class__.__name__}: {e}")
+            return
+        for cliente in clientes_criados:
+            typeahead.client_index.upsert(*typeahead.client_entry(cliente))
+        if on_progress:
+            on_progress(relatorio)
+
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    lote: List[Dict[str, Any]] = []
+    try:
+        for linha in leitor:
+            relatorio["linhas_processadas"] += 1
+            try:
+                item = parse_row(linha)
+            except ValueError as e:
+                registrar_erro(leitor.line_num, str(e))
+                continue
+            item["linha"] = leitor.line_num
+            lote.append(item)
+            if len(lote) >= batch_size:
+                gravar(lote)
+                lote = []
+    except csv.Error as e:
+        registrar_erro(leitor.line_num, f"CSV malformado, importação interrompida: {e}")
+    if lote:
+        gravar(lote)
+
+    if relatorio["carnes_importados"]:
+        crud.invalidate_dashboard_cache()
+    return relatorio
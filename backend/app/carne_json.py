@@ -0,0 +1,234 @@
+# backend/app/carne_json.py
+# Montagem do documento CarneResponse direto no PostgreSQL (json_build_object / json_agg).
+# Evita hidratar objetos ORM e validar tudo de novo no Pydantic: o texto JSON gerado pelo banco
+# é devolvido como está. O documento tem os mesmos campos, valores e formatação do CarneResponse
+# serializado pelo FastAPI, inclusive juros/multas e status calculados para a data de hoje.
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Text, and_, case, cast, func, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.config import MULTA_ATRASO_PERCENTUAL, JUROS_MORA_PERCENTUAL_AO_MES
+from app.interest import STATUS_PARCELA_QUITADA, STATUS_PARCELA_ENCERRADA
+
+_ZERO = literal(Decimal('0.00'))
+_EMPTY_ARRAY = text("'[]'::json")
+
+# --- Formatação igual à do Pydantic ---
+def _decimal_text(coluna):
+    # Decimal vindo do banco: str(Decimal('150.00')) == '150.00', o mesmo que numeric::text
+    return cast(coluna, Text)
+
+def _float_decimal_text(coluna):
+    # Campos que o CRUD converte para float antes do Pydantic: Decimal(repr(float(x))), ex. 900.00 -> '900.0'
+    return case(
+        (coluna.is_(None), None),
+        (coluna == func.trunc(coluna), cast(func.trunc(coluna), Text) + '.0'),
+        else_=func.rtrim(cast(coluna, Text), '0')
+    )
+
+def _date_text(coluna):
+    return func.to_char(coluna, 'YYYY-MM-DD')
+
+def _datetime_text(coluna):
+    # datetime.isoformat(): microssegundos só aparecem quando diferentes de zero
+    return case(
+        (func.date_trunc('second', coluna) == coluna, func.to_char(coluna, 'YYYY-MM-DD"T"HH24:MI:SS')),
+        else_=func.to_char(coluna, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+    )
+
+# --- Regras de compute_parcela_view em SQL ---
+def _parcela_view_columns(today: date) -> dict:
+    """Expressões de juros_multa, juros_multa_anterior_aplicada, saldo_devedor e status_parcela para hoje."""
+    p = models.Parcela
+    principal = p.valor_devido - p.valor_pago
+    encerrada = p.status_parcela.in_(STATUS_PARCELA_ENCERRADA)
+    vencida = p.data_vencimento < today
+    dias_atraso = literal(today) - p.data_vencimento
+    total = func.round(
+        func.greatest(principal, 0) * (literal(MULTA_ATRASO_PERCENTUAL * 30) + literal(JUROS_MORA_PERCENTUAL_AO_MES) * dias_atraso) / 3000,
+        2
+    )
+    juros_recalculado = case((total != p.juros_multa_anterior_aplicada, total), else_=p.juros_multa)
+    saldo_bruto = principal + juros_recalculado
+    saldo_recalculado = case((and_(saldo_bruto > Decimal('-0.01'), saldo_bruto < Decimal('0.01')), _ZERO), else_=saldo_bruto)
+    quitada = saldo_recalculado <= 0
+    residuo_zerado = and_(p.juros_multa > 0, p.saldo_devedor <= 0)
+
+    return {
+        "juros_multa": case(
+            (encerrada, case((residuo_zerado, _ZERO), else_=p.juros_multa)),
+            (~vencida, p.juros_multa),
+            (quitada, _ZERO),
+            else_=juros_recalculado
+        ),
+        "juros_multa_anterior_aplicada": case(
+            (encerrada, case((residuo_zerado, _ZERO), else_=p.juros_multa_anterior_aplicada)),
+            (~vencida, p.juros_multa_anterior_aplicada),
+            (quitada, _ZERO),
+            (total != p.juros_multa_anterior_aplicada, total),
+            else_=p.juros_multa_anterior_aplicada
+        ),
+        "saldo_devedor": case(
+            (encerrada, p.saldo_devedor),
+            (~vencida, p.saldo_devedor),
+            else_=saldo_recalculado
+        ),
+        "status_parcela": case(
+            (encerrada, p.status_parcela),
+            (~vencida, p.status_parcela),
+            (quitada, case((p.data_pagamento_completo > p.data_vencimento, 'Paga com Atraso'), else_='Paga')),
+            else_='Atrasada'
+        ),
+    }
+
+def _pagamento_json(valor_pago=None, parcela_numero=None, parcela_data_vencimento=None, usuario_registro_nome=None):
+    # PagamentoResponseMin; os campos extras só são preenchidos no histórico consolidado do carnê
+    pg = models.Pagamento
+    return func.json_build_object(
+        'id_pagamento', pg.id_pagamento,
+        'data_pagamento', _datetime_text(pg.data_pagamento),
+        'valor_pago', valor_pago if valor_pago is not None else _decimal_text(pg.valor_pago),
+        'forma_pagamento', pg.forma_pagamento,
+        'observacoes', pg.observacoes,
+        'id_usuario_registro', pg.id_usuario_registro,
+        'parcela_numero', parcela_numero,
+        'parcela_data_vencimento', parcela_data_vencimento,
+        'usuario_registro_nome', usuario_registro_nome,
+    )
+
+def _carne_document(today: date):
+    """Expressão json do CarneResponse de cada linha de carne (correlacionada com carne e cliente)."""
+    c, p, pg = models.Carne, models.Parcela, models.Pagamento
+    view = _parcela_view_columns(today)
+
+    pagamentos_da_parcela = (
+        select(func.coalesce(func.json_agg(aggregate_order_by(_pagamento_json(), pg.id_pagamento)), _EMPTY_ARRAY))
+        .where(pg.id_parcela == p.id_parcela)
+        .correlate(p)
+        .scalar_subquery()
+    )
+    parcela_json = func.json_build_object(
+        'id_carne', p.id_carne,
+        'numero_parcela', p.numero_parcela,
+        'valor_devido', _decimal_text(p.valor_devido),
+        'data_vencimento', _date_text(p.data_vencimento),
+        'status_parcela', view["status_parcela"],
+        'observacoes', p.observacoes,
+        'id_parcela', p.id_parcela,
+        'valor_pago', _decimal_text(p.valor_pago),
+        'saldo_devedor', _decimal_text(view["saldo_devedor"]),
+        'data_pagamento_completo', _date_text(p.data_pagamento_completo),
+        'juros_multa', _decimal_text(view["juros_multa"]),
+        'juros_multa_anterior_aplicada', _decimal_text(view["juros_multa_anterior_aplicada"]),
+        'pagamentos', pagamentos_da_parcela,
+        'juros_multa_percentual', None,
+        'juros_mora_percentual_ao_dia', None,
+    )
+    parcelas = (
+        select(func.coalesce(func.json_agg(aggregate_order_by(parcela_json, p.numero_parcela)), _EMPTY_ARRAY))
+        .where(p.id_carne == c.id_carne)
+        .correlate(c)
+        .scalar_subquery()
+    )
+
+    # Histórico consolidado, do mais recente para o mais antigo (empates na ordem das parcelas)
+    pagamentos = (
+        select(func.coalesce(func.json_agg(aggregate_order_by(
+            _pagamento_json(
+                valor_pago=_float_decimal_text(pg.valor_pago),
+                parcela_numero=p.numero_parcela,
+                parcela_data_vencimento=_date_text(p.data_vencimento),
+                usuario_registro_nome=func.coalesce(models.Usuario.nome, 'N/A'),
+            ),
+            pg.data_pagamento.desc(), p.numero_parcela, pg.id_pagamento
+        )), _EMPTY_ARRAY))
+        .select_from(pg)
+        .join(p, pg.id_parcela == p.id_parcela)
+        .outerjoin(models.Usuario, pg.id_usuario_registro == models.Usuario.id_usuario)
+        .where(p.id_carne == c.id_carne)
+        .correlate(c)
+        .scalar_subquery()
+    )
+
+    # derive_carne_status sobre o status das parcelas calculado para hoje
+    status_parcelas = (
+        select(
+            func.count().label('total'),
+            func.count().filter(view["status_parcela"].in_(STATUS_PARCELA_QUITADA)).label('quitadas'),
+            func.count().filter(view["status_parcela"] == 'Atrasada').label('atrasadas'),
+        )
+        .where(p.id_carne == c.id_carne)
+        .correlate(c)
+        .lateral('status_parcelas')
+    )
+    status_carne = case(
+        (c.status_carne == 'Cancelado', c.status_carne),
+        (and_(status_parcelas.c.total > 0, status_parcelas.c.quitadas == status_parcelas.c.total), 'Quitado'),
+        (status_parcelas.c.atrasadas > 0, 'Em Atraso'),
+        else_='Ativo'
+    )
+
+    documento = func.json_build_object(
+        'id_cliente', c.id_cliente,
+        'data_venda', _date_text(c.data_venda),
+        'descricao', c.descricao,
+        'valor_total_original', _float_decimal_text(c.valor_total_original),
+        'numero_parcelas', c.numero_parcelas,
+        'valor_parcela_sugerido', case((c.parcela_fixa, _float_decimal_text(c.valor_parcela_original)), else_=None),
+        'data_primeiro_vencimento', _date_text(c.data_primeiro_vencimento),
+        'frequencia_pagamento', c.frequencia_pagamento,
+        'status_carne', status_carne,
+        'observacoes', c.observacoes,
+        'valor_entrada', _float_decimal_text(c.valor_entrada),
+        'forma_pagamento_entrada', c.forma_pagamento_entrada,
+        'parcela_fixa', c.parcela_fixa,
+        'id_carne', c.id_carne,
+        'data_criacao', _datetime_text(c.data_criacao),
+        'valor_parcela_original', _float_decimal_text(c.valor_parcela_original),
+        'cliente', func.json_build_object(
+            'id_cliente', models.Cliente.id_cliente,
+            'nome', models.Cliente.nome,
+            'cpf_cnpj', models.Cliente.cpf_cnpj,
+        ),
+        'pagamentos', pagamentos,
+        'parcelas', parcelas,
+    )
+    return documento, status_parcelas
+
+def _carne_documents_query(today: date):
+    documento, status_parcelas = _carne_document(today)
+    return (
+        select(
+            models.Carne.data_venda,
+            models.Carne.data_criacao,
+            models.Carne.id_carne,
+            cast(documento, Text).label('documento')
+        )
+        .join(models.Cliente, models.Carne.id_cliente == models.Cliente.id_cliente)
+        .join(status_parcelas, literal(True))
+    )
+
+def supports_json_engine(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def get_carne_json(db: Session, carne_id: int) -> Optional[str]:
+    """Texto JSON do CarneResponse do carnê, ou None se não existir."""
+    query = _carne_documents_query(date.today()).where(models.Carne.id_carne == carne_id)
+    row = db.execute(query).first()
+    return row.documento if row else None
+
+def get_carnes_json(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, **filtros) -> Tuple[str, List]:
+    """
+    Texto JSON da lista de CarneResponse, com os mesmos filtros e paginação de crud.get_carnes,
+    e as linhas (data_venda, data_criacao, id_carne) usadas para montar o cursor da próxima página.
+    """
+    query = _carne_documents_query(date.today())
+    query = crud._filter_carnes_query(db, query, **filtros)
+    query = crud._paginate_carnes_query(query, skip, limit, cursor)
+    rows = db.execute(query).all()
+    return "[" + ",".join(row.documento for row in rows) + "]", rows
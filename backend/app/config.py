@@ -44,5 +44,17 @@ try:
     JUROS_MORA_PERCENTUAL_AO_MES = Decimal(get_required_env("JUROS_MORA_PERCENTUAL_AO_MES", "0"))
     # --- FIM DA MODIFICAÇÃO ---
 
+    # Cache do resumo do dashboard (0 desliga o cache)
+    DASHBOARD_CACHE_TTL_SECONDS = int(get_required_env("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+    DASHBOARD_CACHE_MAX_ENTRIES = int(get_required_env("DASHBOARD_CACHE_MAX_ENTRIES", "8"))
+
+    # Montagem das respostas de carnê: "orm" (padrão) ou "postgres" (JSON gerado pelo banco)
+    CARNE_RESPONSE_ENGINE = get_required_env("CARNE_RESPONSE_ENGINE", "orm").lower()
+    if CARNE_RESPONSE_ENGINE not in {"orm", "postgres"}:
+        raise ConfigError("CARNE_RESPONSE_ENGINE deve ser 'orm' ou 'postgres'")
+
+    # Por quanto tempo uma resposta guardada pelo cabeçalho Idempotency-Key pode ser reaproveitada
+    IDEMPOTENCY_KEY_TTL_HOURS = int(get_required_env("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
 except (ValueError, ConfigError) as e:
     raise ConfigError(f"Erro na configuração: {str(e)}") from e
\ No newline at end of file
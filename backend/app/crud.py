@@ -1,13 +1,19 @@
 # backend/app/crud.py
-from sqlalchemy.orm import Session, joinedload
+import re
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 from app import models, schemas
 from fastapi import HTTPException, status
 from datetime import date, timedelta, datetime
 from decimal import Decimal
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from functools import lru_cache
 from app.config import MULTA_ATRASO_PERCENTUAL, JUROS_MORA_PERCENTUAL_AO_MES
-from sqlalchemy import func
+from app.interest import compute_parcela_view, derive_carne_status, STATUS_PARCELA_ENCERRADA
+from app.cache import dashboard_cache
+from app import typeahead, ledger
+from app.pagination import decode_cursor
+from sqlalchemy import func, update, insert, delete, select, case, literal, literal_column, true, tuple_, and_, or_, cast, text, union_all, Date, Double, Integer, String
 
 # >>> ADICIONAR ESTA IMPORTAÇÃO <<<
 from dateutil.relativedelta import relativedelta
@@ -15,70 +21,393 @@ from dateutil.relativedelta import relativedelta
 
 # --- Funções Auxiliares (RF017/RF018) ---
 def _apply_interest_and_fine_if_due(db: Session, parcela: models.Parcela):
-    today = date.today()
-    
-    # NÃO recalcular juros/multas se a parcela já está paga ou cancelada.
-    if parcela.status_parcela in ['Paga', 'Paga com Atraso', 'Cancelada']:
-        # Garante que, se já está paga, saldo e juros/multa sejam zero.
-        # Isso evita que juros/multa apareçam em parcelas já quitadas
-        if parcela.juros_multa > Decimal('0.00') and parcela.saldo_devedor <= Decimal('0.00'):
-            parcela.juros_multa = Decimal('0.00')
-            parcela.juros_multa_anterior_aplicada = Decimal('0.00')
+    # Mesmas regras do modo "view" (compute_parcela_view), mas gravando os valores na parcela.
+    # A variação de juros_multa vai para o razão. Não faz commit aqui, deixa para o caller.
+    antes = ledger.balance_fields(parcela)
+    for campo, valor in compute_parcela_view(parcela).items():
+        if getattr(parcela, campo) != valor:
+            setattr(parcela, campo, valor)
             db.add(parcela)
-            # Não faz commit aqui, deixa para o caller
-        return 
+    ledger.record(db, parcela, ledger.TIPO_JUROS, antes)
+
+def _interest_and_fine_expression(today: date):
+    """
+    Juros/multa de uma parcela vencida em `today`, como expressão SQL sobre as colunas de parcela.
+    Mesma fórmula de interest.calculate_interest_and_fine: base * (multa% * 30 + juros% * dias) / 3000,
+    arredondada em centavos como o banco faria ao gravar a coluna DECIMAL(10, 2).
+    """
+    principal_aberto = models.Parcela.valor_devido - models.Parcela.valor_pago
+    dias_atraso = literal(today, Date) - models.Parcela.data_vencimento
+    return func.round(
+        principal_aberto * (
+            literal(MULTA_ATRASO_PERCENTUAL * 30) + literal(JUROS_MORA_PERCENTUAL_AO_MES) * dias_atraso
+        ) / 3000,
+        2
+    )
 
-    # Se a parcela está vencida e não paga, recalcula juros/multas
-    if parcela.data_vencimento < today:
-        dias_atraso = (today - parcela.data_vencimento).days
-        
-        # O valor base para cálculo de juros/multa deve ser o saldo original que falta
-        # Não sobre o valor já aplicado de juros/multas, para evitar juros sobre juros sem controle.
-        valor_base_para_calculo = parcela.valor_devido - parcela.valor_pago
-        if valor_base_para_calculo < Decimal('0.00'):
-            valor_base_para_calculo = Decimal('0.00') # Não calcular juros sobre valor negativo
-
-        # MULTAS_ATRASO_PERCENTUAL já é Decimal
-        multa = (valor_base_para_calculo * MULTA_ATRASO_PERCENTUAL) / Decimal('100')
-        
-        # JUROS_MORA_PERCENTUAL_AO_MES já é Decimal
-        juros_diario_percentual = JUROS_MORA_PERCENTUAL_AO_MES / Decimal('30') / Decimal('100')
-        juros_mora = (valor_base_para_calculo * juros_diario_percentual * Decimal(str(dias_atraso)))
-        
-        total_novos_juros_multa = multa + juros_mora
-
-        # Atualiza o campo juros_multa APENAS se o valor mudou
-        # Isso é importante para não "sujar" o histórico se não houve alteração.
-        if total_novos_juros_multa != parcela.juros_multa_anterior_aplicada:
-            parcela.juros_multa = total_novos_juros_multa
-            parcela.juros_multa_anterior_aplicada = total_novos_juros_multa # Guarda o último valor aplicado
-
-        # Recalcula saldo devedor incluindo os juros/multas calculados.
-        # Saldo devedor é o que falta do principal (valor_devido - valor_pago) + juros/multa atual
-        parcela.saldo_devedor = (parcela.valor_devido - parcela.valor_pago) + parcela.juros_multa
-
-        # Ajuste para evitar valores negativos residuais muito pequenos
-        if parcela.saldo_devedor < Decimal('0.01') and parcela.saldo_devedor > Decimal('-0.01'):
-            parcela.saldo_devedor = Decimal('0.00')
-
-        # Atualiza status da parcela com base no saldo e vencimento
-        if parcela.saldo_devedor <= Decimal('0.00'):
-            # Se quitada, mesmo que atrasada, o status prioritário é 'Paga'
-            if parcela.data_pagamento_completo and parcela.data_pagamento_completo > parcela.data_vencimento:
-                parcela.status_parcela = 'Paga com Atraso'
-            else:
-                parcela.status_parcela = 'Paga'
-            # Garante que juros/multa sejam zerados se a parcela está efetivamente paga
-            parcela.juros_multa = Decimal('0.00')
-            parcela.juros_multa_anterior_aplicada = Decimal('0.00')
-        elif parcela.data_vencimento < today:
-            parcela.status_parcela = 'Atrasada'
-        elif parcela.valor_pago > Decimal('0.00'):
-            parcela.status_parcela = 'Parcialmente Paga'
+def apply_interest_and_fines_bulk(db: Session, reference_date: Optional[date] = None) -> dict:
+    """
+    Versão em lote de _apply_interest_and_fine_if_due para o job agendado (apply_interest_accrual.py).
+    Atualiza juros_multa, saldo_devedor e status_parcela de todas as parcelas vencidas com poucos
+    UPDATEs em SQL e depois ressincroniza os contadores e o status dos carnês, sem carregar objetos ORM.
+    Cada UPDATE lança no razão a variação de juros/multa das parcelas que alterou, no mesmo comando.
+    """
+    today = reference_date or date.today()
+    data_lancamento = datetime.combine(today, datetime.min.time())
+    status_encerrados = ['Paga', 'Paga com Atraso', 'Cancelada']
+    principal_aberto = models.Parcela.valor_devido - models.Parcela.valor_pago
+    juros_multa_calculado = _interest_and_fine_expression(today)
+
+    # 1. Parcelas quitadas/canceladas não podem carregar juros/multa residuais
+    zeradas = ledger.update_recording_interest(db,
+        update(models.Parcela)
+        .where(
+            models.Parcela.status_parcela.in_(status_encerrados),
+            models.Parcela.juros_multa > 0,
+            models.Parcela.saldo_devedor <= 0
+        )
+        .values(juros_multa=Decimal('0.00'), juros_multa_anterior_aplicada=Decimal('0.00')),
+        data_lancamento
+    )
+
+    # 2. Vencidas com principal em aberto: recalcula juros/multa e marca como 'Atrasada'.
+    # Só reescreve linhas cujo valor realmente mudou, para não gerar escrita desnecessária.
+    atrasadas = ledger.update_recording_interest(db,
+        update(models.Parcela)
+        .where(
+            models.Parcela.status_parcela.not_in(status_encerrados),
+            models.Parcela.data_vencimento < today,
+            principal_aberto > 0,
+            (models.Parcela.juros_multa != juros_multa_calculado) |
+            (models.Parcela.juros_multa_anterior_aplicada != juros_multa_calculado) |
+            (models.Parcela.saldo_devedor != principal_aberto + juros_multa_calculado) |
+            (models.Parcela.status_parcela != 'Atrasada')
+        )
+        .values(
+            juros_multa=juros_multa_calculado,
+            juros_multa_anterior_aplicada=juros_multa_calculado,
+            saldo_devedor=principal_aberto + juros_multa_calculado,
+            status_parcela='Atrasada'
+        ),
+        data_lancamento
+    )
+
+    # 3. Vencidas cujo principal já foi coberto pelos pagamentos: passam a quitadas, sem juros/multa
+    quitadas = ledger.update_recording_interest(db,
+        update(models.Parcela)
+        .where(
+            models.Parcela.status_parcela.not_in(status_encerrados),
+            models.Parcela.data_vencimento < today,
+            principal_aberto <= 0
+        )
+        .values(
+            juros_multa=Decimal('0.00'),
+            juros_multa_anterior_aplicada=Decimal('0.00'),
+            saldo_devedor=principal_aberto,
+            status_parcela=case(
+                (models.Parcela.data_pagamento_completo > models.Parcela.data_vencimento, 'Paga com Atraso'),
+                else_='Paga'
+            )
+        ),
+        data_lancamento
+    )
+
+    # 4. Ressincroniza os contadores de status e o status dos carnês (exceto cancelados) numa única agregação
+    contadores = (
+        select(
+            models.Parcela.id_carne.label('id_carne'),
+            func.count().label('total_parcelas'),
+            func.count().filter(models.Parcela.status_parcela.in_(['Paga', 'Paga com Atraso'])).label('parcelas_pagas'),
+            func.count().filter(models.Parcela.status_parcela == 'Atrasada').label('parcelas_atrasadas'),
+            func.count().filter(models.Parcela.status_parcela == 'Parcialmente Paga').label('parcelas_parcialmente_pagas')
+        )
+        .group_by(models.Parcela.id_carne)
+        .subquery()
+    )
+    novo_status = _carne_status_from_counters(contadores.c.total_parcelas, contadores.c.parcelas_pagas, contadores.c.parcelas_atrasadas)
+    carnes_atualizados = db.execute(
+        update(models.Carne)
+        .where(
+            models.Carne.id_carne == contadores.c.id_carne,
+            (models.Carne.total_parcelas != contadores.c.total_parcelas) |
+            (models.Carne.parcelas_pagas != contadores.c.parcelas_pagas) |
+            (models.Carne.parcelas_atrasadas != contadores.c.parcelas_atrasadas) |
+            (models.Carne.parcelas_parcialmente_pagas != contadores.c.parcelas_parcialmente_pagas) |
+            (models.Carne.status_carne != novo_status)
+        )
+        .values(
+            total_parcelas=contadores.c.total_parcelas,
+            parcelas_pagas=contadores.c.parcelas_pagas,
+            parcelas_atrasadas=contadores.c.parcelas_atrasadas,
+            parcelas_parcialmente_pagas=contadores.c.parcelas_parcialmente_pagas,
+            status_carne=novo_status
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    db.commit()
+    invalidate_dashboard_cache()
+    return {
+        "data_referencia": today,
+        "parcelas_zeradas": zeradas,
+        "parcelas_atrasadas_atualizadas": atrasadas,
+        "parcelas_quitadas": quitadas,
+        "carnes_atualizados": carnes_atualizados,
+    }
+
+def _live_interest_columns(today: date):
+    """
+    juros_multa, saldo_devedor e status_parcela de hoje das parcelas em aberto, como colunas SQL (mesmas
+    regras de compute_parcela_view), mais o filtro que descarta as vencidas cujo principal já foi coberto
+    pelos pagamentos: essas deixam de estar em aberto. Os relatórios do cliente somam e listam as parcelas
+    com os juros já calculados pelo banco, como o job em lote, sem cálculo linha a linha em Python.
+    """
+    principal_aberto = models.Parcela.valor_devido - models.Parcela.valor_pago
+    vencida = models.Parcela.data_vencimento < today
+    juros_multa_hoje = _interest_and_fine_expression(today)
+    colunas = (
+        case((vencida, juros_multa_hoje), else_=models.Parcela.juros_multa).label('juros_multa'),
+        case((vencida, principal_aberto + juros_multa_hoje), else_=models.Parcela.saldo_devedor).label('saldo_devedor'),
+        case((vencida, 'Atrasada'), else_=models.Parcela.status_parcela).label('status_parcela'),
+    )
+    em_aberto = ~vencida | (principal_aberto > 0)
+    return colunas, em_aberto
+
+# Contador do carnê que acompanha cada status de parcela
+_CONTADOR_POR_STATUS_PARCELA = {
+    'Paga': 'parcelas_pagas',
+    'Paga com Atraso': 'parcelas_pagas',
+    'Atrasada': 'parcelas_atrasadas',
+    'Parcialmente Paga': 'parcelas_parcialmente_pagas',
+}
+
+def _carne_status_from_counters(total_parcelas, parcelas_pagas, parcelas_atrasadas):
+    """Expressão SQL do status do carnê a partir dos contadores (mesma regra de derive_carne_status)."""
+    return case(
+        (models.Carne.status_carne == 'Cancelado', models.Carne.status_carne),
+        ((total_parcelas > 0) & (parcelas_pagas == total_parcelas), 'Quitado'),
+        (parcelas_atrasadas > 0, 'Em Atraso'),
+        else_='Ativo'
+    )
+
+def _track_parcela_status_changes(db: Session, id_carne: int, mudancas):
+    """
+    Ajusta os contadores do carnê para as mudanças de status das parcelas, dadas como pares
+    (status_anterior, status_novo), e recalcula status_carne no mesmo UPDATE, sem ler as parcelas.
+    Use None como status_anterior para parcelas novas e como status_novo para parcelas removidas.
+    Não faz commit aqui, deixa para o caller.
+    """
+    deltas = {'total_parcelas': 0, 'parcelas_pagas': 0, 'parcelas_atrasadas': 0, 'parcelas_parcialmente_pagas': 0}
+    for status_anterior, status_novo in mudancas:
+        if status_anterior == status_novo:
+            continue
+        if status_anterior is None:
+            deltas['total_parcelas'] += 1
+        elif status_anterior in _CONTADOR_POR_STATUS_PARCELA:
+            deltas[_CONTADOR_POR_STATUS_PARCELA[status_anterior]] -= 1
+        if status_novo is None:
+            deltas['total_parcelas'] -= 1
+        elif status_novo in _CONTADOR_POR_STATUS_PARCELA:
+            deltas[_CONTADOR_POR_STATUS_PARCELA[status_novo]] += 1
+
+    if not any(deltas.values()):
+        return
+    novos_valores = {coluna: getattr(models.Carne, coluna) + delta for coluna, delta in deltas.items()}
+    db.execute(
+        update(models.Carne)
+        .where(models.Carne.id_carne == id_carne)
+        .values(
+            **novos_valores,
+            status_carne=_carne_status_from_counters(
+                novos_valores['total_parcelas'], novos_valores['parcelas_pagas'], novos_valores['parcelas_atrasadas']
+            )
+        )
+    )
+
+# --- Busca textual (pg_trgm) ---
+_pg_trgm_disponivel: Optional[bool] = None
+
+def _has_pg_trgm(db: Session) -> bool:
+    """
+    Indica se a extensão pg_trgm está instalada (migração de índices trigram aplicada).
+    Sem ela a busca continua funcionando com ILIKE simples, só sem tolerância a erros e sem ranking.
+    """
+    global _pg_trgm_disponivel
+    if _pg_trgm_disponivel is None:
+        bind = db.get_bind()
+        _pg_trgm_disponivel = bind.dialect.name == "postgresql" and db.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _pg_trgm_disponivel
+
+def _text_search_filter(db: Session, termo: str, *colunas):
+    """
+    Filtro de busca por termo: ILIKE '%termo%' (acelerado pelos índices GIN gin_trgm_ops) e, com
+    pg_trgm, também correspondência aproximada por palavra (operador %>), tolerante a erros de digitação.
+    """
+    condicoes = [coluna.ilike(f"%{termo}%") for coluna in colunas]
+    if _has_pg_trgm(db):
+        condicoes += [coluna.op('%>')(termo) for coluna in colunas]
+    return or_(*condicoes)
+
+def _text_search_rank(termo: str, *colunas):
+    # Relevância: maior similaridade por palavra entre o termo e as colunas (double para o cursor ser exato)
+    return cast(func.greatest(*[func.word_similarity(termo, coluna) for coluna in colunas]), Double)
+
+def _after_keyset(chaves, valores):
+    """
+    Condição "depois de" para paginação por chave com direções mistas.
+    chaves: lista de (expressão, descendente); valores: valores do último item da página anterior.
+    """
+    condicoes = []
+    for i, (coluna, descendente) in enumerate(chaves):
+        iguais = [c == v for (c, _), v in zip(chaves[:i], valores[:i])]
+        condicoes.append(and_(*iguais, coluna < valores[i] if descendente else coluna > valores[i]))
+    return or_(*condicoes)
+
+def _paginate_by_name(query, coluna_nome, coluna_id, relevancia, skip: int, limit: int, cursor: Optional[str] = None):
+    """
+    Paginação das listagens ordenadas por nome (clientes, produtos). Em buscas com pg_trgm, a ordem é
+    por relevância e depois (nome, id). Cada objeto retornado recebe o atributo `relevancia` (None fora
+    de buscas ranqueadas), que faz parte do cursor: (relevancia, nome, id).
+    """
+    if relevancia is not None:
+        query = query.add_columns(relevancia.label('relevancia')).order_by(relevancia.desc(), coluna_nome, coluna_id)
+    else:
+        query = query.order_by(coluna_nome, coluna_id)
+
+    if cursor:
+        rel, nome, id_ = decode_cursor(cursor, (float, str, int))
+        if relevancia is not None and rel is not None:
+            query = query.filter(_after_keyset([(relevancia, True), (coluna_nome, False), (coluna_id, False)], [rel, nome, id_]))
         else:
-            parcela.status_parcela = 'Pendente'
-        
-        db.add(parcela) # Adiciona ao session, mas não faz commit aqui.
+            query = query.filter(tuple_(coluna_nome, coluna_id) > tuple_(nome, id_))
+        query = query.limit(limit)
+    else:
+        query = query.offset(skip).limit(limit)
+
+    itens = []
+    for row in query.all():
+        item = row[0] if relevancia is not None else row
+        item.relevancia = row.relevancia if relevancia is not None else None
+        itens.append(item)
+    return itens
+
+# --- Busca unificada (full-text) ---
+# Colunas busca_tsv (geradas, com índice GIN) criadas pela migração c4e19a7b52d0 com a configuração
+# portuguese_unaccent. Sem a migração, o mesmo documento é calculado na hora com 'portuguese'.
+SEARCH_CONFIG = 'portuguese_unaccent'
+SEARCH_TIPOS = ('cliente', 'carne', 'produto')
+_search_vectors_disponiveis: Optional[bool] = None
+
+def _has_search_vectors(db: Session) -> bool:
+    global _search_vectors_disponiveis
+    if _search_vectors_disponiveis is None:
+        bind = db.get_bind()
+        _search_vectors_disponiveis = bind.dialect.name == "postgresql" and db.execute(text(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'cliente' AND column_name = 'busca_tsv'"
+        )).first() is not None
+    return _search_vectors_disponiveis
+
+def _tsvector(config: str, *partes, peso: str):
+    documento = func.coalesce(partes[0], '')
+    for parte in partes[1:]:
+        documento = documento + ' ' + func.coalesce(parte, '')
+    return func.setweight(func.to_tsvector(literal_column(f"'{config}'"), documento), peso)
+
+def _sem_pontuacao(coluna):
+    return func.regexp_replace(func.coalesce(coluna, ''), '[^[:alnum:]]+', ' ', 'g')
+
+def _search_document(tipo: str, config: str):
+    """Mesmo documento das colunas busca_tsv da migração (para bancos sem a migração aplicada)."""
+    if tipo == 'cliente':
+        c = models.Cliente
+        return (_tsvector(config, c.nome, peso='A')
+                .op('||')(_tsvector('simple', _sem_pontuacao(c.cpf_cnpj), peso='A'))
+                .op('||')(_tsvector('simple', func.regexp_replace(func.coalesce(c.cpf_cnpj, ''), r'\D', '', 'g'), peso='A'))
+                .op('||')(_tsvector(config, c.email, peso='C')))
+    if tipo == 'carne':
+        c = models.Carne
+        return _tsvector(config, c.descricao, peso='A').op('||')(_tsvector(config, c.observacoes, peso='C'))
+    p = models.Produto
+    return (_tsvector(config, p.nome, peso='A')
+            .op('||')(_tsvector('simple', _sem_pontuacao(p.codigo_sku), peso='A'))
+            .op('||')(_tsvector('simple', _sem_pontuacao(p.imei), peso='A'))
+            .op('||')(_tsvector(config, p.marca, p.categoria, peso='B'))
+            .op('||')(_tsvector(config, p.descricao, peso='C')))
+
+def _prefix_tsquery(termo: str) -> Optional[str]:
+    """
+    Converte o texto digitado numa tsquery de prefixos ("mar silv" -> "mar:* & silv:*"), para que
+    palavras incompletas já encontrem resultados. Termos com cara de documento (CPF/CNPJ digitado com
+    ou sem pontuação) também são buscados só pelos dígitos.
+    """
+    palavras = re.findall(r"\w+", termo)
+    if not palavras:
+        return None
+    consulta = " & ".join(f"{palavra}:*" for palavra in palavras)
+    digitos = re.sub(r"\D", "", termo)
+    if len(palavras) > 1 and digitos and re.fullmatch(r"[\d\s./-]+", termo.strip()):
+        consulta = f"({consulta}) | {digitos}:*"
+    return consulta
+
+def search_all(db: Session, termo: str, limite_por_tipo: int = 5, tipos: Optional[List[str]] = None) -> List[dict]:
+    """
+    Busca o termo em clientes, carnês e produtos numa única consulta (UNION ALL com LIMIT por tipo),
+    ordenada pela relevância (ts_rank_cd). Retorna dicts com tipo, id, titulo, subtitulo e relevancia.
+    """
+    consulta = _prefix_tsquery(termo)
+    if not consulta or limite_por_tipo <= 0:
+        return []
+
+    indexado = _has_search_vectors(db)
+    config = SEARCH_CONFIG if indexado else 'portuguese'
+    tsquery = func.to_tsquery(literal_column(f"'{config}'"), consulta)
+
+    def busca(tipo, modelo, id_col, titulo, subtitulo, *joins):
+        if indexado:
+            documento = literal_column(f"{modelo.__tablename__}.busca_tsv")
+        else:
+            documento = _search_document(tipo, config)
+        relevancia = cast(func.ts_rank_cd(documento, tsquery), Double)
+        query = select(
+            literal(tipo).label('tipo'),
+            id_col.label('id'),
+            titulo.label('titulo'),
+            subtitulo.label('subtitulo'),
+            relevancia.label('relevancia'),
+        ).select_from(modelo)
+        for alvo, condicao in joins:
+            query = query.join(alvo, condicao)
+        return (
+            query.where(documento.op('@@')(tsquery))
+            .order_by(relevancia.desc(), id_col)
+            .limit(limite_por_tipo)
+            .subquery()
+        )
+
+    buscas = {
+        'cliente': lambda: busca(
+            'cliente', models.Cliente, models.Cliente.id_cliente, models.Cliente.nome, models.Cliente.cpf_cnpj
+        ),
+        'carne': lambda: busca(
+            'carne', models.Carne, models.Carne.id_carne,
+            func.coalesce(models.Carne.descricao, 'Carnê #' + cast(models.Carne.id_carne, String)),
+            models.Cliente.nome,
+            (models.Cliente, models.Carne.id_cliente == models.Cliente.id_cliente)
+        ),
+        'produto': lambda: busca(
+            'produto', models.Produto, models.Produto.id_produto, models.Produto.nome,
+            func.coalesce(models.Produto.marca, models.Produto.categoria, models.Produto.codigo_sku)
+        ),
+    }
+    partes = [select(buscas[tipo]()) for tipo in SEARCH_TIPOS if not tipos or tipo in tipos]
+    if not partes:
+        return []
+
+    resultados = union_all(*partes).subquery()
+    query = select(resultados).order_by(resultados.c.relevancia.desc(), resultados.c.tipo, resultados.c.id)
+    return [dict(row._mapping) for row in db.execute(query)]
 
 # >>> FUNÇÃO calculate_next_due_date MODIFICADA <<<
 def calculate_next_due_date(current_date: date, frequency: str) -> date:
@@ -113,6 +442,7 @@ def create_produto(db: Session, produto: schemas.ProdutoCreate) -> models.Produt
         db.add(db_produto)
         db.commit()
         db.refresh(db_produto)
+        typeahead.product_index.upsert(*typeahead.product_entry(db_produto))
         return db_produto
     except IntegrityError as e:
         db.rollback()
@@ -133,16 +463,20 @@ def get_produtos(
     limit: int = 100,
     search_query: Optional[str] = None,
     categoria: Optional[str] = None,
-    marca: Optional[str] = None
+    marca: Optional[str] = None,
+    cursor: Optional[str] = None
 ) -> List[models.Produto]:
     query = db.query(models.Produto)
+    relevancia = None
     if search_query:
-        query = query.filter(models.Produto.nome.ilike(f"%{search_query}%"))
+        query = query.filter(_text_search_filter(db, search_query, models.Produto.nome))
+        if _has_pg_trgm(db):
+            relevancia = _text_search_rank(search_query, models.Produto.nome)
     if categoria:
         query = query.filter(models.Produto.categoria.ilike(f"%{categoria}%"))
     if marca:
         query = query.filter(models.Produto.marca.ilike(f"%{marca}%"))
-    return query.order_by(models.Produto.nome).offset(skip).limit(limit).all()
+    return _paginate_by_name(query, models.Produto.nome, models.Produto.id_produto, relevancia, skip, limit, cursor)
 
 def update_produto(db: Session, produto_id: int, produto_update: schemas.ProdutoUpdate) -> Optional[models.Produto]:
     db_produto = get_produto(db, produto_id)
@@ -161,6 +495,7 @@ def update_produto(db: Session, produto_id: int, produto_update: schemas.Produto
         db.add(db_produto)
         db.commit()
         db.refresh(db_produto)
+        typeahead.product_index.upsert(*typeahead.product_entry(db_produto))
         return db_produto
     except IntegrityError as e:
         db.rollback()
@@ -178,6 +513,7 @@ def delete_produto(db: Session, produto_id: int) -> Optional[models.Produto]:
         return None
     db.delete(db_produto)
     db.commit()
+    typeahead.product_index.remove(produto_id)
     return db_produto
 
 # --- Operações de Usuário ---
@@ -224,26 +560,68 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
 def get_client(db: Session, client_id: int):
     return db.query(models.Cliente).filter(models.Cliente.id_cliente == client_id).first()
 
+def _normalize_cpf_cnpj(cpf_cnpj: Optional[str]) -> Optional[str]:
+    return re.sub(r"\D", "", cpf_cnpj) if cpf_cnpj is not None else None
+
+def _cpf_cnpj_search_digits(termo: str) -> Optional[str]:
+    """Dígitos do termo quando ele tem cara de CPF/CNPJ (só dígitos e pontuação de documento), senão None."""
+    if re.fullmatch(r"[\d\s./-]+", termo.strip()) and re.search(r"\d", termo):
+        return _normalize_cpf_cnpj(termo)
+    return None
+
+def _client_search_filter(db: Session, termo: str):
+    """
+    Filtro de busca de clientes. Termos com cara de documento vão direto ao índice de cpf_cnpj_digitos:
+    igualdade para CPF (11) ou CNPJ (14) completos, prefixo para números parciais. Os demais usam a
+    busca textual em nome e cpf_cnpj.
+    """
+    digitos = _cpf_cnpj_search_digits(termo)
+    if digitos is not None:
+        if len(digitos) in (11, 14):
+            return models.Cliente.cpf_cnpj_digitos == digitos
+        return models.Cliente.cpf_cnpj_digitos.like(f"{digitos}%")
+    return _text_search_filter(db, termo, models.Cliente.nome, models.Cliente.cpf_cnpj)
+
+# --- Autocomplete (índice de prefixos em memória) ---
+def warm_autocomplete_indexes(db: Session) -> None:
+    """Carrega os índices de autocomplete de clientes e produtos (só as colunas indexadas)."""
+    clientes = db.query(models.Cliente.id_cliente, models.Cliente.nome, models.Cliente.cpf_cnpj).all()
+    typeahead.client_index.load(typeahead.client_entry(c) for c in clientes)
+    produtos = db.query(
+        models.Produto.id_produto, models.Produto.nome, models.Produto.codigo_sku, models.Produto.imei, models.Produto.marca
+    ).all()
+    typeahead.product_index.load(typeahead.product_entry(p) for p in produtos)
+
+def autocomplete(db: Session, termo: str, tipo: str, limit: int = 10) -> List[dict]:
+    index = typeahead.client_index if tipo == "cliente" else typeahead.product_index
+    if not index.loaded:
+        warm_autocomplete_indexes(db)
+    return typeahead.autocomplete(index, termo, limit)
+
 def get_clients(
     db: Session,
     skip: int = 0,
     limit: int = 100,
-    search_query: Optional[str] = None
+    search_query: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
     query = db.query(models.Cliente)
+    relevancia = None
     if search_query:
-        query = query.filter(
-            (models.Cliente.nome.ilike(f"%{search_query}%")) |
-            (models.Cliente.cpf_cnpj.ilike(f"%{search_query}%"))
-        )
-    return query.order_by(models.Cliente.nome).offset(skip).limit(limit).all()
+        query = query.filter(_client_search_filter(db, search_query))
+        if _has_pg_trgm(db) and _cpf_cnpj_search_digits(search_query) is None:
+            relevancia = _text_search_rank(search_query, models.Cliente.nome, models.Cliente.cpf_cnpj)
+    return _paginate_by_name(query, models.Cliente.nome, models.Cliente.id_cliente, relevancia, skip, limit, cursor)
 
 def create_client(db: Session, client: schemas.ClientCreate):
     db_client = models.Cliente(**client.model_dump())
+    db_client.cpf_cnpj_digitos = _normalize_cpf_cnpj(db_client.cpf_cnpj)
     try:
         db.add(db_client)
         db.commit()
+        invalidate_dashboard_cache()
         db.refresh(db_client)
+        typeahead.client_index.upsert(*typeahead.client_entry(db_client))
         return db_client
     except IntegrityError:
         db.rollback()
@@ -256,84 +634,61 @@ def update_client(db: Session, client_id: int, client_update: schemas.ClientUpda
     update_data = client_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_client, key, value)
+    if "cpf_cnpj" in update_data:
+        db_client.cpf_cnpj_digitos = _normalize_cpf_cnpj(db_client.cpf_cnpj)
     try:
         db.add(db_client)
         db.commit()
         db.refresh(db_client)
+        typeahead.client_index.upsert(*typeahead.client_entry(db_client))
         return db_client
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CPF/CNPJ já registrado por outro cliente")
 
-def delete_client(db: Session, client_id: int):
+def delete_client(db: Session, client_id: int, usuario_id: Optional[int] = None):
     db_client = get_client(db, client_id)
     if not db_client:
         return None
+    # Os carnês do cliente saem em cascata; o razão das parcelas deles recebe o encerramento e fica
+    ledger.close_parcelas(
+        db, models.Parcela.id_carne.in_(select(models.Carne.id_carne).where(models.Carne.id_cliente == client_id)),
+        id_usuario=usuario_id
+    )
     db.delete(db_client)
     db.commit()
+    invalidate_dashboard_cache()
+    typeahead.client_index.remove(client_id)
     return db_client
 
 def get_client_summary(db: Session, client_id: int):
-    db_client = db.query(models.Cliente).options(
-        joinedload(models.Cliente.carnes).joinedload(models.Carne.parcelas).joinedload(models.Parcela.pagamentos)
-    ).filter(models.Cliente.id_cliente == client_id).first()
-
+    db_client = get_client(db, client_id)
     if not db_client:
         return None
 
-    total_divida_aberta = Decimal('0.00')
-    total_pago_historico = Decimal('0.00')
-    numero_carnes_ativos = 0
-    numero_carnes_quitados = 0
-    numero_carnes_cancelados = 0
-
-    for carne_obj in db_client.carnes:
-        # Aplica juros/multas e atualiza status das parcelas.
-        # Não faz commit aqui, pois a lógica de update do carnê fará.
-        for parcela in carne_obj.parcelas:
-            _apply_interest_and_fine_if_due(db, parcela)
-
-        # Recalcula o status do carnê com base no status das parcelas após aplicação de juros
-        if carne_obj.status_carne != 'Cancelado':
-            all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in carne_obj.parcelas)
-            has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in carne_obj.parcelas)
-            has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in carne_obj.parcelas)
-            
-            new_status_carne = carne_obj.status_carne # Manter o status atual se não houver mudança
-
-            if all_parcels_paid and carne_obj.parcelas:
-                new_status_carne = 'Quitado'
-            elif has_overdue_parcel:
-                new_status_carne = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_status_carne = 'Ativo' # Pode ser 'Parcialmente Ativo' se quiser distinguir
-            else:
-                new_status_carne = 'Ativo' # Se não tem atrasadas e não pagas, mas também não totalmente pagas
-        db.add(carne_obj) # Adiciona ao session, mas não faz commit aqui
-
-    db.commit() # Commit uma vez após o loop de carnês para salvar as mudanças de status e juros/multas
-
-    # Após o commit, re-refresh para garantir que os dados de status e saldos estão atualizados para o resumo
-    db.refresh(db_client)
-    for carne_obj in db_client.carnes:
-        db.refresh(carne_obj)
-        for parcela in carne_obj.parcelas:
-            db.refresh(parcela)
-
-        if carne_obj.status_carne == 'Quitado':
-            numero_carnes_quitados += 1
-        elif carne_obj.status_carne == 'Cancelado':
-            numero_carnes_cancelados += 1
-        else: # Inclui Ativo, Em Atraso
-            numero_carnes_ativos += 1
-            for parcela in carne_obj.parcelas:
-                # Soma a dívida aberta apenas se o status da parcela indica que há saldo a ser pago
-                if parcela.status_parcela not in ['Paga', 'Paga com Atraso', 'Cancelada']:
-                    total_divida_aberta += parcela.saldo_devedor
+    # Contagens e totais agregados no banco; a dívida aberta usa juros/multas calculados pelo banco para hoje
+    today = date.today()
+    carnes_por_status = dict(
+        db.query(models.Carne.status_carne, func.count(models.Carne.id_carne))
+        .filter(models.Carne.id_cliente == client_id)
+        .group_by(models.Carne.status_carne)
+        .all()
+    )
+    numero_carnes_quitados = carnes_por_status.get('Quitado', 0)
+    numero_carnes_cancelados = carnes_por_status.get('Cancelado', 0)
+    numero_carnes_ativos = sum(carnes_por_status.values()) - numero_carnes_quitados - numero_carnes_cancelados # Inclui Ativo, Em Atraso
 
-        for parcela in carne_obj.parcelas:
-            total_pago_historico += parcela.valor_pago
+    total_pago_historico = db.query(func.sum(models.Parcela.valor_pago)).join(models.Carne).filter(
+        models.Carne.id_cliente == client_id
+    ).scalar() or Decimal('0.00')
 
+    (_, saldo_devedor_hoje, _), em_aberto = _live_interest_columns(today)
+    total_divida_aberta = db.query(func.coalesce(func.sum(saldo_devedor_hoje), Decimal('0.00'))).join(models.Carne).filter(
+        models.Carne.id_cliente == client_id,
+        models.Carne.status_carne.not_in(['Quitado', 'Cancelado']),
+        models.Parcela.status_parcela.not_in(STATUS_PARCELA_ENCERRADA),
+        em_aberto
+    ).scalar()
 
     client_data_for_summary = schemas.ClientResponse.model_validate(db_client).model_dump()
     client_summary = schemas.ClientSummaryResponse(
@@ -347,73 +702,42 @@ def get_client_summary(db: Session, client_id: int):
     return client_summary
 
 # --- Operações de Carne ---
-def get_carne(db: Session, carne_id: int, apply_interest: bool = True):
-    # Alterado para carregar pagamentos aninhados ao carnê, incluindo usuário e número da parcela
-    db_carne = db.query(models.Carne).options(
+def _carne_response_options():
+    """
+    Carregamento de um carnê completo em número fixo de consultas: carnê + cliente (JOIN),
+    parcelas (SELECT ... IN) e pagamentos + usuário de registro (SELECT ... IN), qualquer que
+    seja o número de parcelas ou pagamentos.
+    """
+    return (
         joinedload(models.Carne.cliente),
-        joinedload(models.Carne.parcelas).joinedload(models.Parcela.pagamentos).joinedload(models.Pagamento.usuario_registro),
-        joinedload(models.Carne.parcelas) # Carrega as parcelas diretamente
-    ).filter(models.Carne.id_carne == carne_id).first()
-
-    if db_carne and apply_interest:
-        needs_commit = False
-        for parcela in db_carne.parcelas:
-            original_juros_multa = parcela.juros_multa
-            original_saldo_devedor = parcela.saldo_devedor
-            original_status_parcela = parcela.status_parcela
-            _apply_interest_and_fine_if_due(db, parcela)
-            if (parcela.juros_multa != original_juros_multa or 
-                parcela.saldo_devedor != original_saldo_devedor or 
-                parcela.status_parcela != original_status_parcela):
-                needs_commit = True
-                db.add(parcela) # Marca para salvamento
-
-        # Recalcula o status do carnê após aplicar juros às parcelas
-        if db_carne.status_carne != 'Cancelado':
-            all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in db_carne.parcelas)
-            has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in db_carne.parcelas)
-            has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in db_carne.parcelas)
-            
-            new_status_carne = db_carne.status_carne # Manter o status atual se não houver mudança
-
-            if all_parcels_paid and db_carne.parcelas:
-                new_status_carne = 'Quitado'
-            elif has_overdue_parcel:
-                new_status_carne = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_status_carne = 'Ativo' # Pode ser 'Parcialmente Ativo' se quiser distinguir
-            else:
-                new_status_carne = 'Ativo'
-            
-            if db_carne.status_carne != new_status_carne:
-                db_carne.status_carne = new_status_carne
-                needs_commit = True
-                db.add(db_carne) # Marca o carnê para salvamento
+        selectinload(models.Carne.parcelas).selectinload(models.Parcela.pagamentos).joinedload(models.Pagamento.usuario_registro)
+    )
 
-        if needs_commit:
-            db.commit() # Commit uma vez para todas as parcelas e o carnê
-            db.refresh(db_carne) # Refresha o carnê para ter os dados mais recentes
+def _build_carne_response(db_carne: models.Carne, today: date) -> schemas.CarneResponse:
+    # Modo "view": juros/multas e status são calculados em memória apenas para a resposta,
+    # sem gravar nada. A persistência fica a cargo de apply_interest_and_fines_bulk.
+    parcelas_response = [
+        {**schemas.ParcelaResponse.model_validate(p).model_dump(), **compute_parcela_view(p, today)}
+        for p in db_carne.parcelas
+    ]
 
     # Consolidar pagamentos de todas as parcelas em uma lista plana para o Carnê
     all_payments = []
-    if db_carne:
-        for parcela in db_carne.parcelas:
-            db.refresh(parcela) # Ensure parcela is fresh to get its payments
-            for pagamento in parcela.pagamentos:
-                db.refresh(pagamento) # Ensure payment is fresh
-                # Construct payment data as a dictionary that matches PagamentoResponseMin
-                payment_data = {
-                    "id_pagamento": pagamento.id_pagamento,
-                    "data_pagamento": pagamento.data_pagamento,
-                    "valor_pago": float(pagamento.valor_pago), # Converter Decimal para float para o schema de resposta
-                    "forma_pagamento": pagamento.forma_pagamento,
-                    "observacoes": pagamento.observacoes,
-                    "id_usuario_registro": pagamento.id_usuario_registro,
-                    "parcela_numero": parcela.numero_parcela,
-                    "parcela_data_vencimento": parcela.data_vencimento,
-                    "usuario_registro_nome": pagamento.usuario_registro.nome if pagamento.usuario_registro else 'N/A'
-                }
-                all_payments.append(payment_data)
+    for parcela in db_carne.parcelas:
+        for pagamento in parcela.pagamentos:
+            # Construct payment data as a dictionary that matches PagamentoResponseMin
+            payment_data = {
+                "id_pagamento": pagamento.id_pagamento,
+                "data_pagamento": pagamento.data_pagamento,
+                "valor_pago": float(pagamento.valor_pago), # Converter Decimal para float para o schema de resposta
+                "forma_pagamento": pagamento.forma_pagamento,
+                "observacoes": pagamento.observacoes,
+                "id_usuario_registro": pagamento.id_usuario_registro,
+                "parcela_numero": parcela.numero_parcela,
+                "parcela_data_vencimento": parcela.data_vencimento,
+                "usuario_registro_nome": pagamento.usuario_registro.nome if pagamento.usuario_registro else 'N/A'
+            }
+            all_payments.append(payment_data)
     
     # Ordenar pagamentos por data (mais recente primeiro)
     all_payments.sort(key=lambda p: p['data_pagamento'], reverse=True)
@@ -430,7 +754,7 @@ def get_carne(db: Session, carne_id: int, apply_interest: bool = True):
         "valor_parcela_sugerido": float(db_carne.valor_parcela_original) if db_carne.parcela_fixa else None,
         "data_primeiro_vencimento": db_carne.data_primeiro_vencimento,
         "frequencia_pagamento": db_carne.frequencia_pagamento,
-        "status_carne": db_carne.status_carne,
+        "status_carne": derive_carne_status(db_carne.status_carne, [p["status_parcela"] for p in parcelas_response]),
         "observacoes": db_carne.observacoes,
         "valor_entrada": float(db_carne.valor_entrada), # Converter Decimal para float para o schema de resposta
         "forma_pagamento_entrada": db_carne.forma_pagamento_entrada,
@@ -439,139 +763,198 @@ def get_carne(db: Session, carne_id: int, apply_interest: bool = True):
         "valor_parcela_original": float(db_carne.valor_parcela_original), # Converter Decimal para float para o schema de resposta
         "cliente": schemas.ClientResponseMin.model_validate(db_carne.cliente).model_dump(),
         "pagamentos": all_payments, # A lista consolidada de pagamentos
-        "parcelas": [schemas.ParcelaResponse.model_validate(p).model_dump() for p in db_carne.parcelas]
+        "parcelas": parcelas_response
     }
 
     # Finalmente, valide o dicionário inteiro com o esquema CarneResponse
     return schemas.CarneResponse.model_validate(carne_response_data)
 
-def get_carnes(
-    db: Session, skip: int = 0, limit: int = 100, id_cliente: Optional[int] = None,
-    status_carne: Optional[str] = None, data_vencimento_inicio: Optional[date] = None,
-    data_vencimento_fim: Optional[date] = None, search_query: Optional[str] = None
-):
-    query = db.query(models.Carne).options(
-        joinedload(models.Carne.cliente),
-        joinedload(models.Carne.parcelas).joinedload(models.Parcela.pagamentos).joinedload(models.Pagamento.usuario_registro) # Carrega pagamentos e usuários de registro
-    )
+def get_carne(db: Session, carne_id: int):
+    # populate_existing sobrescreve objetos já presentes na sessão com o que está no banco,
+    # no lugar dos antigos db.refresh() por carnê, parcela e pagamento
+    db_carne = db.query(models.Carne).options(
+        *_carne_response_options()
+    ).populate_existing().filter(models.Carne.id_carne == carne_id).first()
 
+    if not db_carne:
+        return None
+    return _build_carne_response(db_carne, date.today())
+
+def _filter_carnes_query(
+    db: Session, query, id_cliente: Optional[int] = None, status_carne: Optional[str] = None,
+    data_vencimento_inicio: Optional[date] = None, data_vencimento_fim: Optional[date] = None,
+    search_query: Optional[str] = None
+):
+    """Filtros da listagem de carnês; serve tanto para Query do ORM quanto para select()."""
     if id_cliente:
         query = query.filter(models.Carne.id_cliente == id_cliente)
     if status_carne:
         query = query.filter(models.Carne.status_carne == status_carne)
 
-    # Filtragem por data de vencimento precisa juntar com Parcelas
+    # Filtragem por data de vencimento: carnês com alguma parcela no intervalo (EXISTS, sem duplicar carnês)
     if data_vencimento_inicio or data_vencimento_fim:
-        query = query.join(models.Carne.parcelas) # Garante que estamos filtrando por parcelas do carnê
+        filtros_parcela = []
         if data_vencimento_inicio:
-            query = query.filter(models.Parcela.data_vencimento >= data_vencimento_inicio)
+            filtros_parcela.append(models.Parcela.data_vencimento >= data_vencimento_inicio)
         if data_vencimento_fim:
-            query = query.filter(models.Parcela.data_vencimento <= data_vencimento_fim)
-        query = query.distinct(models.Carne.id_carne) # Para evitar carnês duplicados se tiverem várias parcelas no range
+            filtros_parcela.append(models.Parcela.data_vencimento <= data_vencimento_fim)
+        query = query.filter(models.Carne.parcelas.any(*filtros_parcela))
         
     if search_query:
+        # Clientes que casam com o termo via IN (subconsulta que usa os índices trigram de cliente),
+        # no lugar de Carne.cliente.has(...) por linha de carnê
+        clientes_encontrados = select(models.Cliente.id_cliente).where(_client_search_filter(db, search_query))
         query = query.filter(
-            (models.Carne.descricao.ilike(f"%{search_query}%")) |
-            (models.Carne.cliente.has(models.Cliente.nome.ilike(f"%{search_query}%"))) |
-            (models.Carne.cliente.has(models.Cliente.cpf_cnpj.ilike(f"%{search_query}%")))
+            _text_search_filter(db, search_query, models.Carne.descricao) |
+            models.Carne.id_cliente.in_(clientes_encontrados)
         )
+    return query
+
+def _paginate_carnes_query(query, skip: int, limit: int, cursor: Optional[str] = None):
+    """Ordenação da listagem de carnês com paginação por offset ou por cursor."""
+    # Ordenação mais robusta: primeiro por data de venda (mais recente), depois por data de criação
+    # e por fim pelo id, que desempata e torna a ordem total (necessário para a paginação por cursor).
+    query = query.order_by(models.Carne.data_venda.desc().nullslast(), models.Carne.data_criacao.desc(), models.Carne.id_carne.desc())
+
+    if not cursor:
+        return query.offset(skip).limit(limit)
+
+    # Paginação por chave (data_venda, data_criacao, id_carne): continua após o último item da página anterior
+    data_venda, data_criacao, id_carne = decode_cursor(cursor, (date, datetime, int))
+    depois_na_mesma_data_venda = tuple_(models.Carne.data_criacao, models.Carne.id_carne) < tuple_(data_criacao, id_carne)
+    if data_venda is None:
+        # Carnês sem data de venda ficam no fim da lista
+        query = query.filter(models.Carne.data_venda.is_(None), depois_na_mesma_data_venda)
+    else:
+        query = query.filter(
+            (models.Carne.data_venda < data_venda) |
+            (models.Carne.data_venda.is_(None)) |
+            ((models.Carne.data_venda == data_venda) & depois_na_mesma_data_venda)
+        )
+    return query.limit(limit)
 
-    # Ordenação mais robusta: primeiro por data de venda (mais recente) e depois por data de criação.
-    query = query.order_by(models.Carne.data_venda.desc().nullslast(), models.Carne.data_criacao.desc())
-
-    db_carnes = query.offset(skip).limit(limit).all()
-
-    needs_overall_commit = False
-    for carne_obj in db_carnes:
-        # Aplicar juros/multas e atualizar status das parcelas individualmente
-        for parcela in carne_obj.parcelas:
-            original_status = parcela.status_parcela
-            original_juros = parcela.juros_multa
-            _apply_interest_and_fine_if_due(db, parcela)
-            if parcela.status_parcela != original_status or parcela.juros_multa != original_juros:
-                needs_overall_commit = True
-                db.add(parcela) # Marca parcela para commit
-
-        # Recalcular o status do carnê
-        if carne_obj.status_carne != 'Cancelado':
-            all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in carne_obj.parcelas)
-            has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in carne_obj.parcelas)
-            has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in carne_obj.parcelas)
-
-            new_status_carne = carne_obj.status_carne
-            if all_parcels_paid and carne_obj.parcelas:
-                new_status_carne = 'Quitado'
-            elif has_overdue_parcel:
-                new_status_carne = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_status_carne = 'Ativo' # Ou 'Parcialmente Ativo'
-            else:
-                new_status_carne = 'Ativo' # Se não tem atrasadas e não pagas, mas também não totalmente pagas
-            
-            if carne_obj.status_carne != new_status_carne:
-                carne_obj.status_carne = new_status_carne
-                needs_overall_commit = True
-                db.add(carne_obj) # Marca carnê para commit
-
-    if needs_overall_commit:
-        db.commit() # Commit uma vez para todas as mudanças coletadas
-
-    # Refresha todos os objetos para garantir que os dados retornados estão atualizados
-    final_carnes_list = []
-    for carne_obj in db_carnes:
-        db.refresh(carne_obj)
-        # Consolidar pagamentos para cada carnê na lista
-        all_payments_for_carne = []
-        if carne_obj:
-            for parcela in carne_obj.parcelas:
-                db.refresh(parcela) # Refresha a parcela também para ter pagamentos atualizados
-                for pagamento in parcela.pagamentos:
-                    db.refresh(pagamento) # Refresha o pagamento
-                    # Constrói o dicionário de pagamento
-                    payment_data = {
-                        "id_pagamento": pagamento.id_pagamento,
-                        "data_pagamento": pagamento.data_pagamento,
-                        "valor_pago": float(pagamento.valor_pago), # Converter Decimal para float para o schema de resposta
-                        "forma_pagamento": pagamento.forma_pagamento,
-                        "observacoes": pagamento.observacoes,
-                        "id_usuario_registro": pagamento.id_usuario_registro,
-                        "parcela_numero": parcela.numero_parcela,
-                        "parcela_data_vencimento": parcela.data_vencimento,
-                        "usuario_registro_nome": pagamento.usuario_registro.nome if pagamento.usuario_registro else 'N/A'
-                    }
-                    all_payments_for_carne.append(payment_data)
-        all_payments_for_carne.sort(key=lambda p: p['data_pagamento'], reverse=True)
-        
-        # Constrói o dicionário completo para CarneResponse para este carnê
-        carne_response_dict = {
-            "id_carne": carne_obj.id_carne,
-            "id_cliente": carne_obj.id_cliente,
-            "data_venda": carne_obj.data_venda,
-            "descricao": carne_obj.descricao,
-            "valor_total_original": float(carne_obj.valor_total_original), # Converter Decimal para float para o schema de resposta
-            "numero_parcelas": carne_obj.numero_parcelas,
-            # Use valor_parcela_original para o campo sugerido se for carnê fixo
-            "valor_parcela_sugerido": float(carne_obj.valor_parcela_original) if carne_obj.parcela_fixa else None,
-            "data_primeiro_vencimento": carne_obj.data_primeiro_vencimento,
-            "frequencia_pagamento": carne_obj.frequencia_pagamento,
-            "status_carne": carne_obj.status_carne,
-            "observacoes": carne_obj.observacoes,
-            "valor_entrada": float(carne_obj.valor_entrada), # Converter Decimal para float para o schema de resposta
-            "forma_pagamento_entrada": carne_obj.forma_pagamento_entrada,
-            "parcela_fixa": carne_obj.parcela_fixa,
-            "data_criacao": carne_obj.data_criacao,
-            "valor_parcela_original": float(carne_obj.valor_parcela_original), # Converter Decimal para float para o schema de resposta
-            "cliente": schemas.ClientResponseMin.model_validate(carne_obj.cliente).model_dump(),
-            "pagamentos": all_payments_for_carne, # Adiciona pagamentos consolidados
-            "parcelas": [schemas.ParcelaResponse.model_validate(p).model_dump() for p in carne_obj.parcelas]
-        }
-
-        final_carnes_list.append(schemas.CarneResponse.model_validate(carne_response_dict))
+def get_carnes_summary(
+    db: Session, skip: int = 0, limit: int = 100, id_cliente: Optional[int] = None,
+    status_carne: Optional[str] = None, data_vencimento_inicio: Optional[date] = None,
+    data_vencimento_fim: Optional[date] = None, search_query: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> List[schemas.CarneSummaryResponse]:
+    """
+    Listagem leve de carnês: colunas do carnê e do cliente mais os totais das parcelas, numa única
+    consulta, sem carregar parcelas nem pagamentos. Saldo e status são os valores armazenados
+    (mantidos pelas escritas e pelo job de acúmulo de juros).
+    """
+    # LATERAL: os totais são somados só para os carnês da página, pelo índice parcela(id_carne)
+    totais_parcelas = (
+        select(
+            func.sum(models.Parcela.valor_pago).label('total_pago'),
+            func.sum(models.Parcela.saldo_devedor).filter(
+                models.Parcela.status_parcela.notin_(STATUS_PARCELA_ENCERRADA)
+            ).label('saldo_devedor_total')
+        )
+        .where(models.Parcela.id_carne == models.Carne.id_carne)
+        .lateral('totais_parcelas')
+    )
+    query = (
+        select(
+            models.Carne.id_carne,
+            models.Carne.id_cliente,
+            models.Carne.data_venda,
+            models.Carne.descricao,
+            models.Carne.valor_total_original,
+            models.Carne.valor_entrada,
+            models.Carne.numero_parcelas,
+            models.Carne.data_primeiro_vencimento,
+            models.Carne.frequencia_pagamento,
+            models.Carne.status_carne,
+            models.Carne.parcela_fixa,
+            models.Carne.data_criacao,
+            models.Carne.total_parcelas,
+            models.Carne.parcelas_pagas,
+            models.Carne.parcelas_atrasadas,
+            models.Cliente.nome.label('cliente_nome'),
+            models.Cliente.cpf_cnpj.label('cliente_cpf_cnpj'),
+            func.coalesce(totais_parcelas.c.total_pago, 0).label('total_pago'),
+            func.coalesce(totais_parcelas.c.saldo_devedor_total, 0).label('saldo_devedor_total')
+        )
+        .join(models.Cliente, models.Carne.id_cliente == models.Cliente.id_cliente)
+        .outerjoin(totais_parcelas, true())
+    )
+    query = _filter_carnes_query(db, query, id_cliente, status_carne, data_vencimento_inicio, data_vencimento_fim, search_query)
+    query = _paginate_carnes_query(query, skip, limit, cursor)
+    return [schemas.CarneSummaryResponse.model_validate(row) for row in db.execute(query)]
 
-    return final_carnes_list
+def get_carnes(
+    db: Session, skip: int = 0, limit: int = 100, id_cliente: Optional[int] = None,
+    status_carne: Optional[str] = None, data_vencimento_inicio: Optional[date] = None,
+    data_vencimento_fim: Optional[date] = None, search_query: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    # Mesmo carregamento do detalhe: 3 consultas por página, independente do tamanho dos carnês
+    query = db.query(models.Carne).options(*_carne_response_options()).populate_existing()
 
+    query = _filter_carnes_query(db, query, id_cliente, status_carne, data_vencimento_inicio, data_vencimento_fim, search_query)
+    db_carnes = _paginate_carnes_query(query, skip, limit, cursor).all()
 
-def create_carne(db: Session, carne: schemas.CarneCreate):
+    today = date.today()
+    return [_build_carne_response(carne_obj, today) for carne_obj in db_carnes]
+
+
+def _due_dates(data_primeiro_vencimento: date, frequencia_pagamento: str, numero_parcelas: int) -> Tuple[date, ...]:
+    """
+    Vencimentos das parcelas (memoizado: simulações e importações repetem as mesmas sequências).
+    Só sequências de até MAX_PARCELAS_SIMULACAO parcelas entram no cache, o que limita a memória dele;
+    as mais longas (carnês gravados fora da simulação) são calculadas a cada chamada.
+    """
+    if numero_parcelas <= schemas.MAX_PARCELAS_SIMULACAO:
+        return _due_dates_cached(data_primeiro_vencimento, frequencia_pagamento, numero_parcelas)
+    return _compute_due_dates(data_primeiro_vencimento, frequencia_pagamento, numero_parcelas)
+
+def _compute_due_dates(data_primeiro_vencimento: date, frequencia_pagamento: str, numero_parcelas: int) -> Tuple[date, ...]:
+    # Cada data é calculada a partir da anterior, como sempre foi feito na criação do carnê
+    datas = []
+    current_due_date = data_primeiro_vencimento
+    for _ in range(numero_parcelas):
+        datas.append(current_due_date)
+        current_due_date = calculate_next_due_date(current_due_date, frequencia_pagamento)
+    return tuple(datas)
+
+_due_dates_cached = lru_cache(maxsize=4096)(_compute_due_dates)
+
+def _build_parcelas_schedule(
+    parcela_fixa: bool, numero_parcelas: int, valor_a_parcelar: Decimal, valor_parcela_original: Decimal,
+    data_primeiro_vencimento: date, frequencia_pagamento: str
+) -> List[dict]:
+    """
+    Cronograma inicial das parcelas (numero_parcela, valor_devido, data_vencimento), sem tocar no banco.
+    Carnê flexível: uma única parcela com todo o valor a parcelar. Carnê fixo: parcelas de
+    valor_parcela_original, com a última absorvendo a diferença de arredondamento.
+    Frequência inválida levanta ValueError (calculate_next_due_date).
+    """
+    if not parcela_fixa:
+        return [{"numero_parcela": 1, "valor_devido": valor_a_parcelar, "data_vencimento": data_primeiro_vencimento}]
+
+    cronograma = []
+    datas_vencimento = _due_dates(data_primeiro_vencimento, frequencia_pagamento, numero_parcelas)
+    for i in range(numero_parcelas):
+        parcela_valor_devido = valor_parcela_original
+        if i == numero_parcelas - 1:
+            soma_parcelas_anteriores = valor_parcela_original * i
+            parcela_valor_devido = valor_a_parcelar - soma_parcelas_anteriores
+            parcela_valor_devido = parcela_valor_devido.quantize(Decimal('0.01'))
+
+        if parcela_valor_devido < Decimal('0.00'):
+            parcela_valor_devido = Decimal('0.00')
+
+        cronograma.append({"numero_parcela": i + 1, "valor_devido": parcela_valor_devido, "data_vencimento": datas_vencimento[i]})
+    return cronograma
+
+def _plan_carne(carne: schemas.CarneCreate) -> dict:
+    """
+    Regras de criação de carnê sem tocar no banco: valida os valores e devolve numero_parcelas,
+    valor_parcela_original, frequencia_pagamento e o cronograma das parcelas. Erros viram HTTPException 400.
+    Usado por create_carne e pela importação em lote (carne_import).
+    """
     valor_total_original_decimal = carne.valor_total_original # Alterado: Pydantic já validou para Decimal
     valor_entrada_decimal = carne.valor_entrada # Alterado: Pydantic já validou para Decimal
     valor_a_parcelar = valor_total_original_decimal - valor_entrada_decimal
@@ -584,42 +967,9 @@ def create_carne(db: Session, carne: schemas.CarneCreate):
 
     # --- Lógica para parcela_fixa ---
     if not carne.parcela_fixa: # Carnê sem parcela fixa (flexível)
-        db_carne = models.Carne(
-            id_cliente=carne.id_cliente,
-            data_venda=carne.data_venda,
-            descricao=carne.descricao,
-            valor_total_original=valor_total_original_decimal,
-            numero_parcelas=1, # Para carnês flexíveis, sempre 1 parcela (total da dívida)
-            valor_parcela_original=valor_a_parcelar, # A "parcela original" é o total a ser pago após a entrada
-            data_primeiro_vencimento=carne.data_primeiro_vencimento,
-            frequencia_pagamento="única", # Ou "variável", um valor que indique flexibilidade
-            status_carne=carne.status_carne if carne.status_carne else "Ativo",
-            observacoes=carne.observacoes,
-            valor_entrada=valor_entrada_decimal,
-            forma_pagamento_entrada=carne.forma_pagamento_entrada,
-            parcela_fixa=False # Define como não fixa
-        )
-        db.add(db_carne)
-        db.commit()
-        db.refresh(db_carne)
-
-        # Cria a única parcela para o carnê flexível
-        db_parcela = models.Parcela(
-            id_carne=db_carne.id_carne,
-            numero_parcela=1,
-            valor_devido=valor_a_parcelar,
-            data_vencimento=carne.data_primeiro_vencimento,
-            valor_pago=Decimal('0.00'),
-            saldo_devedor=valor_a_parcelar,
-            status_parcela='Pendente',
-            juros_multa=Decimal('0.00'),
-            juros_multa_anterior_aplicada=Decimal('0.00'),
-            observacoes=None
-        )
-        db.add(db_parcela)
-        db.commit()
-        db.refresh(db_carne) # Refresh novamente para carregar as parcelas
-        return db_carne
+        numero_parcelas = 1 # Para carnês flexíveis, sempre 1 parcela (total da dívida)
+        valor_parcela_original_calculado = valor_a_parcelar # A "parcela original" é o total a ser pago após a entrada
+        frequencia_pagamento = "única" # Ou "variável", um valor que indique flexibilidade
     else: # Carnê com parcela fixa (comportamento anterior)
         if carne.numero_parcelas <= 0:
             if valor_a_parcelar != Decimal('0.00'):
@@ -636,58 +986,170 @@ def create_carne(db: Session, carne: schemas.CarneCreate):
                      valor_parcela_original_calculado = (valor_a_parcelar / carne.numero_parcelas).quantize(Decimal('0.01'))
                 else:
                      valor_parcela_original_calculado = Decimal('0.00')
+        numero_parcelas = carne.numero_parcelas
+        frequencia_pagamento = carne.frequencia_pagamento
 
-        db_carne = models.Carne(
-            id_cliente=carne.id_cliente,
-            data_venda=carne.data_venda,
-            descricao=carne.descricao,
-            valor_total_original=valor_total_original_decimal,
-            numero_parcelas=carne.numero_parcelas,
-            valor_parcela_original=valor_parcela_original_calculado,
-            data_primeiro_vencimento=carne.data_primeiro_vencimento,
-            frequencia_pagamento=carne.frequencia_pagamento,
-            status_carne=carne.status_carne if carne.status_carne else "Ativo",
-            observacoes=carne.observacoes,
-            valor_entrada=valor_entrada_decimal,
-            forma_pagamento_entrada=carne.forma_pagamento_entrada,
-            parcela_fixa=True # Define como fixa
+    # O cronograma é calculado antes de qualquer escrita: uma frequência inválida não deixa carnê pela metade
+    try:
+        cronograma = _build_parcelas_schedule(
+            bool(carne.parcela_fixa), numero_parcelas, valor_a_parcelar, valor_parcela_original_calculado,
+            carne.data_primeiro_vencimento, frequencia_pagamento
         )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "valor_a_parcelar": valor_a_parcelar,
+        "numero_parcelas": numero_parcelas,
+        "valor_parcela_original": valor_parcela_original_calculado,
+        "frequencia_pagamento": frequencia_pagamento,
+        "cronograma": cronograma,
+    }
+
+def preview_carne_schedule(carne: schemas.CarneSimulacao) -> dict:
+    """Simulação do carnê: o mesmo cronograma que create_carne gravaria, sem acessar o banco."""
+    plano = _plan_carne(carne)
+    return {
+        "numero_parcelas": plano["numero_parcelas"],
+        "valor_a_parcelar": plano["valor_a_parcelar"],
+        "valor_parcela_original": plano["valor_parcela_original"],
+        "frequencia_pagamento": plano["frequencia_pagamento"],
+        "valor_total_parcelas": sum((p["valor_devido"] for p in plano["cronograma"]), Decimal('0.00')),
+        "parcelas": plano["cronograma"],
+    }
+
+def preview_carne_schedules(cenarios: List[schemas.CarneSimulacao]) -> List[dict]:
+    """Várias simulações de uma vez; um cenário inválido vira um erro no seu item, sem afetar os demais."""
+    resultados = []
+    for indice, cenario in enumerate(cenarios):
+        try:
+            resultados.append({"indice": indice, "simulacao": preview_carne_schedule(cenario), "erro": None})
+        except HTTPException as e:
+            resultados.append({"indice": indice, "simulacao": None, "erro": e.detail})
+    return resultados
+
+def create_carne(db: Session, carne: schemas.CarneCreate):
+    plano = _plan_carne(carne)
+
+    db_carne = models.Carne(
+        id_cliente=carne.id_cliente,
+        data_venda=carne.data_venda,
+        descricao=carne.descricao,
+        valor_total_original=carne.valor_total_original,
+        numero_parcelas=plano["numero_parcelas"],
+        valor_parcela_original=plano["valor_parcela_original"],
+        data_primeiro_vencimento=carne.data_primeiro_vencimento,
+        frequencia_pagamento=plano["frequencia_pagamento"],
+        status_carne=carne.status_carne if carne.status_carne else "Ativo",
+        observacoes=carne.observacoes,
+        valor_entrada=carne.valor_entrada,
+        forma_pagamento_entrada=carne.forma_pagamento_entrada,
+        parcela_fixa=bool(carne.parcela_fixa),
+        total_parcelas=len(plano["cronograma"])
+    )
+    db_carne.parcelas = [
+        models.Parcela(
+            **item,
+            valor_pago=Decimal('0.00'),
+            saldo_devedor=item["valor_devido"],
+            status_parcela='Pendente',
+            juros_multa=Decimal('0.00'),
+            juros_multa_anterior_aplicada=Decimal('0.00'),
+            observacoes=None
+        )
+        for item in plano["cronograma"]
+    ]
+
+    # Uma única transação: INSERT do carnê e um INSERT de várias linhas (... RETURNING id_parcela) para
+    # todas as parcelas, no mesmo flush. Se algo falhar, nada fica gravado.
+    try:
         db.add(db_carne)
+        db.flush()
+        carne_id = db_carne.id_carne
+        abertura = ledger.opening_date(db_carne.data_venda)
+        ledger.insert_entries(db, [
+            ledger.entry(p.id_parcela, carne_id, ledger.TIPO_ABERTURA, abertura, valor_devido=p.valor_devido)
+            for p in db_carne.parcelas
+        ])
         db.commit()
-        db.refresh(db_carne)
-
-        current_due_date = carne.data_primeiro_vencimento
-        if carne.numero_parcelas > 0:
-            valor_a_parcelar_recalc = valor_total_original_decimal - valor_entrada_decimal
-            for i in range(carne.numero_parcelas):
-                parcela_valor_devido = valor_parcela_original_calculado
-                if i == carne.numero_parcelas - 1:
-                    soma_parcelas_anteriores = valor_parcela_original_calculado * i
-                    parcela_valor_devido = valor_a_parcelar_recalc - soma_parcelas_anteriores
-                    parcela_valor_devido = parcela_valor_devido.quantize(Decimal('0.01'))
-
-                if parcela_valor_devido < Decimal('0.00'):
-                    parcela_valor_devido = Decimal('0.00')
-
-                db_parcela = models.Parcela(
-                    id_carne=db_carne.id_carne,
-                    numero_parcela=i + 1,
-                    valor_devido=parcela_valor_devido,
-                    data_vencimento=current_due_date,
-                    valor_pago=Decimal('0.00'),
-                    saldo_devedor=parcela_valor_devido,
-                    status_parcela='Pendente',
-                    juros_multa=Decimal('0.00'),
-                    juros_multa_anterior_aplicada=Decimal('0.00'),
-                    observacoes=None
-                )
-                db.add(db_parcela)
-                current_due_date = calculate_next_due_date(current_due_date, db_carne.frequencia_pagamento)
-
-            db.commit()
-            db.refresh(db_carne) # Refresh novamente para carregar as parcelas
-        return db_carne
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_dashboard_cache()
+
+    # Recarrega com carnê, cliente, parcelas e pagamentos em número fixo de consultas
+    return db.query(models.Carne).options(
+        *_carne_response_options()
+    ).populate_existing().filter(models.Carne.id_carne == carne_id).first()
+
+
+def _reconcile_parcelas(db: Session, id_carne: int, cronograma: List[dict]) -> None:
+    """
+    Leva as parcelas de um carnê sem pagamentos ao cronograma desejado com o mínimo de escrita:
+    parcelas com o mesmo número são atualizadas só se algo mudou (mantendo o id_parcela), as que
+    faltam são inseridas e as que sobram removidas, cada grupo num único comando. As parcelas
+    resultantes ficam como recém-criadas (pendentes, sem juros). Contadores e status_carne são
+    ajustados por _track_parcela_status_changes; as variações de saldo vão para o razão (ajuste nas
+    atualizadas, abertura nas inseridas, encerramento nas removidas, lançado antes do DELETE para os
+    lançamentos delas ficarem no histórico). Não faz commit aqui, deixa para o caller.
+    """
+    colunas = (
+        'numero_parcela', 'valor_devido', 'data_vencimento', 'valor_pago', 'saldo_devedor',
+        'status_parcela', 'juros_multa', 'juros_multa_anterior_aplicada', 'observacoes'
+    )
+    existentes = {
+        p.numero_parcela: p
+        for p in db.execute(
+            select(models.Parcela.id_parcela, *(getattr(models.Parcela, c) for c in colunas))
+            .where(models.Parcela.id_carne == id_carne)
+        )
+    }
 
+    atualizar, inserir, mudancas, lancamentos = [], [], [], []
+    agora = datetime.now()
+    for item in cronograma:
+        desejado = {
+            **item,
+            "valor_pago": Decimal('0.00'),
+            "saldo_devedor": item["valor_devido"],
+            "status_parcela": 'Pendente',
+            "juros_multa": Decimal('0.00'),
+            "juros_multa_anterior_aplicada": Decimal('0.00'),
+            "observacoes": None,
+        }
+        atual = existentes.pop(item["numero_parcela"], None)
+        if atual is None:
+            inserir.append({"id_carne": id_carne, **desejado})
+            mudancas.append((None, 'Pendente'))
+        elif any(getattr(atual, coluna) != valor for coluna, valor in desejado.items()):
+            atualizar.append({"id_parcela": atual.id_parcela, **desejado})
+            mudancas.append((atual.status_parcela, 'Pendente'))
+            variacoes = {campo: desejado[campo] - getattr(atual, campo) for campo in ledger.CAMPOS_SALDO}
+            if any(variacoes.values()):
+                lancamentos.append(ledger.entry(atual.id_parcela, id_carne, ledger.TIPO_AJUSTE, agora, **variacoes))
+    remover = list(existentes.values())
+    mudancas.extend((p.status_parcela, None) for p in remover)
+
+    if remover:
+        ids_remover = [p.id_parcela for p in remover]
+        ledger.close_parcelas(db, models.Parcela.id_parcela.in_(ids_remover))
+        db.execute(
+            delete(models.Parcela).where(models.Parcela.id_parcela.in_(ids_remover)),
+            execution_options={"synchronize_session": False}
+        )
+    if atualizar:
+        db.execute(update(models.Parcela), atualizar) # UPDATE por chave primária, em lote (executemany)
+    if inserir:
+        # INSERT de várias linhas; os ids voltam na ordem das linhas para os lançamentos de abertura
+        ids_inseridos = db.scalars(
+            insert(models.Parcela).returning(models.Parcela.id_parcela, sort_by_parameter_order=True), inserir
+        ).all()
+        lancamentos.extend(
+            ledger.entry(id_parcela, id_carne, ledger.TIPO_ABERTURA, agora, valor_devido=linha["valor_devido"])
+            for id_parcela, linha in zip(ids_inseridos, inserir)
+        )
+    ledger.insert_entries(db, lancamentos)
+    _track_parcela_status_changes(db, id_carne, mudancas)
 
 def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
     db_carne = db.query(models.Carne).filter(models.Carne.id_carne == carne_id).first()
@@ -696,7 +1158,8 @@ def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
 
     has_payments = db.query(models.Pagamento).join(models.Parcela).filter(models.Parcela.id_carne == carne_id).first()
 
-    update_data = carne_update.model_dump(exclude_unset=False)
+    # Só os campos enviados: um campo ausente não deve virar None no carnê
+    update_data = carne_update.model_dump(exclude_unset=True)
 
     new_data_venda = update_data.get('data_venda', db_carne.data_venda)
     new_data_primeiro_vencimento = update_data.get('data_primeiro_vencimento', db_carne.data_primeiro_vencimento)
@@ -746,12 +1209,12 @@ def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
             # Calculate what the new valor_parcela_original would be if suggested value is applied
             valor_a_parcelar_recalc = db_carne.valor_total_original - db_carne.valor_entrada
             new_valor_parcela_calc = Decimal('0.00')
-            if carne_update.numero_parcelas > 0:
+            if update_data.get('numero_parcelas', db_carne.numero_parcelas) > 0:
                 if carne_update.valor_parcela_sugerido:
                     new_valor_parcela_calc = carne_update.valor_parcela_sugerido.quantize(Decimal('0.01'))
                 else:
                     if valor_a_parcelar_recalc > Decimal('0.00'):
-                        new_valor_parcela_calc = (valor_a_parcelar_recalc / carne_update.numero_parcelas).quantize(Decimal('0.01'))
+                        new_valor_parcela_calc = (valor_a_parcelar_recalc / update_data.get('numero_parcelas', db_carne.numero_parcelas)).quantize(Decimal('0.01'))
             
             # Compare with current stored valor_parcela_original
             if db_carne.valor_parcela_original != new_valor_parcela_calc:
@@ -770,11 +1233,8 @@ def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
             setattr(db_carne, key, value)
 
     # Lógica de regeneração de parcelas
+    cronograma = None
     if regenerate_parcels_flag and not has_payments:
-        # Excluir parcelas existentes
-        db.query(models.Parcela).filter(models.Parcela.id_carne == carne_id).delete(synchronize_session='fetch')
-        db.flush() # Garante que as deleções sejam processadas antes de adicionar novas
-
         valor_total_original_decimal = db_carne.valor_total_original # Alterado: Pydantic já validou para Decimal
         valor_entrada_decimal = db_carne.valor_entrada # Alterado: Pydantic já validou para Decimal
         valor_a_parcelar = valor_total_original_decimal - valor_entrada_decimal
@@ -784,20 +1244,6 @@ def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
             db_carne.numero_parcelas = 1
             db_carne.valor_parcela_original = valor_a_parcelar.quantize(Decimal('0.01'))
             db_carne.frequencia_pagamento = "única" # Ou "variável"
-
-            db_parcela_nova = models.Parcela(
-                id_carne=db_carne.id_carne,
-                numero_parcela=1,
-                valor_devido=valor_a_parcelar,
-                data_vencimento=db_carne.data_primeiro_vencimento,
-                valor_pago=Decimal('0.00'),
-                saldo_devedor=valor_a_parcelar,
-                status_parcela='Pendente',
-                juros_multa=Decimal('0.00'),
-                juros_multa_anterior_aplicada=Decimal('0.00'),
-                observacoes=None
-            )
-            db.add(db_parcela_nova)
         else: # Se o carnê é fixo (ou mudou para fixo)
             if db_carne.numero_parcelas <= 0:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Para carnês com parcela fixa, o número de parcelas deve ser maior que zero.")
@@ -813,46 +1259,41 @@ def update_carne(db: Session, carne_id: int, carne_update: schemas.CarneCreate):
             else:
                 valor_parcela_original_calculado = valor_parcela_sugerido_decimal
 
-
             db_carne.valor_parcela_original = valor_parcela_original_calculado # ATUALIZA O VALOR NO OBJETO DO CARNÊ
 
-            current_due_date = db_carne.data_primeiro_vencimento
-            for i in range(db_carne.numero_parcelas):
-                parcela_valor_devido = valor_parcela_original_calculado
-                if i == db_carne.numero_parcelas - 1:
-                    soma_parcelas_anteriores = valor_parcela_original_calculado * i
-                    parcela_valor_devido = valor_a_parcelar - soma_parcelas_anteriores
-                    parcela_valor_devido = parcela_valor_devido.quantize(Decimal('0.01'))
-
-                if parcela_valor_devido < Decimal('0.00'):
-                    parcela_valor_devido = Decimal('0.00')
-
-                db_parcela = models.Parcela(
-                    id_carne=db_carne.id_carne,
-                    numero_parcela=i + 1,
-                    valor_devido=parcela_valor_devido,
-                    data_vencimento=current_due_date,
-                    valor_pago=Decimal('0.00'),
-                    saldo_devedor=parcela_valor_devido,
-                    status_parcela='Pendente',
-                    juros_multa=Decimal('0.00'),
-                    juros_multa_anterior_aplicada=Decimal('0.00'),
-                    observacoes=None
-                )
-                db.add(db_parcela)
-                current_due_date = calculate_next_due_date(current_due_date, db_carne.frequencia_pagamento)
-
-            db.commit()
-            db.refresh(db_carne) # Refresh novamente para carregar as parcelas
-        return db_carne
-
-
-def delete_carne(db: Session, carne_id: int):
+        # Mesmo cronograma que create_carne geraria para os novos valores
+        try:
+            cronograma = _build_parcelas_schedule(
+                bool(db_carne.parcela_fixa), db_carne.numero_parcelas, valor_a_parcelar,
+                db_carne.valor_parcela_original, db_carne.data_primeiro_vencimento, db_carne.frequencia_pagamento
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Campos do carnê e ajuste das parcelas na mesma transação
+    try:
+        db.flush()
+        if cronograma is not None:
+            _reconcile_parcelas(db, carne_id, cronograma)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_dashboard_cache()
+
+    return db.query(models.Carne).options(
+        *_carne_response_options()
+    ).populate_existing().filter(models.Carne.id_carne == carne_id).first()
+
+def delete_carne(db: Session, carne_id: int, usuario_id: Optional[int] = None):
     db_carne = db.query(models.Carne).filter(models.Carne.id_carne == carne_id).first()
     if not db_carne:
         return None
+    # Os lançamentos do razão ficam (sem o vínculo com o carnê), com o encerramento de cada parcela
+    ledger.close_parcelas(db, models.Parcela.id_carne == carne_id, id_usuario=usuario_id)
     db.delete(db_carne)
     db.commit()
+    invalidate_dashboard_cache()
     return True
 
 # --- Operações de Parcela ---
@@ -860,27 +1301,33 @@ def get_parcela(db: Session, parcela_id: int):
     return db.query(models.Parcela).filter(models.Parcela.id_parcela == parcela_id).first()
 
 def get_parcelas_by_carne_id(db: Session, carne_id: int):
-    parcelas = db.query(models.Parcela).filter(models.Parcela.id_carne == carne_id).all()
-    for parcela in parcelas:
-        _apply_interest_and_fine_if_due(db, parcela)
-    db.commit()
-    return parcelas
+    # Somente leitura: juros/multas calculados em memória para a resposta, sem commit
+    today = date.today()
+    parcelas = db.query(models.Parcela).filter(models.Parcela.id_carne == carne_id).order_by(models.Parcela.numero_parcela).all()
+    return [
+        schemas.ParcelaResponse.model_validate({**schemas.ParcelaResponse.model_validate(p).model_dump(), **compute_parcela_view(p, today)})
+        for p in parcelas
+    ]
 
-def update_parcela(db: Session, parcela_id: int, parcela_update: schemas.ParcelaUpdate):
+def update_parcela(db: Session, parcela_id: int, parcela_update: schemas.ParcelaUpdate, usuario_id: Optional[int] = None):
     db_parcela = get_parcela(db, parcela_id)
     if not db_parcela:
         return None
+    status_anterior = db_parcela.status_parcela
+    antes = ledger.balance_fields(db_parcela)
     update_data = parcela_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_parcela, key, value)
     db.add(db_parcela)
-    db.commit()
-    db.refresh(db_parcela)
+    ledger.record(db, db_parcela, ledger.TIPO_AJUSTE, antes, id_usuario=usuario_id) # Edição manual de valores
     _apply_interest_and_fine_if_due(db, db_parcela) # Re-aplica juros caso a atualização afete o cálculo
+    _track_parcela_status_changes(db, db_parcela.id_carne, [(status_anterior, db_parcela.status_parcela)])
     db.commit()
+    invalidate_dashboard_cache()
+    db.refresh(db_parcela)
     return db_parcela
 
-def renegotiate_parcela(db: Session, parcela_id: int, renegotiation_data: schemas.ParcelaRenegotiate):
+def renegotiate_parcela(db: Session, parcela_id: int, renegotiation_data: schemas.ParcelaRenegotiate, usuario_id: Optional[int] = None):
     db_parcela = db.query(models.Parcela).filter(models.Parcela.id_parcela == parcela_id).first()
     if not db_parcela:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela não encontrada para renegociação.")
@@ -889,6 +1336,9 @@ def renegotiate_parcela(db: Session, parcela_id: int, renegotiation_data: schema
     if db_parcela.status_parcela in ['Paga', 'Paga com Atraso']:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Não é possível renegociar uma parcela já quitada.")
     
+    status_anterior = db_parcela.status_parcela
+    antes = ledger.balance_fields(db_parcela)
+
     # Atualiza a data de vencimento
     db_parcela.data_vencimento = renegotiation_data.new_data_vencimento
 
@@ -911,54 +1361,47 @@ def renegotiate_parcela(db: Session, parcela_id: int, renegotiation_data: schema
 
     # Define o status após renegociação. Por padrão, "Renegociada" ou "Pendente"
     db_parcela.status_parcela = renegotiation_data.status_parcela_apos_renegociacao or 'Renegociada'
-    
     db.add(db_parcela)
-    db.commit()
-    db.refresh(db_parcela)
+    ledger.record(db, db_parcela, ledger.TIPO_RENEGOCIACAO, antes, id_usuario=usuario_id)
 
     # Aplica juros/multas imediatamente com base na nova data e valor (se aplicável)
     # Isso atualizará o saldo_devedor final.
     _apply_interest_and_fine_if_due(db, db_parcela)
+
+    # Atualiza contadores e status do carnê pai sem reler as parcelas
+    _track_parcela_status_changes(db, db_parcela.id_carne, [(status_anterior, db_parcela.status_parcela)])
     db.commit()
+    invalidate_dashboard_cache()
     db.refresh(db_parcela) # Refresh final para ter certeza que todos os campos estão atualizados
 
-    # Atualiza o status do carnê pai se necessário
-    db_carne = db.query(models.Carne).filter(models.Carne.id_carne == db_parcela.id_carne).first()
-    if db_carne:
-        # Recalcula o status do carnê com base no status de todas as suas parcelas
-        all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in db_carne.parcelas)
-        has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in db_carne.parcelas)
-        has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in db_carne.parcelas)
-
-        if db_carne.status_carne != 'Cancelado': # Não muda o status se o carnê foi cancelado
-            if all_parcels_paid and db_carne.parcelas:
-                db_carne.status_carne = 'Quitado'
-            elif has_overdue_parcel:
-                db_carne.status_carne = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                db_carne.status_carne = 'Ativo' # Ou 'Parcialmente Ativo'
-            else:
-                db_carne.status_carne = 'Ativo'
-        db.add(db_carne)
-        db.commit()
-        db.refresh(db_carne)
-        
     return db_parcela
 
 # --- Operações de Pagamento ---
-def create_pagamento(db: Session, pagamento: schemas.PagamentoCreate, usuario_id: int):
-    db_parcela = db.query(models.Parcela).filter(models.Parcela.id_parcela == pagamento.id_parcela).first()
-    if not db_parcela:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela não encontrada.")
-
-    valor_pago_decimal = pagamento.valor_pago # Já é Decimal
+def _apply_pagamento(db: Session, db_parcela: models.Parcela, pagamento: schemas.PagamentoCreate, usuario_id: int) -> models.Pagamento:
+    """
+    Aplica um pagamento a uma parcela já carregada: valor pago, juros/multa, saldo, status e o
+    registro em Pagamento, com os lançamentos no razão. Não mexe nos contadores do carnê nem faz commit,
+    deixa para o caller.
+    """
+    # Cria o registro de pagamento
+    db_pagamento = models.Pagamento(
+        id_parcela=db_parcela.id_parcela,
+        data_pagamento=pagamento.data_pagamento if pagamento.data_pagamento else datetime.now(),
+        valor_pago=pagamento.valor_pago,
+        forma_pagamento=pagamento.forma_pagamento,
+        observacoes=pagamento.observacoes,
+        id_usuario_registro=usuario_id
+    )
+    db.add(db_pagamento) # Marca o pagamento para ser salvo
 
-    if valor_pago_decimal <= 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Valor pago deve ser maior que zero.")
+    # Atualiza o valor pago da parcela e lança o pagamento na data em que foi feito
+    antes = ledger.balance_fields(db_parcela)
+    db_parcela.valor_pago += pagamento.valor_pago
+    ledger.record(
+        db, db_parcela, ledger.TIPO_PAGAMENTO, antes,
+        data_lancamento=db_pagamento.data_pagamento, pagamento=db_pagamento, id_usuario=usuario_id
+    )
 
-    # Atualiza o valor pago da parcela e recalcula o saldo
-    db_parcela.valor_pago += valor_pago_decimal
-    
     # Recalcula saldo devedor
     _apply_interest_and_fine_if_due(db, db_parcela) # Garante que juros/multa e status estão atualizados
 
@@ -967,62 +1410,181 @@ def create_pagamento(db: Session, pagamento: schemas.PagamentoCreate, usuario_id
         db_parcela.data_pagamento_completo = date.today() # Define a data de quitação
 
     db.add(db_parcela) # Marca a parcela para ser salva
+    return db_pagamento
 
-    # Cria o registro de pagamento
-    db_pagamento = models.Pagamento(
-        id_parcela=pagamento.id_parcela,
-        data_pagamento=pagamento.data_pagamento if pagamento.data_pagamento else datetime.now(),
-        valor_pago=valor_pago_decimal,
-        forma_pagamento=pagamento.forma_pagamento,
-        observacoes=pagamento.observacoes,
-        id_usuario_registro=usuario_id
-    )
-    db.add(db_pagamento) # Marca o pagamento para ser salvo
-    db.commit() # Salva tanto a parcela quanto o pagamento
-    
-    db.refresh(db_parcela) # Refresh para ter a parcela com os dados atualizados
-
-    # Atualiza o status do carnê pai com base no status das parcelas
-    db_carne = db.query(models.Carne).filter(models.Carne.id_carne == db_parcela.id_carne).first()
-    if db_carne:
-        needs_carne_status_update = False
-        all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in db_carne.parcelas)
-        has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in db_carne.parcelas)
-        has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in db_carne.parcelas)
-
-        new_carne_status = db_carne.status_carne
-        if db_carne.status_carne != 'Cancelado':
-            if all_parcels_paid and db_carne.parcelas:
-                new_carne_status = 'Quitado'
-            elif has_overdue_parcel:
-                new_carne_status = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_carne_status = 'Ativo'
-            else:
-                new_carne_status = 'Ativo' # Se não tem atrasadas e não pagas, mas também não totalmente pagas
-        
-        if new_carne_status != db_carne.status_carne:
-            db_carne.status_carne = new_carne_status
-            db.add(db_carne)
-            db.commit() # Commit do status do carnê
-            db.refresh(db_carne)
+def create_pagamento(db: Session, pagamento: schemas.PagamentoCreate, usuario_id: int):
+    # SELECT ... FOR UPDATE: dois caixas pagando a mesma parcela ao mesmo tempo são serializados aqui;
+    # o segundo espera o commit do primeiro e relê valor_pago/status já atualizados (sem perder atualização)
+    db_parcela = db.query(models.Parcela).filter(
+        models.Parcela.id_parcela == pagamento.id_parcela
+    ).with_for_update().populate_existing().first()
+    if not db_parcela:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela não encontrada.")
+
+    valor_pago_decimal = pagamento.valor_pago # Já é Decimal
+
+    if valor_pago_decimal <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Valor pago deve ser maior que zero.")
+
+    status_anterior = db_parcela.status_parcela
+    db_pagamento = _apply_pagamento(db, db_parcela, pagamento, usuario_id)
+
+    # Atualiza contadores e status do carnê pai sem reler as parcelas
+    _track_parcela_status_changes(db, db_parcela.id_carne, [(status_anterior, db_parcela.status_parcela)])
+    db.commit() # Salva parcela, pagamento e carnê numa única transação
+    invalidate_dashboard_cache()
 
     db.refresh(db_pagamento) # Refresh do pagamento para garantir o retorno correto
     return db_pagamento
 
-def delete_pagamento(db: Session, pagamento_id: int):
-    db_pagamento = db.query(models.Pagamento).filter(models.Pagamento.id_pagamento == pagamento_id).first()
+def create_pagamentos_batch(db: Session, pagamentos: List[schemas.PagamentoCreate], usuario_id: int) -> List[dict]:
+    """
+    Lança vários pagamentos (fechamento de caixa) numa única transação. As parcelas envolvidas são
+    travadas com SELECT ... FOR UPDATE em ordem de id_parcela, para dois lotes concorrentes não se
+    bloquearem mutuamente; os pagamentos são aplicados na ordem recebida (vários na mesma parcela
+    se acumulam) e cada carnê afetado tem contadores e status ajustados uma única vez.
+    Itens inválidos (parcela inexistente, valor <= 0) voltam com erro e não impedem os demais.
+    Retorna um resultado por item, na ordem recebida: {indice, pagamento, erro}.
+    """
+    ids_parcelas = sorted({p.id_parcela for p in pagamentos})
+    parcelas = {
+        p.id_parcela: p
+        for p in db.query(models.Parcela)
+        .filter(models.Parcela.id_parcela.in_(ids_parcelas))
+        .order_by(models.Parcela.id_parcela)
+        .with_for_update()
+        .populate_existing()
+    }
+
+    resultados = []
+    status_inicial = {} # id_parcela -> status antes do lote
+    try:
+        for indice, pagamento in enumerate(pagamentos):
+            db_parcela = parcelas.get(pagamento.id_parcela)
+            if db_parcela is None:
+                resultados.append({"indice": indice, "pagamento": None, "erro": "Parcela não encontrada."})
+                continue
+            if pagamento.valor_pago <= 0:
+                resultados.append({"indice": indice, "pagamento": None, "erro": "Valor pago deve ser maior que zero."})
+                continue
+            status_inicial.setdefault(db_parcela.id_parcela, db_parcela.status_parcela)
+            resultados.append({"indice": indice, "pagamento": _apply_pagamento(db, db_parcela, pagamento, usuario_id), "erro": None})
+
+        # Uma atualização de contadores por carnê, em ordem de id_carne (mesma ordem em todos os lotes)
+        mudancas_por_carne = {}
+        for id_parcela, status_anterior in status_inicial.items():
+            db_parcela = parcelas[id_parcela]
+            mudancas_por_carne.setdefault(db_parcela.id_carne, []).append((status_anterior, db_parcela.status_parcela))
+        db.flush()
+        for id_carne in sorted(mudancas_por_carne):
+            _track_parcela_status_changes(db, id_carne, mudancas_por_carne[id_carne])
+        ids_pagamentos = [r["pagamento"].id_pagamento for r in resultados if r["pagamento"] is not None]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if ids_pagamentos:
+        invalidate_dashboard_cache()
+        # Recarrega os pagamentos criados num único SELECT, em vez de um refresh por item
+        db.query(models.Pagamento).filter(models.Pagamento.id_pagamento.in_(ids_pagamentos)).populate_existing().all()
+    return resultados
+
+def pay_carne(db: Session, carne_id: int, pagamento: schemas.PagamentoCarneCreate, usuario_id: int) -> Optional[dict]:
+    """
+    Distribui um único valor entre as parcelas em aberto do carnê, da mais antiga para a mais nova
+    (data de vencimento, depois número), cobrindo juros/multa de cada uma antes de passar à seguinte.
+    Gera um Pagamento por parcela atingida, como se cada parte fosse lançada em create_pagamento,
+    tudo numa única transação e com um único ajuste de contadores/status do carnê.
+    Retorna None se o carnê não existir.
+    """
+    db_carne = db.query(models.Carne).filter(models.Carne.id_carne == carne_id).first()
+    if not db_carne:
+        return None
+    if db_carne.status_carne == 'Cancelado':
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Não é possível registrar pagamento em um carnê cancelado.")
+
+    # Mesma ordem de travamento das outras rotas de pagamento (id_parcela), depois ordena para a alocação
+    parcelas = db.query(models.Parcela).filter(
+        models.Parcela.id_carne == carne_id,
+        models.Parcela.status_parcela.notin_(STATUS_PARCELA_ENCERRADA)
+    ).order_by(models.Parcela.id_parcela).with_for_update().populate_existing().all()
+    status_inicial = {p.id_parcela: p.status_parcela for p in parcelas}
+
+    em_aberto = []
+    for db_parcela in sorted(parcelas, key=lambda p: (p.data_vencimento, p.numero_parcela)):
+        _apply_interest_and_fine_if_due(db, db_parcela) # Juros/multa atualizados para hoje entram no valor devido
+        valor_em_aberto = db_parcela.valor_devido - db_parcela.valor_pago + db_parcela.juros_multa
+        if valor_em_aberto > Decimal('0.00'):
+            em_aberto.append((db_parcela, valor_em_aberto))
+
+    total_em_aberto = sum((valor for _, valor in em_aberto), Decimal('0.00'))
+    if pagamento.valor_pago > total_em_aberto:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Valor pago ({pagamento.valor_pago}) maior que o saldo em aberto do carnê ({total_em_aberto})."
+        )
+
+    pagamentos = []
+    restante = pagamento.valor_pago
+    for db_parcela, valor_em_aberto in em_aberto:
+        if restante <= Decimal('0.00'):
+            break
+        parte = min(restante, valor_em_aberto)
+        pagamentos.append(_apply_pagamento(db, db_parcela, schemas.PagamentoCreate(
+            id_parcela=db_parcela.id_parcela,
+            valor_pago=parte,
+            forma_pagamento=pagamento.forma_pagamento,
+            observacoes=pagamento.observacoes,
+            data_pagamento=pagamento.data_pagamento
+        ), usuario_id))
+        restante -= parte
+
+    saldo_restante = sum(
+        (max(p.valor_devido - p.valor_pago + p.juros_multa, Decimal('0.00')) for p in parcelas), Decimal('0.00')
+    )
+    try:
+        db.flush()
+        # Parcelas que só tiveram juros/multa atualizados também podem ter mudado de status
+        _track_parcela_status_changes(db, carne_id, [(status_inicial[p.id_parcela], p.status_parcela) for p in parcelas])
+        ids_pagamentos = [p.id_pagamento for p in pagamentos]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_dashboard_cache()
+
+    # Recarrega os pagamentos criados num único SELECT
+    db.query(models.Pagamento).filter(models.Pagamento.id_pagamento.in_(ids_pagamentos)).populate_existing().all()
+    return {
+        "id_carne": carne_id,
+        "valor_pago": pagamento.valor_pago,
+        "saldo_devedor_restante": saldo_restante,
+        "pagamentos": pagamentos,
+    }
+
+def delete_pagamento(db: Session, pagamento_id: int, usuario_id: Optional[int] = None):
+    # Trava o pagamento e depois a parcela: um estorno concorrente do mesmo pagamento espera e, após o
+    # commit do primeiro, não encontra mais a linha (não estorna duas vezes)
+    db_pagamento = db.query(models.Pagamento).filter(
+        models.Pagamento.id_pagamento == pagamento_id
+    ).with_for_update().populate_existing().first()
     if not db_pagamento:
         return False
 
-    db_parcela = db.query(models.Parcela).filter(models.Parcela.id_parcela == db_pagamento.id_parcela).first()
+    db_parcela = db.query(models.Parcela).filter(
+        models.Parcela.id_parcela == db_pagamento.id_parcela
+    ).with_for_update().populate_existing().first()
     if not db_parcela:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela associada ao pagamento não encontrada.")
 
     # Reverte o valor pago da parcela
+    status_anterior = db_parcela.status_parcela
+    antes = ledger.balance_fields(db_parcela)
     db_parcela.valor_pago -= db_pagamento.valor_pago
     if db_parcela.valor_pago < Decimal('0.00'):
         db_parcela.valor_pago = Decimal('0.00')
+    # O lançamento do pagamento fica no razão; o estorno entra como um novo lançamento, com a data de hoje
+    ledger.record(db, db_parcela, ledger.TIPO_ESTORNO, antes, id_pagamento=db_pagamento.id_pagamento, id_usuario=usuario_id)
 
     # Remove a data de pagamento completo se o estorno fizer a parcela voltar a dever
     if db_parcela.saldo_devedor <= Decimal('0.00') and db_parcela.data_pagamento_completo:
@@ -1033,171 +1595,165 @@ def delete_pagamento(db: Session, pagamento_id: int):
     
     db.delete(db_pagamento)
     db.add(db_parcela) # Salva as alterações na parcela
-    db.commit()
 
-    db.refresh(db_parcela) # Refresh para ter a parcela com os dados atualizados
-    
-    # Atualiza o status do carnê pai
-    db_carne = db.query(models.Carne).filter(models.Carne.id_carne == db_parcela.id_carne).first()
-    if db_carne:
-        needs_carne_status_update = False
-        all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in db_carne.parcelas)
-        has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in db_carne.parcelas)
-        has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in db_carne.parcelas)
-
-        new_carne_status = db_carne.status_carne
-        if db_carne.status_carne != 'Cancelado':
-            if all_parcels_paid and db_carne.parcelas:
-                new_carne_status = 'Quitado'
-            elif has_overdue_parcel:
-                new_carne_status = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_carne_status = 'Ativo'
-            else:
-                new_carne_status = 'Ativo' # Se não tem atrasadas e não pagas, mas também não totalmente pagas
-        
-        if new_carne_status != db_carne.status_carne:
-            db_carne.status_carne = new_carne_status
-            db.add(db_carne)
-            db.commit() # Commit do status do carnê
-            db.refresh(db_carne)
+    # Atualiza contadores e status do carnê pai sem reler as parcelas
+    _track_parcela_status_changes(db, db_parcela.id_carne, [(status_anterior, db_parcela.status_parcela)])
+    db.commit()
+    invalidate_dashboard_cache()
 
     return True
 
-# --- Relatórios e Dashboard ---
-def get_dashboard_summary(db: Session):
-    # Fetch all relevant data to ensure accurate calculation and status updates
-    all_carnes = db.query(models.Carne).options(
-        joinedload(models.Carne.parcelas).joinedload(models.Parcela.pagamentos)
-    ).all()
+# --- Razão das Parcelas ---
+def get_carne_ledger(db: Session, carne_id: int, parcela_id: Optional[int] = None) -> List[models.LancamentoParcela]:
+    query = db.query(models.LancamentoParcela).filter(models.LancamentoParcela.id_carne == carne_id)
+    if parcela_id is not None:
+        query = query.filter(models.LancamentoParcela.id_parcela == parcela_id)
+    return query.order_by(models.LancamentoParcela.data_lancamento, models.LancamentoParcela.id_lancamento).all()
 
-    needs_commit = False
-    for carne_obj in all_carnes:
-        # First, ensure all parcels have correct juros, multa, and saldo_devedor
-        for parcela in carne_obj.parcelas:
-            original_juros_multa = parcela.juros_multa
-            original_saldo_devedor = parcela.saldo_devedor
-            original_status_parcela = parcela.status_parcela
-            _apply_interest_and_fine_if_due(db, parcela)
-            if (parcela.juros_multa != original_juros_multa or 
-                parcela.saldo_devedor != original_saldo_devedor or 
-                parcela.status_parcela != original_status_parcela):
-                needs_commit = True
-                db.add(parcela) # Mark for saving
-
-        # Then, update the carne status based on its updated parcels
-        if carne_obj.status_carne != 'Cancelado':
-            all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in carne_obj.parcelas)
-            has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in carne_obj.parcelas)
-            has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in carne_obj.parcelas)
-
-            new_carne_status = carne_obj.status_carne
-            if all_parcels_paid and carne_obj.parcelas:
-                new_carne_status = 'Quitado'
-            elif has_overdue_parcel:
-                new_carne_status = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_carne_status = 'Ativo'
-            else:
-                new_carne_status = 'Ativo' # Default if not overdue, not partially paid, and not fully paid yet
-            
-            if carne_obj.status_carne != new_carne_status:
-                carne_obj.status_carne = new_carne_status
-                needs_commit = True
-                db.add(carne_obj) # Mark for saving
-
-    if needs_commit:
-        db.commit() # Commit all changes accumulated above
-        # Refresh all_carnes to ensure local objects reflect the committed state
-        db.expire_all() # Invalidate all loaded objects to force a fresh load
-        all_carnes = db.query(models.Carne).options(
-            joinedload(models.Carne.parcelas).joinedload(models.Parcela.pagamentos)
-        ).all()
+def get_carne_balance_as_of(db: Session, carne_id: int, data_referencia: date) -> Optional[dict]:
+    """Saldo do carnê e de cada parcela no fim de data_referencia, calculado pelo razão."""
+    if not db.query(models.Carne.id_carne).filter(models.Carne.id_carne == carne_id).first():
+        return None
+    parcelas = ledger.balances_as_of(db, data_referencia, id_carne=carne_id)
+    return {
+        "id_carne": carne_id,
+        "data_referencia": data_referencia,
+        **{
+            campo: sum((p[campo] for p in parcelas), Decimal('0.00'))
+            for campo in ('valor_devido', 'valor_pago', 'juros_multa', 'saldo_devedor')
+        },
+        "parcelas": parcelas,
+    }
 
-    # Now, perform aggregations on the updated data
-    total_clientes = db.query(models.Cliente).count()
-    total_carnes = db.query(models.Carne).count()
-    total_carnes_ativos = db.query(models.Carne).filter(models.Carne.status_carne == 'Ativo').count()
-    total_carnes_quitados = db.query(models.Carne).filter(models.Carne.status_carne == 'Quitado').count()
-    total_carnes_atrasados = db.query(models.Carne).filter(models.Carne.status_carne == 'Em Atraso').count()
+# --- Relatórios e Dashboard ---
+def _dashboard_cache_key() -> str:
+    # O resumo depende da data (recebido hoje/mês, vencimentos em 7 dias), então a data entra na chave
+    return f"dashboard_summary:{date.today().isoformat()}"
+
+def invalidate_dashboard_cache():
+    """Descarta o resumo do dashboard em cache. Chamado após commits que alteram os números do resumo."""
+    dashboard_cache.invalidate(_dashboard_cache_key())
+
+def get_dashboard_summary_cached(db: Session) -> schemas.DashboardSummaryResponse:
+    # O cache guarda o dict serializável, não o objeto Pydantic, para funcionar com backends remotos
+    summary = dashboard_cache.get_or_set(
+        _dashboard_cache_key(),
+        lambda: get_dashboard_summary(db).model_dump(mode="json")
+    )
+    return schemas.DashboardSummaryResponse(**summary)
 
-    total_divida_geral_aberta = Decimal('0.00')
-    parcelas_atrasadas = 0
-    parcelas_a_vencer_7dias = 0
+def get_dashboard_summary(db: Session):
+    # Juros/multas e status são mantidos pelo job de acúmulo (apply_interest_and_fines_bulk);
+    # aqui apenas agregamos os valores armazenados, num único SELECT sem carregar objetos ORM.
     today = date.today()
     seven_days_from_now = today + timedelta(days=7)
-
-    for carne_obj in all_carnes:
-        for parcela in carne_obj.parcelas:
-            # Ensure the parcela status is based on the updated values
-            if parcela.status_parcela not in ['Paga', 'Paga com Atraso', 'Cancelada']:
-                total_divida_geral_aberta += parcela.saldo_devedor
-                if parcela.status_parcela == 'Atrasada':
-                    parcelas_atrasadas += 1
-                elif today <= parcela.data_vencimento <= seven_days_from_now:
-                    parcelas_a_vencer_7dias += 1
-
-    # Pagamentos hoje
-    start_of_today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_today = datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999)
-    total_recebido_hoje = db.query(func.sum(models.Pagamento.valor_pago)).filter(
-        models.Pagamento.data_pagamento >= start_of_today,
-        models.Pagamento.data_pagamento <= end_of_today
-    ).scalar() or Decimal('0.00')
-
-    # Pagamentos este mês
+    start_of_today = datetime.combine(today, datetime.min.time())
+    end_of_today = datetime.combine(today, datetime.max.time())
     first_day_of_month = datetime(today.year, today.month, 1)
     last_day_of_month = (first_day_of_month + relativedelta(months=1)) - timedelta(microseconds=1)
-    total_recebido_mes = db.query(func.sum(models.Pagamento.valor_pago)).filter(
-        models.Pagamento.data_pagamento >= first_day_of_month,
-        models.Pagamento.data_pagamento <= last_day_of_month
-    ).scalar() or Decimal('0.00')
+
+    clientes = select(func.count().label('total_clientes')).select_from(models.Cliente).subquery()
+
+    carnes = select(
+        func.count().label('total_carnes'),
+        func.count().filter(models.Carne.status_carne == 'Ativo').label('total_carnes_ativos'),
+        func.count().filter(models.Carne.status_carne == 'Quitado').label('total_carnes_quitados'),
+        func.count().filter(models.Carne.status_carne == 'Em Atraso').label('total_carnes_atrasados')
+    ).subquery()
+
+    parcela_aberta = models.Parcela.status_parcela.notin_(STATUS_PARCELA_ENCERRADA)
+    parcelas = select(
+        func.coalesce(func.sum(models.Parcela.saldo_devedor).filter(parcela_aberta), 0).label('total_divida_geral_aberta'),
+        func.count().filter(parcela_aberta, models.Parcela.status_parcela == 'Atrasada').label('parcelas_atrasadas'),
+        func.count().filter(
+            parcela_aberta,
+            models.Parcela.status_parcela != 'Atrasada',
+            models.Parcela.data_vencimento.between(today, seven_days_from_now)
+        ).label('parcelas_a_vencer_7dias')
+    ).subquery()
+
+    pagamentos = select(
+        func.coalesce(func.sum(models.Pagamento.valor_pago).filter(
+            models.Pagamento.data_pagamento.between(start_of_today, end_of_today)
+        ), 0).label('total_recebido_hoje'),
+        func.coalesce(func.sum(models.Pagamento.valor_pago).filter(
+            models.Pagamento.data_pagamento.between(first_day_of_month, last_day_of_month)
+        ), 0).label('total_recebido_mes')
+    ).where(
+        models.Pagamento.data_pagamento.between(first_day_of_month, last_day_of_month)
+    ).subquery()
+
+    # Cada subquery retorna exatamente uma linha, então a junção incondicional também
+    totais = db.execute(
+        select(clientes, carnes, parcelas, pagamentos).select_from(
+            clientes.join(carnes, true()).join(parcelas, true()).join(pagamentos, true())
+        )
+    ).one()
 
     response_data = schemas.DashboardSummaryResponse(
-        total_clientes=total_clientes,
-        total_carnes=total_carnes,
-        total_carnes_ativos=total_carnes_ativos,
-        total_carnes_quitados=total_carnes_quitados,
-        total_carnes_atrasados=total_carnes_atrasados,
-        total_divida_geral_aberta=float(total_divida_geral_aberta),
-        total_recebido_hoje=float(total_recebido_hoje),
-        total_recebido_mes=float(total_recebido_mes),
-        parcelas_a_vencer_7dias=parcelas_a_vencer_7dias,
-        parcelas_atrasadas=parcelas_atrasadas
+        total_clientes=totais.total_clientes,
+        total_carnes=totais.total_carnes,
+        total_carnes_ativos=totais.total_carnes_ativos,
+        total_carnes_quitados=totais.total_carnes_quitados,
+        total_carnes_atrasados=totais.total_carnes_atrasados,
+        total_divida_geral_aberta=float(totais.total_divida_geral_aberta),
+        total_recebido_hoje=float(totais.total_recebido_hoje),
+        total_recebido_mes=float(totais.total_recebido_mes),
+        parcelas_a_vencer_7dias=totais.parcelas_a_vencer_7dias,
+        parcelas_atrasadas=totais.parcelas_atrasadas
     )
     return response_data
 
-def get_receipts_report(db: Session, start_date: date, end_date: date):
-    # Modificado para carregar descrições de carnê e nomes de cliente/usuário
-    pagamentos = db.query(models.Pagamento).options(
-        joinedload(models.Pagamento.parcela).joinedload(models.Parcela.carne).joinedload(models.Carne.cliente),
-        joinedload(models.Pagamento.usuario_registro)
-    ).filter(
+def _receipts_period_filter(start_date: date, end_date: date):
+    return (
         models.Pagamento.data_pagamento >= start_date,
-        models.Pagamento.data_pagamento <= (datetime.combine(end_date, datetime.max.time())) # Inclui o dia inteiro
-    ).order_by(models.Pagamento.data_pagamento.desc()).all()
-
-    total_recebido_periodo = Decimal('0.00')
-    report_items = []
-
-    for pag in pagamentos:
-        total_recebido_periodo += pag.valor_pago
-        report_items.append(
-            schemas.PagamentoReportItem(
-                id_pagamento=pag.id_pagamento,
-                id_parcela=pag.id_parcela,
-                data_pagamento=pag.data_pagamento,
-                valor_pago=float(pag.valor_pago),
-                forma_pagamento=pag.forma_pagamento,
-                observacoes=pag.observacoes,
-                id_usuario_registro=pag.id_usuario_registro,
-                cliente_nome=pag.parcela.carne.cliente.nome if pag.parcela and pag.parcela.carne and pag.parcela.carne.cliente else 'N/A',
-                carnes_descricao=pag.parcela.carne.descricao if pag.parcela and pag.parcela.carne else 'N/A',
-                parcela_numero=pag.parcela.numero_parcela if pag.parcela else 0,
-                parcela_data_vencimento=pag.parcela.data_vencimento if pag.parcela else date.min
-            )
+        models.Pagamento.data_pagamento <= datetime.combine(end_date, datetime.max.time()) # Inclui o dia inteiro
+    )
+
+def receipts_report_query(start_date: date, end_date: date):
+    """
+    SELECT plano do relatório de recebimentos: só as colunas usadas, com os JOINs até o cliente, sem
+    montar objetos ORM. Usado pela resposta JSON e pela exportação em streaming (app/receipts_export.py).
+    """
+    return (
+        select(
+            models.Pagamento.id_pagamento,
+            models.Pagamento.id_parcela,
+            models.Pagamento.data_pagamento,
+            models.Pagamento.valor_pago,
+            models.Pagamento.forma_pagamento,
+            models.Pagamento.observacoes,
+            models.Pagamento.id_usuario_registro,
+            models.Cliente.nome.label('cliente_nome'),
+            models.Carne.descricao.label('carnes_descricao'),
+            models.Parcela.numero_parcela.label('parcela_numero'),
+            models.Parcela.data_vencimento.label('parcela_data_vencimento'),
         )
-    
+        .join(models.Parcela, models.Parcela.id_parcela == models.Pagamento.id_parcela)
+        .join(models.Carne, models.Carne.id_carne == models.Parcela.id_carne)
+        .join(models.Cliente, models.Cliente.id_cliente == models.Carne.id_cliente)
+        .where(*_receipts_period_filter(start_date, end_date))
+        .order_by(models.Pagamento.data_pagamento.desc(), models.Pagamento.id_pagamento.desc())
+    )
+
+def get_receipts_totals(db: Session, start_date: date, end_date: date) -> Tuple[int, Decimal]:
+    """Quantidade e soma dos pagamentos do período, calculadas no banco."""
+    quantidade, total = db.execute(
+        select(func.count(), func.coalesce(func.sum(models.Pagamento.valor_pago), Decimal('0.00')))
+        .where(*_receipts_period_filter(start_date, end_date))
+    ).one()
+    return quantidade, total
+
+def get_receipts_report(db: Session, start_date: date, end_date: date):
+    # Total somado no banco (get_receipts_totals) e linhas em colunas planas numa única consulta (sem
+    # joinedload de objetos). Para o total bater com a lista, o caller passa uma sessão REPEATABLE READ
+    # (receipts_export.open_session): as duas consultas leem o mesmo snapshot.
+    _, total_recebido_periodo = get_receipts_totals(db, start_date, end_date)
+    report_items = [
+        schemas.PagamentoReportItem(**{**row._mapping, "valor_pago": float(row.valor_pago)})
+        for row in db.execute(receipts_report_query(start_date, end_date))
+    ]
+
     return schemas.ReceiptsReportResponse(
         start_date=start_date,
         end_date=end_date,
@@ -1205,81 +1761,96 @@ def get_receipts_report(db: Session, start_date: date, end_date: date):
         pagamentos=report_items
     )
 
-def get_pending_debts_by_client(db: Session, client_id: int):
-    db_client = db.query(models.Cliente).options(
-        joinedload(models.Cliente.carnes).joinedload(models.Carne.parcelas)
-    ).filter(models.Cliente.id_cliente == client_id).first()
+# Granularidades aceitas por get_receipts_grouped (valores de date_trunc do PostgreSQL)
+PERIODOS_RECEBIMENTO = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+DIMENSOES_RECEBIMENTO = ('forma_pagamento', 'id_usuario_registro')
 
+def get_receipts_grouped(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    periodo: str = 'dia',
+    agrupar_por: Optional[List[str]] = None,
+    rollup: bool = False,
+) -> dict:
+    """
+    Recebimentos do período agrupados por dia/semana/mês (semana começando na segunda) e pelas dimensões
+    de agrupar_por, na ordem dada, numa única consulta sobre pagamento (índice ix_pagamento_data_pagamento).
+    Com rollup=True o ROLLUP acrescenta os subtotais de cada nível e o total geral (linhas com
+    subtotal=True e as colunas agregadas em None).
+    """
+    dimensoes = list(dict.fromkeys(agrupar_por or []))
+    dia = cast(models.Pagamento.data_pagamento, Date)
+    colunas_dimensoes = [getattr(models.Pagamento, dimensao) for dimensao in dimensoes]
+    # 1. Agregação por dia e dimensões (hash, sem ordenar os pagamentos); 2. agrupamento por período e
+    # ROLLUP sobre essas poucas linhas, em vez de ordenar todos os pagamentos do período
+    por_dia = (
+        select(
+            dia.label('dia'),
+            *colunas_dimensoes,
+            func.count().label('quantidade'),
+            func.sum(models.Pagamento.valor_pago).label('total_recebido'),
+        )
+        .where(*_receipts_period_filter(start_date, end_date))
+        .group_by(dia, *colunas_dimensoes)
+        .subquery('por_dia')
+    )
+    coluna_periodo = por_dia.c.dia if periodo == 'dia' else cast(func.date_trunc(PERIODOS_RECEBIMENTO[periodo], por_dia.c.dia), Date)
+    colunas = [coluna_periodo.label('periodo'), *(por_dia.c[dimensao].label(dimensao) for dimensao in dimensoes)]
+    agregado = (
+        select(
+            *colunas,
+            cast(func.sum(por_dia.c.quantidade), Integer).label('quantidade'),
+            func.sum(por_dia.c.total_recebido).label('total_recebido'),
+            (func.grouping(*colunas) > 0).label('subtotal') if rollup else literal(False).label('subtotal'),
+        )
+        .group_by(*([func.rollup(*colunas)] if rollup else colunas))
+        .subquery()
+    )
+    consulta = select(agregado).order_by(*(agregado.c[coluna.name].asc().nullslast() for coluna in colunas))
+    if 'id_usuario_registro' in dimensoes:
+        # O nome do usuário entra depois da agregação, junto às poucas linhas resultantes
+        consulta = consulta.add_columns(models.Usuario.nome.label('usuario_nome')).outerjoin(
+            models.Usuario, models.Usuario.id_usuario == agregado.c.id_usuario_registro
+        )
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "periodo": periodo,
+        "agrupar_por": dimensoes,
+        "itens": [dict(row._mapping) for row in db.execute(consulta)],
+    }
+
+def get_pending_debts_by_client(db: Session, client_id: int):
+    db_client = get_client(db, client_id)
     if not db_client:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente não encontrado.")
 
+    # Seleção plana das parcelas em aberto, com os juros/multas de hoje calculados na própria consulta
+    (juros_multa_hoje, saldo_devedor_hoje, status_parcela_hoje), em_aberto = _live_interest_columns(date.today())
+    parcelas_abertas = db.query(
+        models.Parcela.id_parcela,
+        models.Parcela.numero_parcela,
+        models.Parcela.valor_devido,
+        models.Parcela.valor_pago,
+        saldo_devedor_hoje,
+        juros_multa_hoje,
+        models.Parcela.data_vencimento,
+        status_parcela_hoje,
+        models.Parcela.id_carne,
+        models.Carne.descricao.label("carnes_descricao"),
+        models.Carne.status_carne.label("carne_status")
+    ).join(models.Carne).filter(
+        models.Carne.id_cliente == client_id,
+        models.Parcela.status_parcela.not_in(STATUS_PARCELA_ENCERRADA),
+        em_aberto
+    ).order_by(models.Parcela.data_vencimento).all() # Sort pending parcels by due date
+
     total_divida_pendente = Decimal('0.00')
     parcelas_pendentes_list = []
-
-    needs_commit = False
-    for carne_obj in db_client.carnes:
-        for parcela in carne_obj.parcelas:
-            original_juros_multa = parcela.juros_multa
-            original_saldo_devedor = parcela.saldo_devedor
-            original_status_parcela = parcela.status_parcela
-            _apply_interest_and_fine_if_due(db, parcela)
-            if (parcela.juros_multa != original_juros_multa or 
-                parcela.saldo_devedor != original_saldo_devedor or 
-                parcela.status_parcela != original_status_parcela):
-                needs_commit = True
-                db.add(parcela)
-        # Recalcula o status do carnê
-        if carne_obj.status_carne != 'Cancelado':
-            all_parcels_paid = all(p.status_parcela in ['Paga', 'Paga com Atraso'] for p in carne_obj.parcelas)
-            has_overdue_parcel = any(p.status_parcela == 'Atrasada' for p in carne_obj.parcelas)
-            has_partially_paid_parcel = any(p.status_parcela == 'Parcialmente Paga' for p in carne_obj.parcelas)
-
-            new_status_carne = carne_obj.status_carne
-            if all_parcels_paid and carne_obj.parcelas:
-                new_status_carne = 'Quitado'
-            elif has_overdue_parcel:
-                new_status_carne = 'Em Atraso'
-            elif has_partially_paid_parcel:
-                new_status_carne = 'Ativo'
-            else:
-                new_status_carne = 'Ativo'
-            
-            if carne_obj.status_carne != new_status_carne:
-                carne_obj.status_carne = new_status_carne
-                needs_commit = True
-                db.add(carne_obj)
-
-    if needs_commit:
-        db.commit()
-        db.refresh(db_client) # Refresh client to get updated carnes and parcels
-        # Re-load or refresh associated objects to ensure updated status and values are picked up
-        db.expire_all()
-        db_client = db.query(models.Cliente).options(
-            joinedload(models.Cliente.carnes).joinedload(models.Carne.parcelas)
-        ).filter(models.Cliente.id_cliente == client_id).first()
-
-
-    for carne_obj in db_client.carnes:
-        for parcela in carne_obj.parcelas:
-            if parcela.status_parcela not in ['Paga', 'Paga com Atraso', 'Cancelada']:
-                total_divida_pendente += parcela.saldo_devedor
-                parcelas_pendentes_list.append(
-                    schemas.PendingDebtItem(
-                        id_parcela=parcela.id_parcela,
-                        numero_parcela=parcela.numero_parcela,
-                        valor_devido=float(parcela.valor_devido),
-                        valor_pago=float(parcela.valor_pago),
-                        saldo_devedor=float(parcela.saldo_devedor),
-                        juros_multa=float(parcela.juros_multa),
-                        data_vencimento=parcela.data_vencimento,
-                        status_parcela=parcela.status_parcela,
-                        id_carne=parcela.id_carne,
-                        carnes_descricao=carne_obj.descricao,
-                        carne_status=carne_obj.status_carne
-                    )
-                )
-    # Sort pending parcels by due date
-    parcelas_pendentes_list.sort(key=lambda p: p.data_vencimento)
+    for parcela in parcelas_abertas:
+        total_divida_pendente += parcela.saldo_devedor
+        parcelas_pendentes_list.append(schemas.PendingDebtItem(**parcela._mapping))
 
     return schemas.PendingDebtsReportResponse(
         cliente_id=db_client.id_cliente,
@@ -1287,4 +1858,4 @@ def get_pending_debts_by_client(db: Session, client_id: int):
         cliente_cpf_cnpj=db_client.cpf_cnpj,
         total_divida_pendente=float(total_divida_pendente),
         parcelas_pendentes=parcelas_pendentes_list
-    )
\ No newline at end of file
+    )
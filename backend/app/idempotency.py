@@ -0,0 +1,127 @@
+# backend/app/idempotency.py
+# Cabeçalho Idempotency-Key nas rotas que gravam pagamentos e carnês. O frontend manda a mesma chave ao
+# reenviar uma requisição (timeout, conexão instável); a primeira execução guarda a resposta e as
+# seguintes a recebem de volta sem repetir a operação.
+#
+# A reserva da chave é um INSERT na mesma transação da operação: ela só aparece para os outros junto com
+# o pagamento/carnê gravado, e um reenvio simultâneo fica esperando no índice único até esse commit (ou
+# rollback, se a operação falhar e puder ser tentada de novo). Se o processo cair entre o commit da
+# operação e a gravação da resposta, a chave fica "em processamento" (409) até expirar, nunca reaplica.
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import IDEMPOTENCY_KEY_TTL_HOURS
+
+HEADER = "Idempotency-Key"
+# Marca as respostas devolvidas de uma execução anterior
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+def request_hash(rota: str, corpo: Any) -> str:
+    conteudo = json.dumps({"rota": rota, "corpo": jsonable_encoder(corpo)}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def _chave_pk(chave: str, id_usuario: int):
+    return (models.ChaveIdempotencia.chave == chave) & (models.ChaveIdempotencia.id_usuario == id_usuario)
+
+def begin(db: Session, chave: Optional[str], id_usuario: int, rota: str, corpo: Any) -> Optional[JSONResponse]:
+    """
+    Chamado antes da operação. Sem chave, ou com uma chave nova, reserva-a e retorna None: a operação
+    deve seguir e terminar com finish(). Com uma chave já concluída, retorna a resposta guardada.
+    Chave reutilizada com outra requisição: 422; requisição original ainda em andamento: 409.
+    """
+    if chave is None:
+        return None
+    hash_requisicao = request_hash(rota, corpo)
+    agora = datetime.now()
+    valores = dict(
+        rota=rota, hash_requisicao=hash_requisicao, status_code=None, resposta=None,
+        data_criacao=agora, expira_em=agora + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    )
+    reservada = db.execute(
+        pg_insert(models.ChaveIdempotencia)
+        .values(chave=chave, id_usuario=id_usuario, **valores)
+        .on_conflict_do_nothing(index_elements=["chave", "id_usuario"])
+        .returning(models.ChaveIdempotencia.chave)
+    ).first()
+    if reservada is not None:
+        return None
+
+    existente = db.execute(
+        select(
+            models.ChaveIdempotencia.hash_requisicao,
+            models.ChaveIdempotencia.status_code,
+            models.ChaveIdempotencia.resposta,
+            models.ChaveIdempotencia.expira_em,
+        ).where(_chave_pk(chave, id_usuario))
+    ).first()
+    if existente is None:
+        # Removida pelo job de limpeza entre o INSERT e o SELECT: tenta reservar de novo
+        return begin(db, chave, id_usuario, rota, corpo)
+    if existente.expira_em < agora:
+        # Expirada e ainda não removida: vale como chave nova
+        reaproveitada = db.execute(
+            update(models.ChaveIdempotencia)
+            .where(_chave_pk(chave, id_usuario), models.ChaveIdempotencia.expira_em < agora)
+            .values(**valores)
+            .returning(models.ChaveIdempotencia.chave)
+        ).first()
+        return None if reaproveitada is not None else begin(db, chave, id_usuario, rota, corpo)
+
+    if existente.hash_requisicao != hash_requisicao:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{HEADER} já utilizada com uma requisição diferente."
+        )
+    if existente.status_code is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A requisição com esta {HEADER} ainda está sendo processada. Tente novamente em instantes."
+        )
+    return JSONResponse(status_code=existente.status_code, content=existente.resposta, headers={REPLAYED_HEADER: "true"})
+
+def finish(db: Session, chave: Optional[str], id_usuario: int, response_model: Any, resultado: Any, status_code: int = 200):
+    """
+    Chamado depois da operação (já com commit). Sem chave, devolve o resultado como está; com chave,
+    serializa pelo response_model da rota, guarda a resposta e a devolve pronta.
+    """
+    if chave is None:
+        return resultado
+    adaptador = TypeAdapter(response_model)
+    conteudo = adaptador.dump_python(adaptador.validate_python(resultado, from_attributes=True), mode="json")
+    db.execute(
+        update(models.ChaveIdempotencia)
+        .where(_chave_pk(chave, id_usuario))
+        .values(status_code=status_code, resposta=conteudo)
+    )
+    db.commit()
+    return JSONResponse(status_code=status_code, content=conteudo)
+
+def purge_expired(db: Session, batch_size: int = 5000) -> int:
+    """Remove as chaves expiradas em lotes, um commit por lote (job agendado). Retorna quantas removeu."""
+    removidas = 0
+    while True:
+        expiradas = (
+            select(models.ChaveIdempotencia.chave, models.ChaveIdempotencia.id_usuario)
+            .where(models.ChaveIdempotencia.expira_em < datetime.now())
+            .limit(batch_size)
+        )
+        resultado = db.execute(
+            delete(models.ChaveIdempotencia)
+            .where(tuple_(models.ChaveIdempotencia.chave, models.ChaveIdempotencia.id_usuario).in_(expiradas))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        removidas += resultado.rowcount
+        if resultado.rowcount < batch_size:
+            return removidas
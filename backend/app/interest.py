@@ -0,0 +1,83 @@
+# backend/app/interest.py
+# Cálculos de juros/multas e de status sem efeitos colaterais (não tocam na sessão do banco).
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Optional
+
+from app.config import MULTA_ATRASO_PERCENTUAL, JUROS_MORA_PERCENTUAL_AO_MES
+
+STATUS_PARCELA_QUITADA = ['Paga', 'Paga com Atraso']
+STATUS_PARCELA_ENCERRADA = ['Paga', 'Paga com Atraso', 'Cancelada']
+
+def calculate_interest_and_fine(valor_devido: Decimal, valor_pago: Decimal, data_vencimento: date, today: date) -> Decimal:
+    """
+    Multa + juros de mora sobre o principal em aberto de uma parcela vencida, em centavos.
+    Usa a mesma expressão do job em lote: base * (multa% * 30 + juros%/mês * dias) / 3000.
+    """
+    if data_vencimento >= today:
+        return Decimal('0.00')
+    valor_base_para_calculo = valor_devido - valor_pago
+    if valor_base_para_calculo < Decimal('0.00'):
+        valor_base_para_calculo = Decimal('0.00') # Não calcular juros sobre valor negativo
+    dias_atraso = (today - data_vencimento).days
+    total = valor_base_para_calculo * (MULTA_ATRASO_PERCENTUAL * 30 + JUROS_MORA_PERCENTUAL_AO_MES * dias_atraso) / Decimal('3000')
+    # Arredonda como o banco faz ao gravar em DECIMAL(10, 2)
+    return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def compute_parcela_view(parcela, today: Optional[date] = None) -> dict:
+    """
+    Retorna juros_multa, juros_multa_anterior_aplicada, saldo_devedor e status_parcela atualizados
+    para a data de hoje, sem alterar o objeto recebido. Mesmas regras de crud._apply_interest_and_fine_if_due.
+    """
+    today = today or date.today()
+    view = {
+        "juros_multa": parcela.juros_multa,
+        "juros_multa_anterior_aplicada": parcela.juros_multa_anterior_aplicada,
+        "saldo_devedor": parcela.saldo_devedor,
+        "status_parcela": parcela.status_parcela,
+    }
+
+    # Parcelas quitadas ou canceladas não acumulam juros; apenas zera resíduos
+    if parcela.status_parcela in STATUS_PARCELA_ENCERRADA:
+        if parcela.juros_multa > Decimal('0.00') and parcela.saldo_devedor <= Decimal('0.00'):
+            view["juros_multa"] = Decimal('0.00')
+            view["juros_multa_anterior_aplicada"] = Decimal('0.00')
+        return view
+
+    if parcela.data_vencimento >= today:
+        return view
+
+    total_novos_juros_multa = calculate_interest_and_fine(parcela.valor_devido, parcela.valor_pago, parcela.data_vencimento, today)
+    if total_novos_juros_multa != parcela.juros_multa_anterior_aplicada:
+        view["juros_multa"] = total_novos_juros_multa
+        view["juros_multa_anterior_aplicada"] = total_novos_juros_multa
+
+    saldo_devedor = (parcela.valor_devido - parcela.valor_pago) + view["juros_multa"]
+    if Decimal('-0.01') < saldo_devedor < Decimal('0.01'):
+        saldo_devedor = Decimal('0.00')
+    view["saldo_devedor"] = saldo_devedor
+
+    if saldo_devedor <= Decimal('0.00'):
+        # Se quitada, mesmo que atrasada, o status prioritário é 'Paga'
+        if parcela.data_pagamento_completo and parcela.data_pagamento_completo > parcela.data_vencimento:
+            view["status_parcela"] = 'Paga com Atraso'
+        else:
+            view["status_parcela"] = 'Paga'
+        view["juros_multa"] = Decimal('0.00')
+        view["juros_multa_anterior_aplicada"] = Decimal('0.00')
+    else:
+        view["status_parcela"] = 'Atrasada'
+    return view
+
+def derive_carne_status(status_carne: str, status_parcelas: Iterable[str]) -> str:
+    """
+    Status do carnê a partir do status das suas parcelas. Carnês cancelados mantêm o status.
+    """
+    if status_carne == 'Cancelado':
+        return status_carne
+    status_parcelas = list(status_parcelas)
+    if status_parcelas and all(s in STATUS_PARCELA_QUITADA for s in status_parcelas):
+        return 'Quitado'
+    if any(s == 'Atrasada' for s in status_parcelas):
+        return 'Em Atraso'
+    return 'Ativo'
@@ -0,0 +1,282 @@
+# backend/app/ledger.py
+# Razão (livro de lançamentos) das parcelas: cada mudança em valor_devido, valor_pago ou juros_multa
+# vira um lançamento append-only em lancamento_parcela, com a variação de cada campo, o tipo do evento
+# (abertura, pagamento, estorno, juros, renegociação, ajuste, encerramento) e a data em que vale. Os
+# campos da Parcela continuam sendo lidos pela API, mas passam a ser um cache derivado do razão: quem
+# os altera grava o lançamento correspondente na mesma transação.
+#
+# Para consultar o saldo "em uma data" sem somar o histórico inteiro, o job ledger_snapshot.py grava
+# periodicamente em saldo_parcela o saldo acumulado de cada parcela com movimento; a consulta parte do
+# snapshot mais recente e soma só os lançamentos posteriores a ele.
+#
+# Parcelas removidas (carnê ou cliente apagado, cronograma regenerado) recebem antes um lançamento de
+# encerramento que zera o saldo; as chaves estrangeiras do razão são ON DELETE SET NULL, então os
+# lançamentos ficam no histórico, só sem o vínculo com a parcela/o carnê que deixou de existir.
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, delete, func, insert, literal, or_, select, text, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+
+TIPO_ABERTURA = 'abertura'
+TIPO_PAGAMENTO = 'pagamento'
+TIPO_ESTORNO = 'estorno'
+TIPO_JUROS = 'juros'
+TIPO_RENEGOCIACAO = 'renegociacao'
+TIPO_AJUSTE = 'ajuste'
+TIPO_ENCERRAMENTO = 'encerramento'
+
+CAMPOS_SALDO = ('valor_devido', 'valor_pago', 'juros_multa')
+
+def balance_fields(parcela: models.Parcela) -> Tuple[Decimal, ...]:
+    """Valores atuais dos campos acompanhados pelo razão, para passar como `antes` a record()."""
+    return tuple(getattr(parcela, campo) for campo in CAMPOS_SALDO)
+
+def entry(
+    id_parcela: int, id_carne: int, tipo: str, data_lancamento: datetime,
+    valor_devido: Decimal = Decimal('0.00'), valor_pago: Decimal = Decimal('0.00'),
+    juros_multa: Decimal = Decimal('0.00'), id_pagamento: Optional[int] = None, id_usuario: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Linha de lançamento para INSERTs em lote (criação/importação de carnês)."""
+    return dict(
+        id_parcela=id_parcela, id_carne=id_carne, tipo=tipo, data_lancamento=data_lancamento,
+        valor_devido=valor_devido, valor_pago=valor_pago, juros_multa=juros_multa,
+        id_pagamento=id_pagamento, id_usuario=id_usuario,
+    )
+
+def opening_date(data_venda: Optional[date]) -> datetime:
+    """Data dos lançamentos de abertura de um carnê: a da venda (ou hoje, se não informada)."""
+    return datetime.combine(data_venda or date.today(), time.min)
+
+def insert_entries(db: Session, linhas: List[Dict[str, Any]]) -> None:
+    """Grava lançamentos de parcelas novas num INSERT de várias linhas. Não faz commit."""
+    if linhas:
+        db.execute(insert(models.LancamentoParcela), linhas)
+
+def record(
+    db: Session,
+    parcela: models.Parcela,
+    tipo: str,
+    antes: Tuple[Decimal, ...],
+    data_lancamento: Optional[datetime] = None,
+    pagamento: Optional[models.Pagamento] = None,
+    id_pagamento: Optional[int] = None,
+    id_usuario: Optional[int] = None,
+) -> Optional[models.LancamentoParcela]:
+    """
+    Lança a diferença entre `antes` (de balance_fields) e os valores atuais da parcela. Não lança nada se
+    nenhum campo mudou. `pagamento` pode ser um Pagamento ainda não gravado: o id é preenchido no flush.
+    Não faz commit aqui, deixa para o caller.
+    """
+    variacoes = [atual - anterior for atual, anterior in zip(balance_fields(parcela), antes)]
+    if not any(variacoes):
+        return None
+    data_lancamento = data_lancamento or datetime.now()
+    if data_lancamento.date() < date.today():
+        # Lançamento retroativo: os snapshots posteriores a ele deixaram de valer para esta parcela
+        db.execute(
+            delete(models.SaldoParcela)
+            .where(
+                models.SaldoParcela.id_parcela == parcela.id_parcela,
+                models.SaldoParcela.data_referencia > data_lancamento.date()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    lancamento = models.LancamentoParcela(
+        id_parcela=parcela.id_parcela,
+        id_carne=parcela.id_carne,
+        tipo=tipo,
+        data_lancamento=data_lancamento,
+        **dict(zip(CAMPOS_SALDO, variacoes)),
+        id_pagamento=id_pagamento,
+        id_usuario=id_usuario,
+    )
+    if pagamento is not None:
+        lancamento.pagamento = pagamento
+    db.add(lancamento)
+    return lancamento
+
+def close_parcelas(db: Session, condicao, id_usuario: Optional[int] = None) -> int:
+    """
+    Lança o encerramento das parcelas que satisfazem `condicao` (expressão sobre Parcela), antes de elas
+    serem apagadas: a variação de cada campo é o saldo atual com o sinal trocado, e o razão da parcela
+    passa a somar zero. Um único INSERT ... SELECT. Retorna quantos lançamentos gravou. Não faz commit.
+    """
+    return db.execute(
+        insert(models.LancamentoParcela).from_select(
+            ['id_parcela', 'id_carne', 'tipo', 'data_lancamento', *CAMPOS_SALDO, 'id_usuario'],
+            select(
+                models.Parcela.id_parcela,
+                models.Parcela.id_carne,
+                literal(TIPO_ENCERRAMENTO),
+                literal(datetime.now()),
+                *(-getattr(models.Parcela, campo) for campo in CAMPOS_SALDO),
+                literal(id_usuario, Integer),
+            ).where(condicao, or_(*(getattr(models.Parcela, campo) != 0 for campo in CAMPOS_SALDO)))
+        )
+    ).rowcount
+
+def update_recording_interest(db: Session, stmt, data_lancamento: datetime) -> int:
+    """
+    Executa um UPDATE em lote de parcelas (job de juros) lançando a variação de juros_multa de cada linha
+    alterada, num único comando: o UPDATE se junta à própria tabela para enxergar o valor anterior e o
+    INSERT no razão lê o RETURNING dele numa CTE. Retorna o número de parcelas atualizadas.
+    """
+    antes = aliased(models.Parcela, name='parcela_antes')
+    atualizadas = (
+        stmt.where(models.Parcela.id_parcela == antes.id_parcela)
+        .returning(
+            models.Parcela.id_parcela,
+            models.Parcela.id_carne,
+            (models.Parcela.juros_multa - antes.juros_multa).label('variacao')
+        )
+        .cte('atualizadas')
+    )
+    lancamentos = insert(models.LancamentoParcela).from_select(
+        ['id_parcela', 'id_carne', 'tipo', 'data_lancamento', 'valor_devido', 'valor_pago', 'juros_multa'],
+        select(
+            atualizadas.c.id_parcela,
+            atualizadas.c.id_carne,
+            literal(TIPO_JUROS),
+            literal(data_lancamento),
+            literal(Decimal('0.00')),
+            literal(Decimal('0.00')),
+            atualizadas.c.variacao,
+        ).where(atualizadas.c.variacao != 0)
+    ).cte('lancamentos')
+    consulta = select(func.count()).select_from(atualizadas).add_cte(lancamentos)
+    if data_lancamento.date() < date.today():
+        # Job rodado para uma data passada: invalida os snapshots posteriores das parcelas alteradas
+        snapshots = (
+            delete(models.SaldoParcela)
+            .where(
+                models.SaldoParcela.id_parcela.in_(select(atualizadas.c.id_parcela).where(atualizadas.c.variacao != 0)),
+                models.SaldoParcela.data_referencia > data_lancamento.date()
+            )
+            .cte('snapshots_invalidados')
+        )
+        consulta = consulta.add_cte(snapshots)
+    return db.execute(consulta).scalar_one()
+
+def _balances_before(limite: date):
+    """
+    SELECT do saldo de cada parcela considerando os lançamentos anteriores a `limite` (00:00): o snapshot
+    mais recente até essa data mais os lançamentos a partir dele. `movimentos` conta esses lançamentos.
+    """
+    lancamento = models.LancamentoParcela
+    snapshot = (
+        select(
+            models.SaldoParcela.data_referencia,
+            models.SaldoParcela.valor_devido,
+            models.SaldoParcela.valor_pago,
+            models.SaldoParcela.juros_multa,
+        )
+        .where(models.SaldoParcela.id_parcela == models.Parcela.id_parcela, models.SaldoParcela.data_referencia <= limite)
+        .order_by(models.SaldoParcela.data_referencia.desc())
+        .limit(1)
+        .lateral('snapshot')
+    )
+    cauda = and_(
+        lancamento.id_parcela == models.Parcela.id_parcela,
+        lancamento.data_lancamento < datetime.combine(limite, time.min),
+        or_(snapshot.c.data_referencia.is_(None), lancamento.data_lancamento >= snapshot.c.data_referencia),
+    )
+    def acumulado(campo):
+        return (
+            func.coalesce(getattr(snapshot.c, campo), 0) + func.coalesce(func.sum(getattr(lancamento, campo)), 0)
+        ).label(campo)
+    return (
+        select(
+            models.Parcela.id_parcela,
+            models.Parcela.id_carne,
+            models.Parcela.numero_parcela,
+            *(acumulado(campo) for campo in CAMPOS_SALDO),
+            func.count(lancamento.id_lancamento).label('movimentos'),
+        )
+        .select_from(models.Parcela)
+        .outerjoin(snapshot, true())
+        .outerjoin(lancamento, cauda)
+        .group_by(
+            models.Parcela.id_parcela,
+            snapshot.c.data_referencia, snapshot.c.valor_devido, snapshot.c.valor_pago, snapshot.c.juros_multa
+        )
+    )
+
+def balances_as_of(db: Session, data: date, id_carne: Optional[int] = None, id_parcela: Optional[int] = None) -> List[dict]:
+    """Saldo de cada parcela no fim do dia `data`, pelo razão. Filtra por carnê e/ou parcela."""
+    consulta = _balances_before(data + timedelta(days=1))
+    if id_carne is not None:
+        consulta = consulta.where(models.Parcela.id_carne == id_carne)
+    if id_parcela is not None:
+        consulta = consulta.where(models.Parcela.id_parcela == id_parcela)
+    return [
+        {
+            "id_parcela": row.id_parcela,
+            "numero_parcela": row.numero_parcela,
+            "valor_devido": row.valor_devido,
+            "valor_pago": row.valor_pago,
+            "juros_multa": row.juros_multa,
+            "saldo_devedor": row.valor_devido - row.valor_pago + row.juros_multa,
+        }
+        for row in db.execute(consulta.order_by(models.Parcela.numero_parcela, models.Parcela.id_parcela))
+    ]
+
+def take_snapshots(db: Session, data_referencia: Optional[date] = None) -> int:
+    """
+    Grava em saldo_parcela o saldo no início de `data_referencia` (lançamentos anteriores a ela) das
+    parcelas que tiveram movimento desde o último snapshot. Job agendado (ledger_snapshot.py). Retorna
+    quantos snapshots gravou. A tabela de lançamentos fica travada contra escrita (SHARE) até o commit,
+    para que nenhum lançamento de uma transação ainda aberta fique de fora do snapshot.
+    """
+    data_referencia = data_referencia or date.today()
+    if data_referencia > date.today():
+        raise ValueError("A data de referência do snapshot não pode estar no futuro.")
+    try:
+        db.execute(text(f"LOCK TABLE {models.LancamentoParcela.__tablename__} IN SHARE MODE"))
+        saldos = _balances_before(data_referencia).subquery()
+        colunas = ['id_parcela', 'data_referencia', *CAMPOS_SALDO]
+        gravar = pg_insert(models.SaldoParcela).from_select(
+            colunas,
+            select(saldos.c.id_parcela, literal(data_referencia), *(saldos.c[campo] for campo in CAMPOS_SALDO))
+            .where(saldos.c.movimentos > 0)
+        )
+        gravar = gravar.on_conflict_do_update(
+            index_elements=['id_parcela', 'data_referencia'],
+            set_={campo: gravar.excluded[campo] for campo in CAMPOS_SALDO}
+        )
+        gravados = db.execute(gravar).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return gravados
+
+def find_divergences(db: Session, id_carne: Optional[int] = None) -> List[dict]:
+    """
+    Parcelas cujo cache (valor_devido, valor_pago, juros_multa) não bate com a soma de todos os seus
+    lançamentos. Usado pelo job de snapshots para conferência.
+    """
+    lancamento = models.LancamentoParcela
+    totais = [func.coalesce(func.sum(getattr(lancamento, campo)), 0).label(campo) for campo in CAMPOS_SALDO]
+    consulta = (
+        select(models.Parcela.id_parcela, models.Parcela.id_carne, *(getattr(models.Parcela, c) for c in CAMPOS_SALDO), *totais)
+        .outerjoin(lancamento, lancamento.id_parcela == models.Parcela.id_parcela)
+        .group_by(models.Parcela.id_parcela)
+        .having(or_(*(getattr(models.Parcela, campo) != total for campo, total in zip(CAMPOS_SALDO, totais))))
+        .order_by(models.Parcela.id_parcela)
+    )
+    if id_carne is not None:
+        consulta = consulta.where(models.Parcela.id_carne == id_carne)
+    return [
+        {
+            "id_parcela": row.id_parcela,
+            "id_carne": row.id_carne,
+            **{campo: row[2 + i] for i, campo in enumerate(CAMPOS_SALDO)},
+            **{f"{campo}_razao": row[5 + i] for i, campo in enumerate(CAMPOS_SALDO)},
+        }
+        for row in db.execute(consulta)
+    ]
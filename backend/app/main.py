@@ -1,11 +1,12 @@
 # backend/app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
+from app.database import Base, engine, SessionLocal
+from app import crud
 
 from app.routers import auth_router, clients_router, carnes_router, reports_router
 from app.models import Usuario
-from app.routers import auth_router, clients_router, carnes_router, reports_router, produtos_router
+from app.routers import auth_router, clients_router, carnes_router, reports_router, produtos_router, search_router
 from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 # IMPORTES NECESSÁRIOS PARA SERVIR ARQUIVOS ESTÁTICOS
@@ -87,6 +88,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "X-Total-Pagamentos", "X-Total-Recebido", "Content-Disposition"], # Cursor da paginação e marca de resposta reaproveitada (Idempotency-Key) legíveis pelo frontend
 )
 # --- FIM DA SEÇÃO DE CONFIGURAÇÃO DO CORS ---
 
@@ -97,6 +99,7 @@ app.include_router(clients_router.router, tags=["Clientes"])
 app.include_router(carnes_router.router, tags=["Carnês"])
 app.include_router(reports_router.router, tags=["Relatórios e Dashboard"])
 app.include_router(produtos_router.router, prefix="/api", tags=["Produtos"])
+app.include_router(search_router.router, tags=["Busca"])
 
 
 @app.on_event("startup")
@@ -104,6 +107,12 @@ async def startup_event():
     print("Criando tabelas do banco de dados (se não existirem)...")
     create_db_tables()
     print("Tabelas verificadas/criadas.")
+    db = SessionLocal()
+    try:
+        crud.warm_autocomplete_indexes(db)
+        print("Índices de autocomplete carregados.")
+    finally:
+        db.close()
 
 # Rota de status da API (opcional, mas útil)
 @app.get("/api-status", tags=["Status"])
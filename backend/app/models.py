@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, DECIMAL, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Date, DECIMAL, ForeignKey, Text, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -23,12 +23,20 @@ class Cliente(Base):
     id_cliente = Column(Integer, primary_key=True, index=True)
     nome = Column(String(255), nullable=False)
     cpf_cnpj = Column(String(20), unique=True, index=True, nullable=False)
+    cpf_cnpj_digitos = Column(String(20), nullable=True) # cpf_cnpj só com os dígitos (busca exata/por prefixo)
     endereco = Column(String(500))
     telefone = Column(String(20))
     email = Column(String(255))
     data_cadastro = Column(DateTime, default=func.now())
     carnes = relationship("Carne", back_populates="cliente", cascade="all, delete-orphan")
 
+    # Índice da ordenação da listagem (nome, id), usado pela paginação por cursor, e índice dos dígitos
+    # do documento (varchar_pattern_ops atende tanto = quanto LIKE 'prefixo%')
+    __table_args__ = (
+        Index('ix_cliente_nome_id_cliente', 'nome', 'id_cliente'),
+        Index('ix_cliente_cpf_cnpj_digitos', 'cpf_cnpj_digitos', postgresql_ops={'cpf_cnpj_digitos': 'varchar_pattern_ops'}),
+    )
+
 class Carne(Base):
     __tablename__ = "carne"
     id_carne = Column(Integer, primary_key=True, index=True)
@@ -46,9 +54,20 @@ class Carne(Base):
     valor_entrada = Column(DECIMAL(10, 2), default=0.00, nullable=False)
     forma_pagamento_entrada = Column(String(50), nullable=True)
     parcela_fixa = Column(Boolean, default=True, nullable=False) # NOVO CAMPO
+    # Contadores de status das parcelas, mantidos nas escritas para derivar status_carne sem ler as parcelas
+    total_parcelas = Column(Integer, default=0, nullable=False)
+    parcelas_pagas = Column(Integer, default=0, nullable=False)
+    parcelas_atrasadas = Column(Integer, default=0, nullable=False)
+    parcelas_parcialmente_pagas = Column(Integer, default=0, nullable=False)
 
     cliente = relationship("Cliente", back_populates="carnes", lazy="joined")
-    parcelas = relationship("Parcela", back_populates="carne", cascade="all, delete-orphan")
+    # Ordem estável (por número da parcela) para as respostas da API
+    parcelas = relationship("Parcela", back_populates="carne", cascade="all, delete-orphan", order_by="Parcela.numero_parcela")
+
+    # Índice da ordenação da listagem (data_venda, data_criacao, id_carne), usado pela paginação por cursor
+    __table_args__ = (
+        Index('ix_carne_listagem', data_venda.desc().nullslast(), data_criacao.desc(), id_carne.desc()),
+    )
 
 class Parcela(Base):
     __tablename__ = "parcela"
@@ -67,7 +86,10 @@ class Parcela(Base):
     observacoes = Column(String, nullable=True)
 
     carne = relationship("Carne", back_populates="parcelas")
-    pagamentos = relationship("Pagamento", back_populates="parcela", cascade="all, delete-orphan")
+    pagamentos = relationship("Pagamento", back_populates="parcela", cascade="all, delete-orphan", order_by="Pagamento.id_pagamento")
+
+    # Parcelas de um carnê (detalhe, totais da listagem leve); mesmo nome do índice dos bancos antigos
+    __table_args__ = (Index('idx_parcela_id_carne', 'id_carne'),)
 
 class Pagamento(Base):
     __tablename__ = "pagamento"
@@ -82,6 +104,60 @@ class Pagamento(Base):
     parcela = relationship("Parcela", back_populates="pagamentos")
     usuario_registro = relationship("Usuario", back_populates="pagamentos")
 
+    # Recebimentos por período: o relatório usa o índice para o intervalo de datas (as demais colunas e os
+    # JOINs vêm das tabelas); os agrupamentos por dia/semana/mês só leem as colunas incluídas, e podem ser
+    # resolvidos só com o índice (index-only scan)
+    __table_args__ = (
+        Index('ix_pagamento_data_pagamento', 'data_pagamento', postgresql_include=['valor_pago', 'forma_pagamento', 'id_usuario_registro']),
+    )
+
+# Razão append-only das parcelas: um lançamento por evento que altera valor_devido, valor_pago ou
+# juros_multa, com a variação de cada campo. Os campos da Parcela são o saldo acumulado. Ver app/ledger.py.
+class LancamentoParcela(Base):
+    __tablename__ = "lancamento_parcela"
+    id_lancamento = Column(BigInteger, primary_key=True)
+    # SET NULL: apagar a parcela ou o carnê não apaga o histórico (quem apaga lança antes o encerramento)
+    id_parcela = Column(Integer, ForeignKey("parcela.id_parcela", ondelete="SET NULL"))
+    id_carne = Column(Integer, ForeignKey("carne.id_carne", ondelete="SET NULL"), index=True)
+    tipo = Column(String(20), nullable=False) # abertura, pagamento, estorno, juros, renegociacao, ajuste, encerramento
+    data_lancamento = Column(DateTime, nullable=False) # Data em que o evento vale (a do pagamento, p.ex.)
+    valor_devido = Column(DECIMAL(10, 2), default=0.00, nullable=False)
+    valor_pago = Column(DECIMAL(10, 2), default=0.00, nullable=False)
+    juros_multa = Column(DECIMAL(10, 2), default=0.00, nullable=False)
+    # Sem chave estrangeira: o estorno apaga o pagamento, mas os lançamentos dele ficam
+    id_pagamento = Column(Integer, index=True)
+    id_usuario = Column(Integer, ForeignKey("usuario.id_usuario", ondelete="SET NULL"))
+    data_registro = Column(DateTime, nullable=False, default=func.now())
+
+    pagamento = relationship("Pagamento", primaryjoin="foreign(LancamentoParcela.id_pagamento) == Pagamento.id_pagamento")
+
+    __table_args__ = (
+        Index('ix_lancamento_parcela_parcela_data', 'id_parcela', 'data_lancamento'),
+    )
+
+# Saldo acumulado de uma parcela no início de data_referencia (lançamentos anteriores a ela), gravado
+# pelo job ledger_snapshot.py para as parcelas com movimento.
+class SaldoParcela(Base):
+    __tablename__ = "saldo_parcela"
+    id_parcela = Column(Integer, ForeignKey("parcela.id_parcela", ondelete="CASCADE"), primary_key=True)
+    data_referencia = Column(Date, primary_key=True)
+    valor_devido = Column(DECIMAL(10, 2), nullable=False)
+    valor_pago = Column(DECIMAL(10, 2), nullable=False)
+    juros_multa = Column(DECIMAL(10, 2), nullable=False)
+
+# Respostas guardadas para o cabeçalho Idempotency-Key: um reenvio da mesma requisição (timeout, conexão
+# instável) devolve a resposta original sem repetir a operação. Ver app/idempotency.py.
+class ChaveIdempotencia(Base):
+    __tablename__ = "chave_idempotencia"
+    chave = Column(String(255), primary_key=True)
+    id_usuario = Column(Integer, ForeignKey("usuario.id_usuario", ondelete="CASCADE"), primary_key=True)
+    rota = Column(String(255), nullable=False)
+    hash_requisicao = Column(String(64), nullable=False) # SHA-256 da rota + corpo
+    status_code = Column(Integer) # NULL enquanto a requisição original não terminou
+    resposta = Column(JSON)
+    data_criacao = Column(DateTime, nullable=False, default=func.now())
+    expira_em = Column(DateTime, nullable=False, index=True)
+
 # <<<< NOVO MODELO: Produto >>>>
 class Produto(Base):
     __tablename__ = "produto"
@@ -101,6 +177,9 @@ class Produto(Base):
     unidade_medida = Column(String(20), nullable=True, default="unidade")
 
     data_cadastro = Column(DateTime, default=func.now())
+
+    # Índice da ordenação da listagem (nome, id), usado pela paginação por cursor
+    __table_args__ = (Index('ix_produto_nome_id_produto', 'nome', 'id_produto'),)
     # Opcional: Rastrear quem cadastrou
     # id_usuario_cadastro = Column(Integer, ForeignKey("usuario.id_usuario"), nullable=True)
     # cadastrado_por_usuario = relationship("Usuario", back_populates="produtos_cadastrados")
\ No newline at end of file
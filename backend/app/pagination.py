@@ -0,0 +1,54 @@
+# backend/app/pagination.py
+# Cursores opacos para paginação por chave (keyset). O token é um JSON com os valores das chaves de
+# ordenação do último item da página, codificado em base64 url-safe; o cliente apenas o devolve.
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+
+# Cabeçalho com o cursor da próxima página (ausente na última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _decode_value(value: Any, tipo: type) -> Any:
+    if value is None:
+        return None
+    if tipo is datetime:
+        return datetime.fromisoformat(value)
+    if tipo is date:
+        return date.fromisoformat(value)
+    return tipo(value)
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, tipos: Sequence[type]) -> List[Any]:
+    """Decodifica um cursor gerado por encode_cursor. Cursores inválidos resultam em 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != len(tipos):
+            raise ValueError("quantidade de chaves inválida")
+        return [_decode_value(v, t) for v, t in zip(values, tipos)]
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginação inválido.")
+
+def set_next_cursor(response: Response, items: Sequence[Any], limit: int, *keys: str) -> Optional[str]:
+    """
+    Se a página veio cheia, grava no cabeçalho X-Next-Cursor o cursor construído a partir dos
+    atributos `keys` do último item e o retorna. Páginas incompletas são a última: nenhum cursor.
+    """
+    if limit <= 0 or len(items) < limit:
+        return None
+    last = items[-1]
+    next_cursor = encode_cursor([getattr(last, key) for key in keys])
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return next_cursor
@@ -0,0 +1,82 @@
+# backend/app/receipts_export.py
+# Exportação do relatório de recebimentos em streaming (NDJSON ou CSV). As linhas vêm de um cursor do
+# lado do servidor (yield_per) sobre o SELECT plano de crud.receipts_report_query e são enviadas em
+# blocos à medida que chegam: a memória usada depende só do tamanho do bloco, não do período, e o
+# primeiro byte sai assim que o primeiro bloco é lido.
+#
+# A rota abre a sessão da exportação com open_session() (não usa a da requisição, get_db, que é fechada
+# antes de o corpo de um StreamingResponse ser enviado), calcula nela os totais dos cabeçalhos e a entrega
+# ao gerador, que lê as linhas e fecha a sessão no fim. A transação é REPEATABLE READ: totais e linhas vêm
+# do mesmo snapshot, mesmo com pagamentos gravados durante a exportação.
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import SessionLocal
+
+FORMATOS = ("ndjson", "csv")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+# Linhas lidas do cursor por vez (e enviadas por bloco)
+YIELD_PER = 1000
+
+COLUNAS = (
+    "id_pagamento", "id_parcela", "data_pagamento", "valor_pago", "forma_pagamento", "observacoes",
+    "id_usuario_registro", "cliente_nome", "carnes_descricao", "parcela_numero", "parcela_data_vencimento",
+)
+
+def _valor(valor):
+    # Datas em ISO 8601 e decimais como texto, como na resposta JSON
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if valor is None or isinstance(valor, (int, str)):
+        return valor
+    return str(valor)
+
+def open_session() -> Session:
+    """Sessão da exportação, numa transação REPEATABLE READ. Quem a recebe (stream_receipts) a fecha."""
+    db = SessionLocal()
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    return db
+
+def _blocos(db: Session, start_date: date, end_date: date) -> Iterator[list]:
+    try:
+        resultado = db.execute(
+            crud.receipts_report_query(start_date, end_date).execution_options(yield_per=YIELD_PER)
+        )
+        for bloco in resultado.partitions():
+            yield bloco
+    finally:
+        db.close()
+
+def _ndjson(db: Session, start_date: date, end_date: date) -> Iterator[str]:
+    for bloco in _blocos(db, start_date, end_date):
+        yield "".join(
+            json.dumps({coluna: _valor(row[i]) for i, coluna in enumerate(COLUNAS)}, ensure_ascii=False) + "\n"
+            for row in bloco
+        )
+
+def _csv(db: Session, start_date: date, end_date: date) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUNAS)
+    for bloco in _blocos(db, start_date, end_date):
+        writer.writerows([_valor(v) for v in row] for row in bloco)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell(): # Só o cabeçalho (período sem pagamentos)
+        yield buffer.getvalue()
+
+def stream_receipts(db: Session, start_date: date, end_date: date, formato: str) -> Iterator[str]:
+    """Gerador do corpo da exportação no formato pedido (ndjson ou csv); fecha `db` ao terminar."""
+    if formato == "csv":
+        return _csv(db, start_date, end_date)
+    return _ndjson(db, start_date, end_date)
@@ -1,33 +1,98 @@
 # backend/app/routers/carnes_router.py
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response, UploadFile, File
 from sqlalchemy.orm import Session
 from datetime import datetime, date, timedelta
 from typing import List, Optional
 
 from app import schemas, crud, models
 from app.dependencies import get_db, get_current_active_user, get_current_admin_user # Adicionado get_current_admin_user
+from app.pagination import set_next_cursor
+from app.config import CARNE_RESPONSE_ENGINE
+from app import carne_json, carne_import, idempotency
 # Removido 'get_password_hash', 'verify_password' se não forem usados neste arquivo
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/carnes",
     tags=["Carnes"],
 )
 
+# Com CARNE_RESPONSE_ENGINE=postgres, as leituras de carnê usam o JSON montado pelo banco
+def _use_json_engine(db: Session) -> bool:
+    return CARNE_RESPONSE_ENGINE == "postgres" and carne_json.supports_json_engine(db)
+
 # Rota para criar um novo carnê
 @router.post("/", response_model=schemas.CarneResponse, status_code=status.HTTP_201_CREATED)
 def create_carne_route(
     carne: schemas.CarneCreate,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=255),
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
+    # Reenvio com a mesma Idempotency-Key: devolve o carnê criado na primeira vez
+    resposta_anterior = idempotency.begin(db, idempotency_key, current_user.id_usuario, "POST /carnes/", carne)
+    if resposta_anterior is not None:
+        return resposta_anterior
     if not crud.get_client(db, client_id=carne.id_cliente):
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     # CORREÇÃO AQUI: Removido 'user_id=current_user.id_usuario'
-    return crud.create_carne(db=db, carne=carne) 
+    db_carne = crud.create_carne(db=db, carne=carne)
+    return idempotency.finish(db, idempotency_key, current_user.id_usuario, schemas.CarneResponse, db_carne, status_code=status.HTTP_201_CREATED)
+
+# Rota para importar carnês legados em lote a partir de um CSV (ver colunas em app/carne_import.py)
+@router.post("/import", response_model=schemas.CarneImportResponse)
+def import_carnes_route(
+    arquivo: UploadFile = File(...),
+    delimitador: str = Query(",", min_length=1, max_length=1),
+    lote: int = Query(carne_import.DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_admin_user)
+):
+    # O upload fica num arquivo temporário; a leitura é linha a linha, sem carregar o CSV inteiro
+    texto = io.TextIOWrapper(arquivo.file, encoding="utf-8-sig", newline="")
+    progresso = lambda r: logger.info(
+        f"Importação de carnês: {r['linhas_processadas']} linhas, {r['carnes_importados']} carnês, {r['total_erros']} erros"
+    )
+    return carne_import.import_carnes_csv(
+        db, texto, id_usuario=current_user.id_usuario, batch_size=lote, delimitador=delimitador, on_progress=progresso
+    )
+
+# Rotas de simulação: o mesmo cronograma que a criação geraria, sem gravar nada
+@router.post("/preview", response_model=schemas.CarneSimulacaoResponse)
+def preview_carne_route(
+    carne: schemas.CarneSimulacao,
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    return crud.preview_carne_schedule(carne)
+
+@router.post("/preview/batch", response_model=List[schemas.CarneSimulacaoLoteItem])
+def preview_carnes_batch_route(
+    lote: schemas.CarneSimulacaoLote,
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    return crud.preview_carne_schedules(lote.cenarios)
+
+# Rota para lançar vários pagamentos de uma vez (fechamento de caixa), numa única transação
+@router.post("/pagamentos/batch", response_model=List[schemas.PagamentoLoteItem])
+def create_pagamentos_batch_route(
+    lote: schemas.PagamentoLote,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    resposta_anterior = idempotency.begin(db, idempotency_key, current_user.id_usuario, "POST /carnes/pagamentos/batch", lote)
+    if resposta_anterior is not None:
+        return resposta_anterior
+    resultados = crud.create_pagamentos_batch(db, pagamentos=lote.pagamentos, usuario_id=current_user.id_usuario)
+    return idempotency.finish(db, idempotency_key, current_user.id_usuario, List[schemas.PagamentoLoteItem], resultados)
 
 # Rota para buscar todos os carnês
 @router.get("/", response_model=List[schemas.CarneResponse])
 def get_all_carnes_route( # Renomeado para get_all_carnes_route para clareza
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status_carne: Optional[str] = None, # Parâmetro de busca
@@ -35,13 +100,65 @@ def get_all_carnes_route( # Renomeado para get_all_carnes_route para clareza
     data_vencimento_inicio: Optional[date] = None,
     data_vencimento_fim: Optional[date] = None,
     search_query: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Cursor opaco da próxima página (cabeçalho X-Next-Cursor da resposta anterior); quando informado, skip é ignorado"),
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
+    if _use_json_engine(db):
+        # Documento montado pelo PostgreSQL, devolvido sem passar pelo ORM nem pelo Pydantic
+        content, rows = carne_json.get_carnes_json(db, skip=skip, limit=limit, cursor=cursor, status_carne=status_carne, id_cliente=client_id, data_vencimento_inicio=data_vencimento_inicio, data_vencimento_fim=data_vencimento_fim, search_query=search_query)
+        json_response = Response(content=content, media_type="application/json")
+        set_next_cursor(json_response, rows, limit, "data_venda", "data_criacao", "id_carne")
+        return json_response
+
     # A função crud.get_carnes já foi ajustada para lidar com esses parâmetros
-    carnes = crud.get_carnes(db, skip=skip, limit=limit, status_carne=status_carne, id_cliente=client_id, data_vencimento_inicio=data_vencimento_inicio, data_vencimento_fim=data_vencimento_fim, search_query=search_query)
+    carnes = crud.get_carnes(db, skip=skip, limit=limit, status_carne=status_carne, id_cliente=client_id, data_vencimento_inicio=data_vencimento_inicio, data_vencimento_fim=data_vencimento_fim, search_query=search_query, cursor=cursor)
+    set_next_cursor(response, carnes, limit, "data_venda", "data_criacao", "id_carne")
+    return carnes
+
+# Listagem leve: apenas dados do carnê/cliente e totais, sem parcelas nem pagamentos.
+# Declarada antes de "/{carne_id}" para não ser capturada por ela.
+@router.get("/summary", response_model=List[schemas.CarneSummaryResponse])
+def get_carnes_summary_route(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    status_carne: Optional[str] = None,
+    client_id: Optional[int] = None,
+    data_vencimento_inicio: Optional[date] = None,
+    data_vencimento_fim: Optional[date] = None,
+    search_query: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Cursor opaco da próxima página (cabeçalho X-Next-Cursor da resposta anterior); quando informado, skip é ignorado"),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    carnes = crud.get_carnes_summary(db, skip=skip, limit=limit, status_carne=status_carne, id_cliente=client_id, data_vencimento_inicio=data_vencimento_inicio, data_vencimento_fim=data_vencimento_fim, search_query=search_query, cursor=cursor)
+    set_next_cursor(response, carnes, limit, "data_venda", "data_criacao", "id_carne")
     return carnes
 
+# Rota para consultar o saldo do carnê em uma data (pelo razão das parcelas)
+@router.get("/{carne_id}/saldo", response_model=schemas.SaldoCarneResponse)
+def get_carne_balance_route(
+    carne_id: int,
+    data: Optional[date] = Query(None, description="Saldo no fim deste dia (YYYY-MM-DD). Padrão: hoje."),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    saldo = crud.get_carne_balance_as_of(db, carne_id=carne_id, data_referencia=data or date.today())
+    if saldo is None:
+        raise HTTPException(status_code=404, detail="Carnê não encontrado")
+    return saldo
+
+# Rota para listar os lançamentos do razão de um carnê (ou de uma parcela dele)
+@router.get("/{carne_id}/lancamentos", response_model=List[schemas.LancamentoParcelaResponse])
+def get_carne_ledger_route(
+    carne_id: int,
+    parcela_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    return crud.get_carne_ledger(db, carne_id=carne_id, parcela_id=parcela_id)
+
 # Rota para buscar um carnê específico pelo ID
 @router.get("/{carne_id}", response_model=schemas.CarneResponse)
 def get_carne_by_id_route( # Renomeado para get_carne_by_id_route
@@ -49,6 +166,12 @@ def get_carne_by_id_route( # Renomeado para get_carne_by_id_route
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
+    if _use_json_engine(db):
+        content = carne_json.get_carne_json(db, carne_id)
+        if content is None:
+            raise HTTPException(status_code=404, detail="Carnê não encontrado")
+        return Response(content=content, media_type="application/json")
+
     db_carne = crud.get_carne(db, carne_id=carne_id) # Usando crud.get_carne
     if db_carne is None:
         raise HTTPException(status_code=404, detail="Carnê não encontrado")
@@ -74,7 +197,7 @@ def delete_carne_route(
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
-    success = crud.delete_carne(db, carne_id=carne_id)
+    success = crud.delete_carne(db, carne_id=carne_id, usuario_id=current_user.id_usuario)
     if not success:
         raise HTTPException(status_code=404, detail="Carnê não encontrado")
     return {"message": "Carnê deletado com sucesso."}
@@ -85,6 +208,7 @@ def create_pagamento_route(
     carne_id: int,
     parcela_id: int,
     pagamento: schemas.PagamentoCreate,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=255),
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
@@ -92,6 +216,13 @@ def create_pagamento_route(
     if pagamento.id_parcela != parcela_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ID da parcela no corpo da requisição não corresponde ao ID da URL.")
 
+    # Reenvio com a mesma Idempotency-Key: devolve o pagamento já registrado, sem pagar de novo
+    resposta_anterior = idempotency.begin(
+        db, idempotency_key, current_user.id_usuario, f"POST /carnes/{carne_id}/parcelas/{parcela_id}/pagar", pagamento
+    )
+    if resposta_anterior is not None:
+        return resposta_anterior
+
     db_pagamento = crud.create_pagamento(
         db=db,
         pagamento=pagamento,
@@ -99,7 +230,24 @@ def create_pagamento_route(
     )
     if db_pagamento is None:
         raise HTTPException(status_code=404, detail="Parcela não encontrada ou pagamento inválido.")
-    return db_pagamento
+    return idempotency.finish(db, idempotency_key, current_user.id_usuario, schemas.PagamentoResponse, db_pagamento)
+
+# Rota para pagar um valor no carnê: distribuído entre as parcelas em aberto, das mais antigas para as mais novas
+@router.post("/{carne_id}/pagar", response_model=schemas.PagamentoCarneResponse)
+def pay_carne_route(
+    carne_id: int,
+    pagamento: schemas.PagamentoCarneCreate,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    resposta_anterior = idempotency.begin(db, idempotency_key, current_user.id_usuario, f"POST /carnes/{carne_id}/pagar", pagamento)
+    if resposta_anterior is not None:
+        return resposta_anterior
+    resultado = crud.pay_carne(db, carne_id=carne_id, pagamento=pagamento, usuario_id=current_user.id_usuario)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Carnê não encontrado")
+    return idempotency.finish(db, idempotency_key, current_user.id_usuario, schemas.PagamentoCarneResponse, resultado)
 
 # Rota para estornar um pagamento
 @router.post("/{carne_id}/parcelas/{parcela_id}/reverse-payment", status_code=status.HTTP_200_OK)
@@ -110,7 +258,7 @@ def reverse_payment_route(
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_admin_user) # Sugestão: tornar esta rota exclusiva para admin
 ):
-    result = crud.delete_pagamento(db, pagamento_id=pagamento_info.pagamento_id)
+    result = crud.delete_pagamento(db, pagamento_id=pagamento_info.pagamento_id, usuario_id=current_user.id_usuario)
     
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pagamento não encontrado para estorno ou já estornado.")
@@ -129,7 +277,8 @@ def renegotiate_parcela_route(
     db_parcela = crud.renegotiate_parcela(
         db=db,
         parcela_id=parcela_id,
-        renegotiation_data=renegotiation_data # Passa o objeto completo
+        renegotiation_data=renegotiation_data, # Passa o objeto completo
+        usuario_id=current_user.id_usuario
     )
     if db_parcela is None:
         raise HTTPException(status_code=404, detail="Parcela não encontrada ou renegociação inválida.")
@@ -1,10 +1,11 @@
 # backend/app/routers/clients_router.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional # Optional já estava importado
 from app import schemas, crud, models # models importado para current_user type hint
 from app.database import get_db
 from app.auth import get_current_active_user, get_current_admin_user
+from app.pagination import set_next_cursor
 
 router = APIRouter(
     prefix="/clients",  # Prefixo definido aqui
@@ -17,13 +18,16 @@ def create_client(client: schemas.ClientCreate, db: Session = Depends(get_db), c
 
 @router.get("/", response_model=List[schemas.ClientResponse]) # Path ajustado de "/clients/" para "/"
 def read_clients(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search_query: Optional[str] = Query(None, description="Buscar clientes por nome ou CPF/CNPJ"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco da próxima página (cabeçalho X-Next-Cursor da resposta anterior); quando informado, skip é ignorado"),
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
-    clients = crud.get_clients(db, skip=skip, limit=limit, search_query=search_query)
+    clients = crud.get_clients(db, skip=skip, limit=limit, search_query=search_query, cursor=cursor)
+    set_next_cursor(response, clients, limit, "relevancia", "nome", "id_cliente")
     return clients
 
 @router.get("/{client_id}", response_model=schemas.ClientResponse) # Path ajustado de "/clients/{client_id}" para "/{client_id}"
@@ -42,7 +46,7 @@ def update_client(client_id: int, client_update: schemas.ClientUpdate, db: Sessi
 
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT) # Path ajustado de "/clients/{client_id}" para "/{client_id}"
 def delete_client(client_id: int, db: Session = Depends(get_db), current_user: models.Usuario = Depends(get_current_admin_user)):
-    db_client = crud.delete_client(db, client_id=client_id)
+    db_client = crud.delete_client(db, client_id=client_id, usuario_id=current_user.id_usuario)
     if db_client is None:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     return {}
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app import schemas, crud, models
 from app.database import get_db
 from app.auth import get_current_active_user, get_current_admin_user # Para proteger rotas
+from app.pagination import set_next_cursor
 
 router = APIRouter(
     prefix="/produtos",
@@ -20,15 +21,18 @@ def create_new_produto(
 
 @router.get("/", response_model=List[schemas.ProdutoResponse])
 def read_all_produtos(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     search_query: Optional[str] = Query(None, description="Buscar produtos por nome"),
     categoria: Optional[str] = Query(None, description="Filtrar por categoria"),
     marca: Optional[str] = Query(None, description="Filtrar por marca"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco da próxima página (cabeçalho X-Next-Cursor da resposta anterior); quando informado, skip é ignorado"),
     db: Session = Depends(get_db), 
     current_user: models.Usuario = Depends(get_current_active_user) # Qualquer usuário logado pode ver
 ):
-    produtos = crud.get_produtos(db, skip=skip, limit=limit, search_query=search_query, categoria=categoria, marca=marca)
+    produtos = crud.get_produtos(db, skip=skip, limit=limit, search_query=search_query, categoria=categoria, marca=marca, cursor=cursor)
+    set_next_cursor(response, produtos, limit, "relevancia", "nome", "id_produto")
     return produtos
 
 @router.get("/{produto_id}", response_model=schemas.ProdutoResponse)
@@ -1,23 +1,83 @@
 # backend/app/routers/reports_router.py
 # (Conteúdo original do seu arquivo, que já estava correto na definição do APIRouter)
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
+from typing import List, Literal
 from app import schemas, crud, models # models importado para current_user type hint
+from app import receipts_export
 from app.database import get_db
-from app.auth import get_current_active_user # Removido get_current_admin_user se não for usado aqui diretamente
+from app.auth import get_current_active_user, get_current_admin_user
+from app.cache import dashboard_cache
 from datetime import date
 
 router = APIRouter(prefix="/reports", tags=["Relatórios e Dashboard"])
 
 @router.get("/dashboard/summary", response_model=schemas.DashboardSummaryResponse)
 def get_dashboard_summary_route(db: Session = Depends(get_db), current_user: models.Usuario = Depends(get_current_active_user)):
-    summary_data = crud.get_dashboard_summary(db)
+    summary_data = crud.get_dashboard_summary_cached(db)
     return summary_data
 
+# Contadores de acerto/falha do cache do resumo do dashboard
+@router.get("/dashboard/cache-stats", response_model=schemas.CacheStatsResponse)
+def get_dashboard_cache_stats_route(current_user: models.Usuario = Depends(get_current_admin_user)):
+    return dashboard_cache.stats()
+
+# Persiste juros/multas e status de todas as parcelas vencidas (o mesmo job de apply_interest_accrual.py).
+# As rotas de leitura apenas calculam esses valores em memória.
+@router.post("/interest-accrual", response_model=schemas.InterestAccrualResponse)
+def run_interest_accrual_route(db: Session = Depends(get_db), current_user: models.Usuario = Depends(get_current_admin_user)):
+    return crud.apply_interest_and_fines_bulk(db)
+
 @router.get("/receipts", response_model=schemas.ReceiptsReportResponse)
 def get_receipts_report_route(
     start_date: date = Query(..., description="Data de início do período (YYYY-MM-DD)"),
     end_date: date = Query(..., description="Data de fim do período (YYYY-MM-DD)"),
+    formato: Literal["json", "ndjson", "csv"] = Query("json", description="json (padrão) ou exportação em streaming: ndjson ou csv"),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A data de início não pode ser posterior à data de fim."
+        )
+    if formato in receipts_export.FORMATOS:
+        # Linhas enviadas à medida que saem do cursor; quantidade e total (somados no banco) vão nos cabeçalhos.
+        # Totais e cursor na mesma sessão REPEATABLE READ (mesmo snapshot), fechada pelo gerador ao terminar
+        # ou, se o corpo nem chegar a ser enviado, pela tarefa de fundo
+        export_db = receipts_export.open_session()
+        try:
+            quantidade, total = crud.get_receipts_totals(export_db, start_date, end_date)
+        except Exception:
+            export_db.close()
+            raise
+        headers = {"X-Total-Pagamentos": str(quantidade), "X-Total-Recebido": str(total)}
+        if formato == "csv":
+            headers["Content-Disposition"] = f'attachment; filename="recebimentos_{start_date}_{end_date}.csv"'
+        return StreamingResponse(
+            receipts_export.stream_receipts(export_db, start_date, end_date, formato),
+            media_type=receipts_export.MEDIA_TYPES[formato],
+            headers=headers,
+            background=BackgroundTask(export_db.close)
+        )
+    # Total e linhas no mesmo snapshot: a sessão da requisição já abriu a transação (autenticação) no
+    # isolamento padrão, então usa uma sessão REPEATABLE READ própria, como a exportação
+    report_db = receipts_export.open_session()
+    try:
+        return crud.get_receipts_report(report_db, start_date, end_date)
+    finally:
+        report_db.close()
+
+# Recebimentos agrupados por dia/semana/mês e, opcionalmente, forma de pagamento e usuário (com subtotais)
+@router.get("/receipts/grouped", response_model=schemas.RecebimentosAgrupadosResponse)
+def get_receipts_grouped_route(
+    start_date: date = Query(..., description="Data de início do período (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Data de fim do período (YYYY-MM-DD)"),
+    periodo: Literal["dia", "semana", "mes"] = Query("dia"),
+    agrupar_por: List[Literal["forma_pagamento", "id_usuario_registro"]] = Query([], description="Dimensões além do período, na ordem dos subtotais"),
+    rollup: bool = Query(False, description="Inclui subtotais de cada nível e o total geral"),
     db: Session = Depends(get_db),
     current_user: models.Usuario = Depends(get_current_active_user)
 ):
@@ -26,8 +86,7 @@ def get_receipts_report_route(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="A data de início não pode ser posterior à data de fim."
         )
-    report_data = crud.get_receipts_report(db, start_date, end_date)
-    return report_data
+    return crud.get_receipts_grouped(db, start_date, end_date, periodo=periodo, agrupar_por=agrupar_por, rollup=rollup)
 
 @router.get("/pending-debts-by-client/{client_id}", response_model=schemas.PendingDebtsReportResponse)
 def get_pending_debts_by_client_route(
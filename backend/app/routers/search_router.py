@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from app import schemas, crud, models
+from app.database import get_db
+from app.auth import get_current_active_user
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Busca"]
+)
+
+@router.get("/", response_model=List[schemas.SearchHit])
+def search(
+    q: str = Query(..., min_length=1, description="Termo buscado em clientes, carnês e produtos"),
+    limite_por_tipo: int = Query(5, ge=1, le=50, description="Máximo de resultados de cada tipo"),
+    tipos: Optional[List[str]] = Query(None, description="Restringe a busca a estes tipos (cliente, carne, produto)"),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    """Busca unificada: clientes, carnês e produtos que casam com o termo, do mais relevante para o menos."""
+    return crud.search_all(db, q, limite_por_tipo=limite_por_tipo, tipos=tipos)
+
+@router.get("/autocomplete", response_model=List[schemas.AutocompleteItem])
+def autocomplete(
+    q: str = Query(..., min_length=1, description="Início do nome, CPF/CNPJ (clientes) ou SKU/IMEI (produtos)"),
+    tipo: Literal["cliente", "produto"] = Query("cliente"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.Usuario = Depends(get_current_active_user)
+):
+    """Sugestões para campos de busca digitada (Nova Venda), servidas de um índice em memória."""
+    return crud.autocomplete(db, q, tipo, limit)
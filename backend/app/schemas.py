@@ -259,6 +259,38 @@ class CarneResponse(CarneBase):
     class Config:
         from_attributes = True
 
+# Projeção leve para a listagem de carnês (sem parcelas nem pagamentos)
+class CarneSummaryResponse(BaseModel):
+    id_carne: int
+    id_cliente: int
+    data_venda: Optional[date] = None
+    descricao: Optional[str] = None
+    valor_total_original: Decimal
+    valor_entrada: Decimal
+    numero_parcelas: int
+    data_primeiro_vencimento: date
+    frequencia_pagamento: str
+    status_carne: str
+    parcela_fixa: bool
+    data_criacao: Optional[datetime] = None
+    total_parcelas: int
+    parcelas_pagas: int
+    parcelas_atrasadas: int
+    cliente_nome: str
+    cliente_cpf_cnpj: str
+    total_pago: Decimal # Soma do valor pago nas parcelas (sem a entrada)
+    saldo_devedor_total: Decimal # Soma do saldo devedor das parcelas em aberto
+
+    class Config:
+        from_attributes = True
+
+class CacheStatsResponse(BaseModel):
+    backend: str
+    ttl_seconds: int
+    hits: int
+    misses: int
+    hit_ratio: float
+
 class DashboardSummaryResponse(BaseModel):
     total_clientes: int
     total_carnes: int
@@ -274,6 +306,14 @@ class DashboardSummaryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Resultado da aplicação em lote de juros/multas (persistência explícita, fora do caminho de leitura)
+class InterestAccrualResponse(BaseModel):
+    data_referencia: date
+    parcelas_zeradas: int
+    parcelas_atrasadas_atualizadas: int
+    parcelas_quitadas: int
+    carnes_atualizados: int
+
 # --- Schemas Aninhados para Respostas Completas (conforme seu último upload) ---
 class ClientResponseFull(ClientResponse): # ClientResponse já herda de ClientBase
     # data_cadastro já está em ClientResponse via ClientBase
@@ -309,4 +349,134 @@ class ProdutoResponse(ProdutoBase):
     data_cadastro: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Busca unificada (/search)
+class SearchHit(BaseModel):
+    tipo: str # 'cliente', 'carne' ou 'produto'
+    id: int
+    titulo: str
+    subtitulo: Optional[str] = None
+    relevancia: float
+
+# Autocomplete (/search/autocomplete): só o necessário para a lista de sugestões
+class AutocompleteItem(BaseModel):
+    tipo: str # 'cliente' ou 'produto'
+    id: int
+    titulo: str
+    subtitulo: Optional[str] = None
+
+# Importação em lote de carnês (CSV)
+class CarneImportError(BaseModel):
+    linha: int
+    erro: str
+
+class CarneImportResponse(BaseModel):
+    linhas_processadas: int
+    carnes_importados: int
+    clientes_criados: int
+    pagamentos_importados: int
+    total_erros: int
+    erros: List[CarneImportError] = [] # Limitado às primeiras linhas com erro; total_erros traz a contagem completa
+
+# Simulação do cronograma de um carnê (não grava nada)
+# Limite de parcelas por cenário simulado (e das sequências de vencimentos guardadas em cache no crud)
+MAX_PARCELAS_SIMULACAO = 120
+
+class CarneSimulacao(CarneCreate):
+    id_cliente: Optional[int] = None # Não é preciso escolher o cliente para simular
+    data_venda: Optional[date] = None
+    numero_parcelas: int = Field(..., gt=0, le=MAX_PARCELAS_SIMULACAO)
+
+class ParcelaSimulada(BaseModel):
+    numero_parcela: int
+    valor_devido: Decimal
+    data_vencimento: date
+
+class CarneSimulacaoResponse(BaseModel):
+    numero_parcelas: int
+    valor_a_parcelar: Decimal
+    valor_parcela_original: Decimal
+    frequencia_pagamento: str
+    valor_total_parcelas: Decimal
+    parcelas: List[ParcelaSimulada] = []
+
+class CarneSimulacaoLote(BaseModel):
+    cenarios: List[CarneSimulacao] = Field(..., min_length=1, max_length=500)
+
+class CarneSimulacaoLoteItem(BaseModel):
+    indice: int # Posição do cenário na lista enviada
+    simulacao: Optional[CarneSimulacaoResponse] = None
+    erro: Optional[str] = None
+
+# Lançamento de vários pagamentos numa única transação (fechamento de caixa)
+class PagamentoLote(BaseModel):
+    pagamentos: List[PagamentoCreate] = Field(..., min_length=1, max_length=500)
+
+class PagamentoLoteItem(BaseModel):
+    indice: int # Posição do pagamento na lista enviada
+    pagamento: Optional[PagamentoResponse] = None
+    erro: Optional[str] = None
+
+# Pagamento de um valor no carnê, distribuído entre as parcelas em aberto (mais antigas primeiro)
+class PagamentoCarneCreate(BaseModel):
+    valor_pago: Decimal = Field(..., gt=0)
+    forma_pagamento: str = Field(..., description="Forma de pagamento (e.g., 'Dinheiro', 'PIX', 'Cartão')")
+    observacoes: Optional[str] = None
+    data_pagamento: Optional[datetime] = None
+
+class PagamentoCarneResponse(BaseModel):
+    id_carne: int
+    valor_pago: Decimal
+    saldo_devedor_restante: Decimal
+    pagamentos: List[PagamentoResponse] = [] # Um por parcela atingida, na ordem da alocação
+
+# Razão das parcelas: lançamentos e saldo em uma data
+class LancamentoParcelaResponse(BaseModel):
+    id_lancamento: int
+    id_parcela: Optional[int] = None # Nulo se a parcela foi removida (fica o lançamento de encerramento)
+    tipo: str # abertura, pagamento, estorno, juros, renegociacao, ajuste, encerramento
+    data_lancamento: datetime
+    valor_devido: Decimal # Variações, não saldos
+    valor_pago: Decimal
+    juros_multa: Decimal
+    id_pagamento: Optional[int] = None
+    id_usuario: Optional[int] = None
+    data_registro: datetime
+
+    class Config:
+        from_attributes = True
+
+class SaldoParcelaResponse(BaseModel):
+    id_parcela: int
+    numero_parcela: int
+    valor_devido: Decimal
+    valor_pago: Decimal
+    juros_multa: Decimal
+    saldo_devedor: Decimal
+
+class SaldoCarneResponse(BaseModel):
+    id_carne: int
+    data_referencia: date # Saldo no fim deste dia
+    valor_devido: Decimal
+    valor_pago: Decimal
+    juros_multa: Decimal
+    saldo_devedor: Decimal
+    parcelas: List[SaldoParcelaResponse] = []
+
+# Recebimentos agrupados por período (dia/semana/mês) e, opcionalmente, forma de pagamento e usuário
+class RecebimentoAgrupadoItem(BaseModel):
+    periodo: Optional[date] = None # Início do dia/semana/mês; None na linha de total geral
+    forma_pagamento: Optional[str] = None
+    id_usuario_registro: Optional[int] = None
+    usuario_nome: Optional[str] = None
+    quantidade: int
+    total_recebido: Decimal
+    subtotal: bool = False # Linha de subtotal/total gerada pelo ROLLUP
+
+class RecebimentosAgrupadosResponse(BaseModel):
+    start_date: date
+    end_date: date
+    periodo: str
+    agrupar_por: List[str] = []
+    itens: List[RecebimentoAgrupadoItem] = []
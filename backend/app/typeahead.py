@@ -0,0 +1,113 @@
+# backend/app/typeahead.py
+# Índice de prefixos em memória para o autocomplete de clientes e produtos (tela de Nova Venda).
+# Cada entrada tem várias chaves normalizadas (sem acento, minúsculas) guardadas numa lista ordenada;
+# a busca por prefixo é um bisect seguido de uma varredura curta, sem ir ao banco.
+# O índice é carregado na inicialização (crud.warm_autocomplete_indexes) e mantido pelas funções de
+# create/update/delete do CRUD. Cada processo (worker) tem o seu.
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+def normalize(texto: Optional[str]) -> str:
+    """Minúsculas, sem acentos e com espaços simples: 'João  da Silva' -> 'joao da silva'."""
+    if not texto:
+        return ""
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.lower().split())
+
+def _only_alnum(texto: Optional[str]) -> str:
+    return re.sub(r"[^0-9a-z]", "", normalize(texto))
+
+def name_keys(nome: Optional[str]) -> List[str]:
+    """O nome a partir de cada palavra, para 'silva' e 'maria sil' encontrarem 'Maria Silva'."""
+    palavras = normalize(nome).split()
+    return [" ".join(palavras[i:]) for i in range(len(palavras))]
+
+class PrefixIndex:
+    """Lista ordenada de (chave, id) com os itens compactos por id. Seguro para uso entre threads."""
+    def __init__(self):
+        self._chaves: List[Tuple[str, int]] = []
+        self._itens: Dict[int, Tuple[List[str], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, entradas: Iterable[Tuple[int, List[str], Dict[str, Any]]]) -> None:
+        """Substitui todo o conteúdo (carga inicial), ordenando uma única vez."""
+        itens = {id_: (chaves, item) for id_, chaves, item in entradas}
+        chaves = sorted((chave, id_) for id_, (lista, _) in itens.items() for chave in set(lista) if chave)
+        with self._lock:
+            self._itens, self._chaves = itens, chaves
+            self.loaded = True
+
+    def _remove_locked(self, id_: int) -> None:
+        anterior = self._itens.pop(id_, None)
+        if anterior is None:
+            return
+        for chave in set(anterior[0]):
+            if not chave:
+                continue
+            posicao = bisect_left(self._chaves, (chave, id_))
+            if posicao < len(self._chaves) and self._chaves[posicao] == (chave, id_):
+                del self._chaves[posicao]
+
+    def upsert(self, id_: int, chaves: List[str], item: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remove_locked(id_)
+            self._itens[id_] = (chaves, item)
+            for chave in set(chaves):
+                if chave:
+                    insort(self._chaves, (chave, id_))
+
+    def remove(self, id_: int) -> None:
+        with self._lock:
+            self._remove_locked(id_)
+
+    def search(self, prefixo: str, limit: int) -> List[Dict[str, Any]]:
+        """Até `limit` itens com alguma chave começando por `prefixo` (já normalizado), na ordem das chaves."""
+        if not prefixo or limit <= 0:
+            return []
+        encontrados: List[Dict[str, Any]] = []
+        vistos = set()
+        with self._lock:
+            posicao = bisect_left(self._chaves, (prefixo,))
+            while posicao < len(self._chaves) and len(encontrados) < limit:
+                chave, id_ = self._chaves[posicao]
+                if not chave.startswith(prefixo):
+                    break
+                if id_ not in vistos:
+                    vistos.add(id_)
+                    encontrados.append(self._itens[id_][1])
+                posicao += 1
+        return encontrados
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+# --- Entradas de cada tipo ---
+def client_entry(cliente) -> Tuple[int, List[str], Dict[str, Any]]:
+    item = {"tipo": "cliente", "id": cliente.id_cliente, "titulo": cliente.nome, "subtitulo": cliente.cpf_cnpj}
+    return cliente.id_cliente, name_keys(cliente.nome) + [_only_alnum(cliente.cpf_cnpj)], item
+
+def product_entry(produto) -> Tuple[int, List[str], Dict[str, Any]]:
+    item = {"tipo": "produto", "id": produto.id_produto, "titulo": produto.nome, "subtitulo": produto.codigo_sku or produto.marca}
+    chaves = name_keys(produto.nome) + [_only_alnum(produto.codigo_sku), _only_alnum(produto.imei)]
+    return produto.id_produto, chaves, item
+
+def autocomplete(index: PrefixIndex, termo: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Até `limit` itens do índice para o que foi digitado. Documentos (CPF/CNPJ, SKU, IMEI) são indexados
+    sem pontuação, então o termo também é procurado só com letras e dígitos ('123.456' -> '123456').
+    """
+    encontrados = index.search(normalize(termo), limit)
+    compacto = _only_alnum(termo)
+    if len(encontrados) < limit and compacto and compacto != normalize(termo):
+        ids = {item["id"] for item in encontrados}
+        for item in index.search(compacto, limit):
+            if item["id"] not in ids and len(encontrados) < limit:
+                encontrados.append(item)
+    return encontrados
+
+client_index = PrefixIndex()
+product_index = PrefixIndex()
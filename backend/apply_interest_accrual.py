@@ -0,0 +1,50 @@
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import crud
+
+# Job de acúmulo de juros/multas.
+# Deve ser agendado para rodar uma vez por dia, logo após a meia-noite (ex.: cron "5 0 * * *"),
+# para que as leituras da API encontrem juros, saldos e status já atualizados para o dia.
+
+def run_interest_accrual(reference_date: date = None):
+    """
+    Aplica juros/multas em lote em todas as parcelas vencidas e recalcula o status dos carnês.
+    """
+    print("Iniciando o acúmulo de juros e multas...")
+
+    db: Session = SessionLocal()
+
+    try:
+        resultado = crud.apply_interest_and_fines_bulk(db, reference_date=reference_date)
+
+        print("\n" + "="*50)
+        print(f"   Data de referência: {resultado['data_referencia']}")
+        print(f"   Parcelas em atraso atualizadas: {resultado['parcelas_atrasadas_atualizadas']}")
+        print(f"   Parcelas marcadas como pagas: {resultado['parcelas_quitadas']}")
+        print(f"   Parcelas com juros residuais zerados: {resultado['parcelas_zeradas']}")
+        print(f"   Carnês com status atualizado: {resultado['carnes_atualizados']}")
+        print("="*50 + "\n")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ocorreu um erro ao aplicar juros e multas: {e}")
+        raise
+    finally:
+        db.close()
+        print("Script finalizado.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aplica juros/multas em lote nas parcelas vencidas.")
+    parser.add_argument(
+        "--data",
+        help="Data de referência no formato YYYY-MM-DD (padrão: hoje)",
+        type=lambda valor: datetime.strptime(valor, "%Y-%m-%d").date(),
+        default=None
+    )
+    args = parser.parse_args()
+
+    run_interest_accrual(reference_date=args.data)
@@ -0,0 +1,134 @@
+import argparse
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import crud, models, schemas
+from app.interest import STATUS_PARCELA_ENCERRADA, calculate_interest_and_fine
+
+# Benchmark dos juros/multas de hoje nos relatórios do cliente (pendências e resumo) com muitas parcelas
+# em aberto. Tudo roda numa única transação que é desfeita no final: as linhas de teste nunca são gravadas.
+# Compara o cálculo feito pelo banco na própria consulta (crud) com o cálculo em Python, parcela a
+# parcela, por interest.calculate_interest_and_fine, e confere que os dois dão o mesmo total.
+
+def seed(db: Session, parcelas: int) -> int:
+    print(f"Inserindo um cliente com {parcelas} parcelas em aberto...")
+    id_cliente = db.execute(text(
+        "INSERT INTO cliente (nome, cpf_cnpj, data_cadastro) VALUES ('Cliente Benchmark Juros', 'BENCH-JUROS', now()) RETURNING id_cliente"
+    )).scalar_one()
+    carnes = max(parcelas // 100, 1)
+    db.execute(text("""
+        INSERT INTO carne (id_cliente, data_venda, descricao, valor_total_original, numero_parcelas, valor_parcela_original,
+                           data_criacao, data_primeiro_vencimento, frequencia_pagamento, status_carne, valor_entrada,
+                           parcela_fixa, total_parcelas, parcelas_pagas, parcelas_atrasadas, parcelas_parcialmente_pagas)
+        SELECT :id_cliente, current_date - 1000, 'Benchmark ' || i, 10000, 100, 100, now(), current_date - 900,
+               'mensal', 'Em Atraso', 0, true, 100, 0, 0, 0
+        FROM generate_series(1, :carnes) AS i
+    """), {"id_cliente": id_cliente, "carnes": carnes})
+    # Valores, pagamentos parciais e atrasos variados (parte das parcelas ainda a vencer)
+    db.execute(text("""
+        INSERT INTO parcela (id_carne, numero_parcela, valor_devido, data_vencimento, valor_pago, saldo_devedor,
+                             status_parcela, juros_multa, juros_multa_anterior_aplicada)
+        SELECT c.id_carne, n, v.devido, current_date - ((c.id_carne * 37 + n * 11) % 1200) + 60, v.pago, v.devido - v.pago,
+               'Pendente', 0, 0
+        FROM carne c
+        CROSS JOIN generate_series(1, 100) AS n
+        CROSS JOIN LATERAL (
+            SELECT round((50 + (c.id_carne * 13 + n * 7) % 4950)::numeric + ((c.id_carne + n) % 100) / 100.0, 2) AS devido,
+                   round(((c.id_carne * 3 + n) % 40)::numeric, 2) AS pago
+        ) AS v
+        WHERE c.id_cliente = :id_cliente
+    """), {"id_cliente": id_cliente})
+    db.execute(text("ANALYZE carne"))
+    db.execute(text("ANALYZE parcela"))
+    return id_cliente
+
+def _parcelas_por_linha(db: Session, id_cliente: int, *colunas, **filtros):
+    """
+    Parcelas em aberto do cliente com juros/multa, saldo e status de hoje calculados em Python, uma parcela
+    por vez, por interest.calculate_interest_and_fine (referência para comparar com o cálculo no banco).
+    """
+    today = date.today()
+    consulta = db.query(
+        models.Parcela.valor_devido, models.Parcela.valor_pago, models.Parcela.data_vencimento,
+        models.Parcela.saldo_devedor, models.Parcela.juros_multa, models.Parcela.status_parcela, *colunas
+    ).join(models.Carne).filter(
+        models.Carne.id_cliente == id_cliente,
+        models.Parcela.status_parcela.not_in(STATUS_PARCELA_ENCERRADA)
+    )
+    if filtros.get("so_carnes_abertos"):
+        consulta = consulta.filter(models.Carne.status_carne.not_in(['Quitado', 'Cancelado']))
+    for parcela in consulta:
+        item = dict(parcela._mapping)
+        if parcela.data_vencimento < today:
+            principal_aberto = parcela.valor_devido - parcela.valor_pago
+            if principal_aberto <= Decimal('0.00'):
+                continue
+            item["juros_multa"] = calculate_interest_and_fine(parcela.valor_devido, parcela.valor_pago, parcela.data_vencimento, today)
+            item["saldo_devedor"] = principal_aberto + item["juros_multa"]
+            item["status_parcela"] = 'Atrasada'
+        yield item
+
+def pendencias_por_linha(db: Session, id_cliente: int):
+    total = Decimal('0.00')
+    itens = []
+    for item in _parcelas_por_linha(
+        db, id_cliente, models.Parcela.id_parcela, models.Parcela.numero_parcela, models.Parcela.id_carne,
+        models.Carne.descricao.label("carnes_descricao"), models.Carne.status_carne.label("carne_status")
+    ):
+        total += item["saldo_devedor"]
+        itens.append(schemas.PendingDebtItem(**item))
+    return float(total)
+
+def divida_aberta_por_linha(db: Session, id_cliente: int):
+    return float(sum((item["saldo_devedor"] for item in _parcelas_por_linha(db, id_cliente, so_carnes_abertos=True)), Decimal('0.00')))
+
+def medir(db: Session, funcao, repeticoes: int):
+    resultado = funcao() # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        db.expunge_all()
+    return statistics.median(tempos), resultado
+
+def run_benchmark(parcelas: int, repeticoes: int):
+    db: Session = SessionLocal()
+    try:
+        id_cliente = seed(db, parcelas)
+
+        cenarios = [
+            ("pendências do cliente",
+             lambda: crud.get_pending_debts_by_client(db, id_cliente).total_divida_pendente,
+             lambda: pendencias_por_linha(db, id_cliente)),
+            ("resumo do cliente (dívida aberta)",
+             lambda: crud.get_client_summary(db, id_cliente).total_divida_aberta,
+             lambda: divida_aberta_por_linha(db, id_cliente)),
+        ]
+
+        print("\n" + "="*78)
+        print(f"   {'cenário':<36}{'no banco':>13}{'por parcela':>15}{'total confere':>14}")
+        for nome, no_banco, por_linha in cenarios:
+            tempo_banco, total_banco = medir(db, no_banco, repeticoes)
+            tempo_linha, total_linha = medir(db, por_linha, repeticoes)
+            confere = "sim" if round(total_banco, 2) == round(total_linha, 2) else "NÃO"
+            print(f"   {nome:<36}{tempo_banco:>10.2f} ms{tempo_linha:>12.2f} ms{confere:>14}")
+        print("="*78 + "\n")
+    finally:
+        db.rollback() # Descarta as linhas de teste
+        db.close()
+        print("Script finalizado (dados de teste descartados).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede os relatórios do cliente com juros/multas calculados para hoje.")
+    parser.add_argument("--parcelas", type=int, default=200_000, help="Parcelas em aberto do cliente de teste (padrão: 200000)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Execuções por cenário (padrão: 5)")
+    args = parser.parse_args()
+
+    run_benchmark(args.parcelas, args.repeticoes)
@@ -0,0 +1,108 @@
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import crud
+
+# Benchmark da busca de clientes, carnês e produtos em tabelas com muitas linhas.
+# Tudo roda numa única transação que é desfeita no final: as linhas de teste nunca são gravadas.
+# Compara a latência com os índices trigram (pg_trgm) e forçando varredura sequencial.
+
+NOMES = ['Maria', 'José', 'Ana', 'João', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Pedro', 'Lucas',
+         'Luiz', 'Marcos', 'Luís', 'Gabriel', 'Rafael', 'Daniel', 'Marcelo', 'Bruno', 'Eduardo', 'Felipe']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima',
+              'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes']
+PRODUTOS = ['Celular', 'Capinha', 'Carregador', 'Fone de Ouvido', 'Película', 'Cabo USB', 'Smartwatch', 'Tablet']
+MARCAS = ['Samsung', 'Motorola', 'Xiaomi', 'Apple', 'LG', 'Positivo', 'Multilaser']
+
+def _array(valores):
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in valores) + "]"
+
+def seed(db: Session, linhas: int):
+    print(f"Inserindo {linhas} clientes, carnês e produtos de teste...")
+    db.execute(text(f"""
+        INSERT INTO cliente (nome, cpf_cnpj, cpf_cnpj_digitos, data_cadastro)
+        SELECT ({_array(NOMES)})[1 + (i * 7) % {len(NOMES)}] || ' ' || ({_array(SOBRENOMES)})[1 + (i * 13) % {len(SOBRENOMES)}]
+                   || ' ' || ({_array(SOBRENOMES)})[1 + (i * 31) % {len(SOBRENOMES)}],
+               'BENCH' || lpad(i::text, 11, '0'),
+               lpad(i::text, 11, '0'),
+               now()
+        FROM generate_series(1, :linhas) AS i
+    """), {"linhas": linhas})
+    db.execute(text(f"""
+        INSERT INTO carne (id_cliente, data_venda, descricao, valor_total_original, numero_parcelas, valor_parcela_original,
+                           data_criacao, data_primeiro_vencimento, frequencia_pagamento, status_carne, valor_entrada,
+                           parcela_fixa, total_parcelas, parcelas_pagas, parcelas_atrasadas, parcelas_parcialmente_pagas)
+        SELECT c.id_cliente, current_date - (c.id_cliente % 365),
+               ({_array(PRODUTOS)})[1 + c.id_cliente % {len(PRODUTOS)}] || ' ' || ({_array(MARCAS)})[1 + c.id_cliente % {len(MARCAS)}],
+               1000, 10, 100, now(), current_date, 'mensal', 'Ativo', 0, true, 0, 0, 0, 0
+        FROM cliente c WHERE c.cpf_cnpj LIKE 'BENCH%'
+    """))
+    db.execute(text(f"""
+        INSERT INTO produto (nome, categoria, marca, codigo_sku, data_cadastro)
+        SELECT ({_array(PRODUTOS)})[1 + i % {len(PRODUTOS)}] || ' ' || ({_array(MARCAS)})[1 + (i * 3) % {len(MARCAS)}] || ' ' || i,
+               ({_array(PRODUTOS)})[1 + i % {len(PRODUTOS)}],
+               ({_array(MARCAS)})[1 + (i * 3) % {len(MARCAS)}],
+               'BENCH-' || i,
+               now()
+        FROM generate_series(1, :linhas) AS i
+    """), {"linhas": linhas})
+    db.execute(text("ANALYZE cliente"))
+    db.execute(text("ANALYZE carne"))
+    db.execute(text("ANALYZE produto"))
+
+def medir(db: Session, funcao, repeticoes: int) -> float:
+    funcao() # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        db.expunge_all()
+    return statistics.median(tempos)
+
+def run_benchmark(linhas: int, repeticoes: int):
+    db: Session = SessionLocal()
+    try:
+        if not crud._has_pg_trgm(db):
+            print("⚠️  Extensão pg_trgm não encontrada: rode 'alembic upgrade head'. Medindo apenas com ILIKE.")
+
+        seed(db, linhas)
+
+        cenarios = [
+            ("clientes: 'silva'", lambda: crud.get_clients(db, search_query="silva", limit=20)),
+            ("clientes: 'marcelo lopes'", lambda: crud.get_clients(db, search_query="marcelo lopes", limit=20)),
+            ("clientes (erro de digitação): 'rodriges'", lambda: crud.get_clients(db, search_query="rodriges", limit=20)),
+            ("clientes (CPF): '000.000.543-21'", lambda: crud.get_clients(db, search_query="000.000.543-21", limit=20)),
+            ("clientes (início do CPF): '0000005'", lambda: crud.get_clients(db, search_query="0000005", limit=20)),
+            ("produtos: 'carregador'", lambda: crud.get_produtos(db, search_query="carregador", limit=20)),
+            ("carnês (resumo): 'tablet'", lambda: crud.get_carnes_summary(db, search_query="tablet", limit=20)),
+        ]
+
+        print("\n" + "="*78)
+        print(f"   {'cenário':<44}{'com índices':>15}{'seq. scan':>15}")
+        for nome, funcao in cenarios:
+            com_indices = medir(db, funcao, repeticoes)
+            db.execute(text("SET LOCAL enable_bitmapscan = off"))
+            db.execute(text("SET LOCAL enable_indexscan = off"))
+            sem_indices = medir(db, funcao, repeticoes)
+            db.execute(text("SET LOCAL enable_bitmapscan = on"))
+            db.execute(text("SET LOCAL enable_indexscan = on"))
+            print(f"   {nome:<44}{com_indices:>12.2f} ms{sem_indices:>12.2f} ms")
+        print("="*78 + "\n")
+    finally:
+        db.rollback() # Descarta as linhas de teste
+        db.close()
+        print("Script finalizado (dados de teste descartados).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede a latência da busca de clientes, carnês e produtos.")
+    parser.add_argument("--linhas", type=int, default=100_000, help="Linhas de teste por tabela (padrão: 100000)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Execuções por cenário (padrão: 20)")
+    args = parser.parse_args()
+
+    run_benchmark(args.linhas, args.repeticoes)
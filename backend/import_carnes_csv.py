@@ -0,0 +1,66 @@
+import argparse
+import csv
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import crud, carne_import
+
+# Importação de carnês legados (em papel) a partir de um CSV.
+# As colunas aceitas estão descritas em app/carne_import.py. O arquivo é lido em streaming e gravado
+# em lotes; linhas com erro são listadas (e, com --erros, gravadas num CSV) sem interromper a carga.
+
+def run_import(arquivo: str, email_usuario: str, lote: int, delimitador: str, arquivo_erros: str = None):
+    db: Session = SessionLocal()
+    saida_erros = open(arquivo_erros, "w", newline="", encoding="utf-8") if arquivo_erros else None
+    try:
+        usuario = crud.get_user_by_email(db, email_usuario)
+        if not usuario:
+            print(f"❌ Usuário '{email_usuario}' não encontrado. Os pagamentos importados são registrados em nome dele.")
+            sys.exit(1)
+
+        escritor_erros = csv.writer(saida_erros) if saida_erros else None
+        if escritor_erros:
+            escritor_erros.writerow(["linha", "erro"])
+
+        def progresso(relatorio):
+            print(f"   ... {relatorio['linhas_processadas']} linhas lidas, {relatorio['carnes_importados']} carnês importados, "
+                  f"{relatorio['total_erros']} erros")
+
+        def erro(linha, mensagem):
+            if escritor_erros:
+                escritor_erros.writerow([linha, mensagem])
+            else:
+                print(f"   linha {linha}: {mensagem}")
+
+        print(f"Importando carnês de {arquivo} (lotes de {lote} linhas)...")
+        with open(arquivo, newline="", encoding="utf-8-sig") as entrada:
+            relatorio = carne_import.import_carnes_csv(
+                db, entrada, id_usuario=usuario.id_usuario, batch_size=lote, delimitador=delimitador,
+                on_progress=progresso, on_error=erro
+            )
+
+        print("\n" + "="*50)
+        print(f"   Linhas processadas: {relatorio['linhas_processadas']}")
+        print(f"   Carnês importados: {relatorio['carnes_importados']}")
+        print(f"   Clientes criados: {relatorio['clientes_criados']}")
+        print(f"   Pagamentos importados: {relatorio['pagamentos_importados']}")
+        print(f"   Linhas com erro: {relatorio['total_erros']}" + (f" (ver {arquivo_erros})" if arquivo_erros and relatorio['total_erros'] else ""))
+        print("="*50 + "\n")
+    finally:
+        if saida_erros:
+            saida_erros.close()
+        db.close()
+        print("Script finalizado.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa carnês legados a partir de um arquivo CSV.")
+    parser.add_argument("arquivo", help="Caminho do CSV")
+    parser.add_argument("--usuario", required=True, help="Email do usuário que registra os pagamentos importados")
+    parser.add_argument("--lote", type=int, default=carne_import.DEFAULT_BATCH_SIZE, help="Linhas por transação (padrão: 500)")
+    parser.add_argument("--delimitador", default=",", help="Separador de colunas (padrão: ',')")
+    parser.add_argument("--erros", help="Grava as linhas com erro neste CSV (linha, erro)")
+    args = parser.parse_args()
+
+    run_import(args.arquivo, args.usuario, args.lote, args.delimitador, args.erros)
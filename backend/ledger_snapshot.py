@@ -0,0 +1,53 @@
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import ledger
+
+# Job de snapshots do razão das parcelas (saldo_parcela).
+# Deve rodar uma vez por dia, depois do acúmulo de juros (ex.: cron "30 0 * * *"): grava o saldo no início
+# do dia das parcelas que tiveram lançamentos desde o último snapshot, para que as consultas de saldo em uma
+# data somem só os lançamentos recentes. Com --verificar, confere também se os campos das parcelas batem
+# com a soma dos seus lançamentos.
+
+def run_snapshots(reference_date: date = None, verificar: bool = False):
+    print("Gravando snapshots de saldo das parcelas...")
+
+    db: Session = SessionLocal()
+
+    try:
+        data_referencia = reference_date or date.today()
+        gravados = ledger.take_snapshots(db, data_referencia=data_referencia)
+        print(f"   Data de referência: {data_referencia}")
+        print(f"   Snapshots gravados: {gravados}")
+
+        if verificar:
+            divergencias = ledger.find_divergences(db)
+            print(f"   Parcelas divergentes do razão: {len(divergencias)}")
+            for item in divergencias[:50]:
+                print(
+                    f"     parcela {item['id_parcela']} (carnê {item['id_carne']}): "
+                    + ", ".join(f"{campo}={item[campo]} x razão {item[campo + '_razao']}" for campo in ledger.CAMPOS_SALDO)
+                )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ocorreu um erro ao gravar os snapshots: {e}")
+        raise
+    finally:
+        db.close()
+        print("Script finalizado.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grava snapshots de saldo do razão das parcelas.")
+    parser.add_argument(
+        "--data",
+        help="Data de referência no formato YYYY-MM-DD (padrão: hoje)",
+        type=lambda valor: datetime.strptime(valor, "%Y-%m-%d").date(),
+        default=None
+    )
+    parser.add_argument("--verificar", action="store_true", help="Confere os campos das parcelas com o razão")
+    args = parser.parse_args()
+
+    run_snapshots(reference_date=args.data, verificar=args.verificar)
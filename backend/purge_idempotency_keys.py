@@ -0,0 +1,32 @@
+import argparse
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app import idempotency
+
+# Job de limpeza das chaves de idempotência (cabeçalho Idempotency-Key) já expiradas.
+# Pode rodar de hora em hora (ex.: cron "15 * * * *"); o prazo de validade vem de IDEMPOTENCY_KEY_TTL_HOURS.
+
+def run_purge(batch_size: int):
+    print("Removendo chaves de idempotência expiradas...")
+
+    db: Session = SessionLocal()
+
+    try:
+        removidas = idempotency.purge_expired(db, batch_size=batch_size)
+        print(f"   Chaves removidas: {removidas}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ocorreu um erro ao remover as chaves expiradas: {e}")
+        raise
+    finally:
+        db.close()
+        print("Script finalizado.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove as chaves de idempotência expiradas.")
+    parser.add_argument("--lote", type=int, default=5000, help="Chaves removidas por transação")
+    args = parser.parse_args()
+
+    run_purge(batch_size=args.lote)
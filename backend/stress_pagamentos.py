@@ -0,0 +1,169 @@
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, ledger, models, schemas
+
+# Teste de estresse dos pagamentos concorrentes: várias threads, cada uma com a sua sessão (como workers e
+# caixas diferentes), lançam pagamentos nas mesmas parcelas de um carnê de teste ao mesmo tempo, pela rota
+# individual (create_pagamento) e pela de lote (create_pagamentos_batch). No final confere que nenhuma
+# atualização se perdeu: valor_pago de cada parcela = soma dos seus pagamentos = soma do que foi enviado,
+# contadores do carnê = contagem real dos status das parcelas e razão = campos das parcelas. O carnê e o cliente de teste são apagados.
+#
+# Só roda contra o banco de testes dedicado de TEST_DATABASE_URL (o mesmo de tests/, onde a mesma conferência
+# roda automaticamente em test_pagamentos_concorrentes.py), nunca contra o DATABASE_URL da aplicação.
+
+CPF_TESTE = 'STRESS-00000000'
+
+def criar_carne_teste(db, parcelas: int):
+    cliente = db.query(models.Cliente).filter(models.Cliente.cpf_cnpj == CPF_TESTE).first() # Sobra de execução com --manter
+    if cliente is None:
+        cliente = crud.create_client(db, schemas.ClientCreate(nome="Cliente Teste de Estresse", cpf_cnpj=CPF_TESTE))
+    hoje = date.today()
+    # Metade das parcelas já vencida, para exercitar também o cálculo de juros/multa e o status 'Atrasada'
+    carne = crud.create_carne(db, schemas.CarneCreate(
+        id_cliente=cliente.id_cliente,
+        data_venda=hoje - timedelta(days=31 * (parcelas // 2) + 10),
+        descricao="Carnê de teste de estresse",
+        valor_total_original=Decimal('100.00') * parcelas,
+        numero_parcelas=parcelas,
+        data_primeiro_vencimento=hoje - timedelta(days=31 * (parcelas // 2)),
+        frequencia_pagamento="mensal",
+    ))
+    return carne.id_carne, cliente.id_cliente
+
+def trabalhador(sessoes, ids_parcelas, id_usuario, pagamentos, tamanho_lote, enviados, erros, semente):
+    aleatorio = random.Random(semente)
+    db = sessoes()
+    try:
+        restantes = pagamentos
+        while restantes > 0:
+            if tamanho_lote > 1 and aleatorio.random() < 0.3:
+                lote = [
+                    schemas.PagamentoCreate(
+                        id_parcela=aleatorio.choice(ids_parcelas),
+                        valor_pago=Decimal(aleatorio.randint(1, 500)) / 100,
+                        forma_pagamento="Dinheiro"
+                    )
+                    for _ in range(min(tamanho_lote, restantes))
+                ]
+                resultados = crud.create_pagamentos_batch(db, lote, usuario_id=id_usuario)
+                for pagamento, resultado in zip(lote, resultados):
+                    if resultado["erro"] is None:
+                        enviados[pagamento.id_parcela] += pagamento.valor_pago
+                restantes -= len(lote)
+            else:
+                pagamento = schemas.PagamentoCreate(
+                    id_parcela=aleatorio.choice(ids_parcelas),
+                    valor_pago=Decimal(aleatorio.randint(1, 500)) / 100,
+                    forma_pagamento="PIX"
+                )
+                crud.create_pagamento(db, pagamento, usuario_id=id_usuario)
+                enviados[pagamento.id_parcela] += pagamento.valor_pago
+                restantes -= 1
+    except Exception as e:
+        erros.append(repr(e))
+    finally:
+        db.close()
+
+def conferir(db, id_carne, enviados) -> list:
+    falhas = []
+    parcelas = db.query(models.Parcela).filter(models.Parcela.id_carne == id_carne).all()
+    soma_pagamentos = dict(
+        db.query(models.Pagamento.id_parcela, func.sum(models.Pagamento.valor_pago))
+        .join(models.Parcela).filter(models.Parcela.id_carne == id_carne)
+        .group_by(models.Pagamento.id_parcela).all()
+    )
+    for parcela in parcelas:
+        esperado = enviados.get(parcela.id_parcela, Decimal('0.00'))
+        registrado = soma_pagamentos.get(parcela.id_parcela, Decimal('0.00'))
+        if parcela.valor_pago != esperado or registrado != esperado:
+            falhas.append(
+                f"Parcela {parcela.numero_parcela}: valor_pago={parcela.valor_pago}, "
+                f"soma dos pagamentos={registrado}, enviado={esperado}"
+            )
+
+    carne = db.query(models.Carne).filter(models.Carne.id_carne == id_carne).one()
+    status = Counter(p.status_parcela for p in parcelas)
+    contadores_reais = {
+        'total_parcelas': len(parcelas),
+        'parcelas_pagas': status['Paga'] + status['Paga com Atraso'],
+        'parcelas_atrasadas': status['Atrasada'],
+        'parcelas_parcialmente_pagas': status['Parcialmente Paga'],
+    }
+    for coluna, valor in contadores_reais.items():
+        if getattr(carne, coluna) != valor:
+            falhas.append(f"Carnê: {coluna}={getattr(carne, coluna)}, contagem real={valor}")
+
+    for item in ledger.find_divergences(db, id_carne=id_carne):
+        falhas.append(f"Parcela {item['id_parcela']}: valor_pago={item['valor_pago']}, razão={item['valor_pago_razao']}")
+    return falhas
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de estresse de pagamentos concorrentes nas mesmas parcelas.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pagamentos", type=int, default=50, help="Pagamentos por thread")
+    parser.add_argument("--parcelas", type=int, default=4, help="Parcelas do carnê de teste (poucas = mais disputa)")
+    parser.add_argument("--lote", type=int, default=5, help="Tamanho dos lotes misturados aos pagamentos individuais (1 desliga)")
+    parser.add_argument("--manter", action="store_true", help="Não apaga o carnê e o cliente de teste no final")
+    args = parser.parse_args()
+
+    test_database_url = os.getenv("TEST_DATABASE_URL")
+    if not test_database_url:
+        raise SystemExit("Defina TEST_DATABASE_URL com um banco de testes dedicado; o teste de estresse não roda no banco da aplicação.")
+    sessoes = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(test_database_url))
+
+    db = sessoes()
+    try:
+        id_usuario = db.query(models.Usuario.id_usuario).order_by(models.Usuario.id_usuario).limit(1).scalar()
+        if id_usuario is None:
+            raise SystemExit("Nenhum usuário cadastrado; crie um com create_first_admin.py.")
+        id_carne, id_cliente = criar_carne_teste(db, args.parcelas)
+        ids_parcelas = [p.id_parcela for p in db.query(models.Parcela.id_parcela).filter(models.Parcela.id_carne == id_carne)]
+    finally:
+        db.close()
+
+    enviados_por_thread = [Counter() for _ in range(args.threads)]
+    erros = []
+    threads = [
+        threading.Thread(target=trabalhador, args=(sessoes, ids_parcelas, id_usuario, args.pagamentos, args.lote, enviados_por_thread[i], erros, i))
+        for i in range(args.threads)
+    ]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    enviados = sum(enviados_por_thread, Counter())
+    total = sum(enviados.values(), Decimal('0.00'))
+    print(f"{args.threads} threads x {args.pagamentos} pagamentos em {args.parcelas} parcelas: {duracao:.2f} s, total enviado {total}")
+    for erro in erros:
+        print(f"  erro em thread: {erro}")
+
+    db = sessoes()
+    try:
+        falhas = conferir(db, id_carne, enviados)
+        if not args.manter:
+            crud.delete_carne(db, id_carne)
+            crud.delete_client(db, id_cliente)
+    finally:
+        db.close()
+
+    if falhas or erros:
+        for falha in falhas:
+            print(f"  FALHA: {falha}")
+        raise SystemExit(1)
+    print("OK: nenhum pagamento perdido e contadores do carnê consistentes.")
+
+if __name__ == "__main__":
+    main()
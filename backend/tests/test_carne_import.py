@@ -0,0 +1,57 @@
+# Importação de carnês por CSV: uma linha que passa na validação mas é recusada pelo banco (descrição
+# maior que a coluna) não derruba o lote inteiro; só ela entra no relatório de erros.
+import csv
+import io
+import os
+
+from sqlalchemy import func, select
+
+from app import carne_import, models
+
+COLUNAS = (
+    "cliente_nome", "cliente_cpf_cnpj", "data_venda", "descricao", "valor_total_original", "numero_parcelas",
+    "data_primeiro_vencimento", "frequencia_pagamento", "valor_ja_pago",
+)
+
+def gerar_csv(linhas):
+    arquivo = io.StringIO()
+    escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS)
+    escritor.writeheader()
+    escritor.writerows(linhas)
+    arquivo.seek(0)
+    return arquivo
+
+def linha_csv(i, prefixo, **campos):
+    return {
+        "cliente_nome": f"Cliente Importado {i}",
+        "cliente_cpf_cnpj": f"{prefixo}-{i}",
+        "data_venda": "2024-01-10",
+        "descricao": f"Carnê importado {i}",
+        "valor_total_original": "300,00",
+        "numero_parcelas": "3",
+        "data_primeiro_vencimento": "10/02/2024",
+        "frequencia_pagamento": "mensal",
+        "valor_ja_pago": "100.00",
+        **campos,
+    }
+
+def test_linha_recusada_pelo_banco_nao_derruba_o_lote(db, usuario):
+    prefixo = f"IMP-{os.urandom(3).hex()}"
+    linhas = [linha_csv(i, prefixo) for i in range(6)]
+    linhas[3]["descricao"] = "x" * 600 # Coluna descricao é VARCHAR(500)
+
+    relatorio = carne_import.import_carnes_csv(db, gerar_csv(linhas), usuario.id_usuario, batch_size=10)
+
+    assert relatorio["carnes_importados"] == 5
+    assert relatorio["clientes_criados"] == 5
+    assert relatorio["pagamentos_importados"] == 5
+    assert relatorio["total_erros"] == 1
+    # Cabeçalho é a linha 1 do arquivo
+    assert [erro["linha"] for erro in relatorio["erros"]] == [5]
+    assert "Erro ao gravar a linha" in relatorio["erros"][0]["erro"]
+
+    carnes = db.scalar(
+        select(func.count()).select_from(models.Carne).join(models.Cliente)
+        .where(models.Cliente.cpf_cnpj.like(f"{prefixo}-%"))
+    )
+    assert carnes == 5
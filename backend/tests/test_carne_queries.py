@@ -0,0 +1,62 @@
+# Detalhe e listagem de carnês em número fixo de consultas (carnê + cliente, parcelas, pagamentos),
+# qualquer que seja o número de parcelas e de pagamentos: conta os comandos enviados ao banco.
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models, schemas
+
+MAX_CONSULTAS = 3
+
+@contextmanager
+def contar_consultas(engine):
+    comandos = []
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        yield comandos
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+def pagar_parcelas(db, id_carne, usuario, pagamentos_por_parcela):
+    """Lança `pagamentos_por_parcela` pagamentos parciais em cada parcela do carnê."""
+    ids_parcelas = [
+        id_parcela for (id_parcela,) in
+        db.query(models.Parcela.id_parcela).filter(models.Parcela.id_carne == id_carne)
+    ]
+    for id_parcela in ids_parcelas:
+        for _ in range(pagamentos_por_parcela):
+            crud.create_pagamento(
+                db, schemas.PagamentoCreate(id_parcela=id_parcela, valor_pago=Decimal("10.00"), forma_pagamento="PIX"),
+                usuario.id_usuario
+            )
+
+@pytest.mark.parametrize("parcelas, pagamentos_por_parcela", [(1, 0), (3, 1), (24, 3)])
+def test_detalhe_do_carne_em_numero_fixo_de_consultas(banco, db, usuario, criar_carne, parcelas, pagamentos_por_parcela):
+    id_carne = criar_carne(parcelas, vencidas=parcelas // 2)
+    pagar_parcelas(db, id_carne, usuario, pagamentos_por_parcela)
+    db.expunge_all()
+
+    with contar_consultas(banco) as comandos:
+        carne = crud.get_carne(db, id_carne)
+
+    assert len(carne.parcelas) == parcelas
+    assert sum(len(p.pagamentos) for p in carne.parcelas) == parcelas * pagamentos_por_parcela
+    assert len(comandos) <= MAX_CONSULTAS, comandos
+
+@pytest.mark.parametrize("carnes, parcelas, pagamentos_por_parcela", [(2, 1, 0), (10, 12, 2)])
+def test_pagina_de_carnes_em_numero_fixo_de_consultas(banco, db, usuario, cliente, criar_carne, carnes, parcelas, pagamentos_por_parcela):
+    for _ in range(carnes):
+        pagar_parcelas(db, criar_carne(parcelas, vencidas=1), usuario, pagamentos_por_parcela)
+    id_cliente = cliente.id_cliente
+    db.expunge_all()
+
+    with contar_consultas(banco) as comandos:
+        pagina = crud.get_carnes(db, limit=carnes, id_cliente=id_cliente)
+
+    assert len(pagina) == carnes
+    assert all(len(c.parcelas) == parcelas for c in pagina)
+    assert len(comandos) <= MAX_CONSULTAS, comandos
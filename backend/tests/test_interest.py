@@ -0,0 +1,39 @@
+# Juros/multas das parcelas em aberto calculados pelo banco (relatórios do cliente) devem bater, centavo a
+# centavo, com interest.calculate_interest_and_fine aplicado linha a linha.
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app import crud, models
+from app.interest import calculate_interest_and_fine
+
+def test_juros_calculados_no_banco_iguais_ao_calculo_por_parcela(db, cliente, criar_carne):
+    id_carne = criar_carne(60, vencidas=30)
+    hoje = date.today()
+    aleatorio = random.Random(3)
+    for parcela in db.query(models.Parcela).filter(models.Parcela.id_carne == id_carne):
+        # Valores e atrasos variados (inclusive vencimento hoje e no futuro), sempre com principal em aberto
+        parcela.valor_devido = Decimal(aleatorio.randint(1, 5_000_000)) / 100
+        parcela.valor_pago = (parcela.valor_devido * Decimal(aleatorio.random())).quantize(Decimal('0.01'))
+        parcela.data_vencimento = hoje - timedelta(days=aleatorio.randint(-30, 2000))
+        parcela.status_parcela = 'Pendente'
+    db.commit()
+
+    relatorio = crud.get_pending_debts_by_client(db, cliente.id_cliente)
+
+    parcelas = {p.id_parcela: p for p in db.query(models.Parcela).filter(models.Parcela.id_carne == id_carne)}
+    assert len(relatorio.parcelas_pendentes) == len(parcelas)
+    vencidas = 0
+    for item in relatorio.parcelas_pendentes:
+        parcela = parcelas[item.id_parcela]
+        if parcela.data_vencimento >= hoje:
+            continue
+        vencidas += 1
+        esperado = calculate_interest_and_fine(parcela.valor_devido, parcela.valor_pago, parcela.data_vencimento, hoje)
+        assert Decimal(str(item.juros_multa)) == esperado, parcela.id_parcela
+        assert Decimal(str(item.saldo_devedor)) == parcela.valor_devido - parcela.valor_pago + esperado
+        assert item.status_parcela == 'Atrasada'
+    assert vencidas > 0
+
+    resumo = crud.get_client_summary(db, cliente.id_cliente)
+    assert Decimal(str(resumo.total_divida_aberta)).quantize(Decimal('0.01')) == Decimal(str(relatorio.total_divida_pendente)).quantize(Decimal('0.01'))
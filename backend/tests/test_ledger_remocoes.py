@@ -0,0 +1,69 @@
+# Remover parcelas (cronograma regenerado) ou o carnê inteiro não apaga o razão: cada parcela removida
+# recebe um lançamento de encerramento que zera o saldo, e os lançamentos ficam com a parcela/o carnê nulos.
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from app import crud, ledger, models, schemas
+
+def lancamentos_do_carne(db, id_carne):
+    return db.scalars(select(models.LancamentoParcela.id_lancamento).where(models.LancamentoParcela.id_carne == id_carne)).all()
+
+def somas(db, ids_lancamentos):
+    return db.execute(
+        select(*(func.sum(getattr(models.LancamentoParcela, campo)) for campo in ledger.CAMPOS_SALDO))
+        .where(models.LancamentoParcela.id_lancamento.in_(ids_lancamentos))
+    ).one()
+
+def test_regenerar_cronograma_encerra_as_parcelas_removidas(db, usuario, criar_carne):
+    id_carne = criar_carne(6)
+    carne = crud.get_carne(db, id_carne)
+    ids_antes = {p.numero_parcela: p.id_parcela for p in carne.parcelas}
+    dados = schemas.CarneCreate(
+        id_cliente=carne.id_cliente, data_venda=carne.data_venda, descricao=carne.descricao,
+        valor_total_original=Decimal("400.00"), numero_parcelas=4,
+        data_primeiro_vencimento=carne.data_primeiro_vencimento, frequencia_pagamento="mensal",
+    )
+    crud.update_carne(db, id_carne, dados)
+
+    removidas = [ids_antes[5], ids_antes[6]]
+    assert db.query(models.Parcela).filter(models.Parcela.id_parcela.in_(removidas)).count() == 0
+    encerramentos = db.execute(
+        select(models.LancamentoParcela.valor_devido)
+        .where(models.LancamentoParcela.tipo == ledger.TIPO_ENCERRAMENTO, models.LancamentoParcela.id_carne == id_carne)
+    ).scalars().all()
+    # As parcelas removidas deixam de existir, então os lançamentos delas perdem o vínculo com a parcela
+    assert encerramentos == [Decimal("-100.00"), Decimal("-100.00")]
+    orfaos = db.scalar(
+        select(func.count()).where(models.LancamentoParcela.id_carne == id_carne, models.LancamentoParcela.id_parcela.is_(None))
+    )
+    assert orfaos == 4 # abertura + encerramento de cada uma
+    # O razão do carnê continua batendo com as parcelas que sobraram
+    assert somas(db, lancamentos_do_carne(db, id_carne))[0] == Decimal("400.00")
+
+def test_apagar_carne_mantem_o_razao(db, usuario, criar_carne):
+    id_carne = criar_carne(3, vencidas=1)
+    id_parcela = db.scalar(select(func.min(models.Parcela.id_parcela)).where(models.Parcela.id_carne == id_carne))
+    crud.create_pagamento(
+        db, schemas.PagamentoCreate(id_parcela=id_parcela, valor_pago=Decimal("30.00"), forma_pagamento="PIX"),
+        usuario.id_usuario
+    )
+    ids_lancamentos = lancamentos_do_carne(db, id_carne)
+
+    assert crud.delete_carne(db, id_carne, usuario_id=usuario.id_usuario)
+
+    restantes = db.scalars(
+        select(models.LancamentoParcela.id_lancamento).where(models.LancamentoParcela.id_lancamento.in_(ids_lancamentos))
+    ).all()
+    assert sorted(restantes) == sorted(ids_lancamentos) # nada foi apagado em cascata
+    encerramentos = db.scalars(
+        select(models.LancamentoParcela).where(
+            models.LancamentoParcela.tipo == ledger.TIPO_ENCERRAMENTO,
+            models.LancamentoParcela.id_lancamento > max(ids_lancamentos),
+            models.LancamentoParcela.id_usuario == usuario.id_usuario,
+        )
+    ).all()
+    assert len(encerramentos) == 3
+    assert all(l.id_carne is None and l.id_parcela is None for l in encerramentos)
+    # Histórico + encerramentos somam zero em todos os campos
+    assert somas(db, ids_lancamentos + [l.id_lancamento for l in encerramentos]) == (0, 0, 0)
@@ -0,0 +1,39 @@
+# Pagamentos concorrentes nas mesmas parcelas (individuais e em lote, cada thread com a sua sessão):
+# nenhuma atualização pode se perder. Versão automatizada de stress_pagamentos.py, com carga menor.
+import threading
+from collections import Counter
+
+from app import models
+from app.database import SessionLocal
+
+import stress_pagamentos
+
+THREADS = 6
+PAGAMENTOS_POR_THREAD = 20
+PARCELAS = 4
+TAMANHO_LOTE = 5
+
+def test_pagamentos_concorrentes_nao_perdem_atualizacoes(db, usuario):
+    id_carne, _ = stress_pagamentos.criar_carne_teste(db, PARCELAS)
+    ids_parcelas = [id_parcela for (id_parcela,) in db.query(models.Parcela.id_parcela).filter(models.Parcela.id_carne == id_carne)]
+    id_usuario = usuario.id_usuario
+    db.close()
+
+    enviados_por_thread = [Counter() for _ in range(THREADS)]
+    erros = []
+    threads = [
+        threading.Thread(
+            target=stress_pagamentos.trabalhador,
+            args=(SessionLocal, ids_parcelas, id_usuario, PAGAMENTOS_POR_THREAD, TAMANHO_LOTE, enviados_por_thread[i], erros, i)
+        )
+        for i in range(THREADS)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert erros == []
+    enviados = sum(enviados_por_thread, Counter())
+    assert sum(enviados.values()) > 0
+    assert stress_pagamentos.conferir(db, id_carne, enviados) == []
@@ -19,6 +19,25 @@ api.interceptors.request.use(
     }
 );
 
+// Cabeçalho Idempotency-Key: gere a chave uma vez por operação (newIdempotencyKey) e reenvie a mesma
+// nas novas tentativas; o backend devolve a resposta original em vez de repetir a gravação
+export const withIdempotencyKey = (idempotencyKey) => (
+    idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : {}
+);
+
+// Chave nova para o cabeçalho Idempotency-Key (UUID v4). crypto.randomUUID só existe em contexto seguro
+// (HTTPS ou localhost); em HTTP na rede local a chave é montada com crypto.getRandomValues
+export const newIdempotencyKey = () => {
+    if (typeof crypto.randomUUID === 'function') {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40; // versão 4
+    bytes[8] = (bytes[8] & 0x3f) | 0x80; // variante RFC 4122
+    const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+};
+
 export const auth = {
     login: (email, senha) => {
         const formData = new URLSearchParams();
@@ -55,9 +74,18 @@ export const carnes = {
         return api.get(`/carnes/`, { params });
     },
     getById: (id) => api.get(`/carnes/${id}`),
-    create: (carneData) => api.post(`/carnes/`, carneData),
+    // idempotencyKey: mesma chave ao reenviar (timeout) para o carnê não ser criado duas vezes
+    create: (carneData, idempotencyKey = null) => api.post(`/carnes/`, carneData, withIdempotencyKey(idempotencyKey)),
     update: (id, carneData) => api.put(`/carnes/${id}`, carneData),
     delete: (id) => api.delete(`/carnes/${id}`),
+    // Simulação do cronograma (não grava): um cenário ou vários de uma vez
+    preview: (carneData) => api.post(`/carnes/preview`, carneData),
+    previewBatch: (cenarios) => api.post(`/carnes/preview/batch`, { cenarios }),
+    // Paga um valor no carnê, distribuído entre as parcelas em aberto (mais antigas primeiro)
+    pay: (id, pagamentoData, idempotencyKey = null) => api.post(`/carnes/${id}/pagar`, pagamentoData, withIdempotencyKey(idempotencyKey)),
+    // Saldo do carnê no fim de uma data (padrão: hoje) e lançamentos do razão das parcelas
+    getBalance: (id, data = null) => api.get(`/carnes/${id}/saldo`, { params: data ? { data } : {} }),
+    getLedger: (id, parcelaId = null) => api.get(`/carnes/${id}/lancamentos`, { params: parcelaId ? { parcela_id: parcelaId } : {} }),
     // NOVA FUNÇÃO para o PDF
     generatePdf: (id) => api.get(`/carnes/${id}/pdf`, { responseType: 'blob' }), // Importante: responseType 'blob'
 };
@@ -67,11 +95,15 @@ export const parcelas = {
     getById: (id) => api.get(`/carnes/parcelas/${id}`),
     update: (id, parcelaData) => api.put(`/carnes/parcelas/${id}`, parcelaData),
     renegotiate: (id, renegotiationData) => api.post(`/carnes/parcelas/${id}/renegotiate`, renegotiationData),
+    // Paga uma parcela; idempotencyKey: mesma chave ao reenviar para o pagamento não ser lançado duas vezes
+    pay: (carneId, parcelaId, pagamentoData, idempotencyKey = null) => api.post(`/carnes/${carneId}/parcelas/${parcelaId}/pagar`, pagamentoData, withIdempotencyKey(idempotencyKey)),
     delete: (id) => api.delete(`/carnes/parcelas/${id}`),
 };
 
 export const pagamentos = {
     create: (pagamentoData) => api.post(`/carnes/pagamentos/`, pagamentoData),
+    // Vários pagamentos numa única transação (fechamento de caixa); resposta com um resultado por item
+    createBatch: (listaPagamentos, idempotencyKey = null) => api.post(`/carnes/pagamentos/batch`, { pagamentos: listaPagamentos }, withIdempotencyKey(idempotencyKey)),
     getById: (id) => api.get(`/carnes/pagamentos/${id}`),
     getByParcelaId: (parcelaId) => api.get(`/carnes/parcelas/${parcelaId}/pagamentos`),
     update: (id, pagamentoData) => api.put(`/carnes/pagamentos/${id}`, pagamentoData),
@@ -81,6 +113,13 @@ export const pagamentos = {
 export const reports = {
     getDashboardSummary: () => api.get(`/reports/dashboard/summary`),
     getReceiptsReport: (startDate, endDate) => api.get(`/reports/receipts`, { params: { start_date: startDate, end_date: endDate } }),
+    // Exportação em streaming ('csv' ou 'ndjson'); quantidade e total vêm nos cabeçalhos X-Total-Pagamentos/X-Total-Recebido
+    exportReceiptsReport: (startDate, endDate, formato = 'csv') => api.get(`/reports/receipts`, { params: { start_date: startDate, end_date: endDate, formato }, responseType: 'blob' }),
+    // Recebimentos agrupados: periodo 'dia' | 'semana' | 'mes'; agruparPor ['forma_pagamento', 'id_usuario_registro']; rollup traz subtotais
+    getReceiptsGrouped: (startDate, endDate, periodo = 'dia', agruparPor = [], rollup = false) => api.get(`/reports/receipts/grouped`, {
+        params: { start_date: startDate, end_date: endDate, periodo, agrupar_por: agruparPor, rollup },
+        paramsSerializer: { indexes: null }, // agrupar_por=a&agrupar_por=b, como o FastAPI espera
+    }),
     getPendingDebtsReportByClient: (clientId) => api.get(`/reports/pending-debts-by-client/${clientId}`),
 };
 
@@ -98,4 +137,8 @@ export const produtos = {
     create: (produtoData) => api.post(`${PRODUTOS_API_PREFIX}/produtos/`, produtoData),
     update: (id, produtoData) => api.put(`${PRODUTOS_API_PREFIX}/produtos/${id}`, produtoData),
     delete: (id) => api.delete(`${PRODUTOS_API_PREFIX}/produtos/${id}`),
-};
\ No newline at end of file
+};
+export const search = {
+    all: (q, limitePorTipo = 5) => api.get('/search/', { params: { q, limite_por_tipo: limitePorTipo } }),
+    autocomplete: (q, tipo = 'cliente', limit = 10) => api.get('/search/autocomplete', { params: { q, tipo, limit } }),
+};
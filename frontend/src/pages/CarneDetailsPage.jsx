@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
-import { api } from '../api';
+import { api, parcelas, newIdempotencyKey } from '../api';
 import { useAuth } from '../components/AuthProvider.jsx';
 import { useGlobalAlert } from '../App.jsx';
 import ConfirmationModal from '../components/ConfirmationModal';
@@ -43,6 +43,7 @@ const CarneDetailsPage = () => {
     const [paymentValue, setPaymentValue] = useState('');
     const [formaPagamento, setFormaPagamento] = useState('');
     const [dataPagamento, setDataPagamento] = useState(''); // NOVO ESTADO PARA A DATA DO PAGAMENTO
+    const [paymentIdempotencyKey, setPaymentIdempotencyKey] = useState(null); // Mesma chave nas novas tentativas do mesmo pagamento
     const [showPaymentModal, setShowPaymentModal] = useState(false);
     const [showReversePaymentModal, setShowReversePaymentModal] = useState(false);
     const [parcelaToReverse, setParcelaToReverse] = useState(null);
@@ -84,6 +85,7 @@ const CarneDetailsPage = () => {
         setFormaPagamento(''); //
         // Preenche a data de pagamento com a data atual por padrão
         setDataPagamento(new Date().toISOString().split('T')[0]); //
+        setPaymentIdempotencyKey(null); // Novo pagamento: a chave é gerada no envio
         setShowPaymentModal(true); //
     };
 
@@ -108,16 +110,17 @@ const CarneDetailsPage = () => {
                 return; //
             }
 
-            await api.post(`/carnes/${carne.id_carne}/parcelas/${parcelaToPay.id_parcela}/pagar`, { //
+            // Uma chave por pagamento, guardada no estado: se a tentativa falhar (timeout, rede) e o usuário
+            // enviar de novo, o backend reconhece a chave e não lança o pagamento duas vezes
+            const idempotencyKey = paymentIdempotencyKey || newIdempotencyKey();
+            setPaymentIdempotencyKey(idempotencyKey);
+            await parcelas.pay(carne.id_carne, parcelaToPay.id_parcela, { //
                 id_parcela: parcelaToPay.id_parcela, //
                 valor_pago: parsedPaymentValue, //
                 forma_pagamento: formaPagamento, //
                 data_pagamento: dataPagamento // ENVIAR A DATA DE PAGAMENTO
-            }, {
-                headers: { //
-                    Authorization: `Bearer ${user.token}` //
-                }
-            });
+            }, idempotencyKey);
+            setPaymentIdempotencyKey(null);
             setGlobalAlert({ type: 'success', message: 'Pagamento registrado com sucesso!' }); //
             setShowPaymentModal(false); //
             fetchCarneDetails(); // Recarrega os detalhes do carnê para atualizar o status e saldos
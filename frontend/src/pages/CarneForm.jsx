@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useCallback } from 'react';
-import { carnes, clients } from '../api';
+import { carnes, clients, newIdempotencyKey } from '../api';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useGlobalAlert } from '../App.jsx';
 import LoadingSpinner from '../components/LoadingSpinner.jsx';
@@ -37,6 +37,7 @@ function CarneForm() {
     const [clientOptions, setClientOptions] = useState([]);
     const [loadingInitial, setLoadingInitial] = useState(true);
     const [submitLoading, setSubmitLoading] = useState(false);
+    const [createIdempotencyKey, setCreateIdempotencyKey] = useState(null); // Mesma chave nas novas tentativas do cadastro
     const [hasPayments, setHasPayments] = useState(false);
     const [editWarningMessage, setEditWarningMessage] = useState('');
 
@@ -166,7 +167,11 @@ function CarneForm() {
                 setGlobalAlert({ message: 'Carnê atualizado com sucesso!', type: 'success' });
                 navigate(`/carnes/details/${id}`);
             } else {
-                const response = await carnes.create(carneData);
+                // Gerada no primeiro envio e reaproveitada se ele falhar e for repetido: o carnê não é criado duas vezes
+                const idempotencyKey = createIdempotencyKey || newIdempotencyKey();
+                setCreateIdempotencyKey(idempotencyKey);
+                const response = await carnes.create(carneData, idempotencyKey);
+                setCreateIdempotencyKey(null);
                 setGlobalAlert({ message: 'Carnê cadastrado com sucesso!', type: 'success' });
                 const newCarneId = response.data.id_carne;
                 if (newCarneId) {